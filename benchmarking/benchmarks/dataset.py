@@ -2,18 +2,37 @@
 This module contains code used for benchmarking data saving speed of the
 database used under the QCoDeS dataset.
 """
+import json
+import multiprocessing
 import shutil
 import tempfile
 import os
+import threading
 import time
+import uuid
 
+import matplotlib.pyplot as plt
 import numpy as np
 
 import qcodes
 from qcodes import ManualParameter
+from qcodes.dataset.catalog import find_runs, list_runs
 from qcodes.dataset.measurements import Measurement
+from qcodes.dataset.plotting import plot_dataset
 from qcodes.dataset.experiment_container import new_experiment
-from qcodes.dataset.sqlite.database import initialise_database
+from qcodes.dataset.data_set import DataSet, load_by_counter, load_by_guid, \
+    load_by_id
+from qcodes.dataset.database_extract_runs import (extract_runs_into_db,
+                                                  bulk_extract_runs_into_db)
+from qcodes.dataset.guid_index import GUIDResolver
+from qcodes.dataset.npy_export import load_from_npy_dir
+from qcodes.dataset.sqlite.connection import atomic
+from qcodes.dataset.sqlite.db_upgrades import perform_db_upgrade
+from qcodes.dataset.sqlite.database import initialise_database, connect, \
+    PRAGMA_PROFILES, \
+    _adapt_array_raw, _adapt_array_npy, _convert_array, _convert_array_npy
+from qcodes.dataset.sqlite.queries import get_runid_from_guid, \
+    get_runids_from_guids
 
 
 class Adding5Params:
@@ -129,3 +148,993 @@ class Adding5Params:
         # force writing to database so that it is written before we exit
         # the datasaver context manager
         self.datasaver.flush_data_to_database()
+
+
+class AddingScalarResults:
+    """
+    This benchmark measures the rate of points at which scalar results of a
+    measurement of a parameter with two setpoints can be added one point
+    per `DataSaver.add_result` call, as in a sweep.
+    """
+
+    params = [False, True]
+    param_names = ['write_in_background']
+
+    n_points = 20000
+
+    def setup(self, write_in_background):
+        self.tmpdir = tempfile.mkdtemp()
+        qcodes.config["core"]["db_location"] = os.path.join(self.tmpdir,
+                                                            'temp.db')
+        qcodes.config["core"]["db_debug"] = False
+        initialise_database()
+        self.experiment = new_experiment("test-experiment",
+                                         sample_name="test-sample")
+
+        self.meas = Measurement(self.experiment)
+        self.x1 = ManualParameter('x1')
+        self.x2 = ManualParameter('x2')
+        self.y1 = ManualParameter('y1')
+        self.meas.register_parameter(self.x1)
+        self.meas.register_parameter(self.x2)
+        self.meas.register_parameter(self.y1, setpoints=[self.x1, self.x2])
+
+    def teardown(self, write_in_background):
+        self.experiment.conn.close()
+        shutil.rmtree(self.tmpdir)
+
+    def track_add_result_rate(self, write_in_background):
+        x1, x2, y1 = self.x1, self.x2, self.y1
+        with self.meas.run(write_in_background=write_in_background) \
+                as datasaver:
+            start = time.perf_counter()
+            for i in range(self.n_points):
+                datasaver.add_result((x1, i), (x2, 0.5), (y1, 0.1 * i))
+            datasaver.flush_data_to_database(block=True)
+            stop = time.perf_counter()
+        return self.n_points / (stop - start)
+
+    track_add_result_rate.unit = 'points/s'
+
+
+class Adding5ParamsAsColumns(Adding5Params):
+    """
+    This benchmark measures how much time it takes to save the same values
+    as in `Adding5Params`, but via the columnar
+    `DataSaver.add_result_columns` instead of `DataSaver.add_result`. Compare
+    the results of the two benchmarks for the 'numeric' parametrizations.
+    """
+
+    params = [
+        {'n_values': 1000000, 'n_times': 1, 'paramtype': 'numeric'},
+        {'n_values': 10000, 'n_times': 2, 'paramtype': 'numeric'},
+        {'n_values': 100, 'n_times': 200, 'paramtype': 'numeric'},
+    ]
+
+    def time_test(self, bench_param):
+        """Adding data for 5 parameters as columns"""
+        for _ in range(bench_param['n_times']):
+            self.datasaver.add_result_columns(
+                (self.parameters[0], self.values[0]),
+                (self.parameters[1], self.values[1]),
+                (self.parameters[2], self.values[2]),
+                (self.parameters[3], self.values[3]),
+                (self.parameters[4], self.values[4])
+            )
+        # force writing to database so that it is written before we exit
+        # the datasaver context manager
+        self.datasaver.flush_data_to_database()
+
+
+class ArrayBlobCodec:
+    """
+    This benchmark compares the time it takes to serialize an array into a
+    BLOB and to deserialize it again for the compact binary format and for
+    the `.npy` format.
+    """
+
+    params = [10000, 100]
+    param_names = ['n_values']
+
+    def setup(self, n_values):
+        self.array = np.random.rand(n_values)
+        self.blob = bytes(_adapt_array_raw(self.array))
+        self.npy_blob = bytes(_adapt_array_npy(self.array))
+
+    def time_write_raw(self, n_values):
+        _adapt_array_raw(self.array)
+
+    def time_write_npy(self, n_values):
+        _adapt_array_npy(self.array)
+
+    def time_read_raw(self, n_values):
+        _convert_array(self.blob)
+
+    def time_read_npy(self, n_values):
+        _convert_array_npy(self.npy_blob)
+
+
+class GetParameterData:
+    """
+    This benchmark measures how much time it takes to load the data of a
+    parameter and its setpoints from the experiment database with
+    `DataSet.get_parameter_data`.
+    """
+
+    params = [10000, 100000]
+    param_names = ['n_rows']
+
+    timer = time.perf_counter
+
+    def setup(self, n_rows):
+        self.tmpdir = tempfile.mkdtemp()
+        qcodes.config["core"]["db_location"] = os.path.join(self.tmpdir,
+                                                            'temp.db')
+        qcodes.config["core"]["db_debug"] = False
+        initialise_database()
+        self.experiment = new_experiment("test-experiment",
+                                         sample_name="test-sample")
+
+        meas = Measurement(self.experiment)
+        x1 = ManualParameter('x1')
+        x2 = ManualParameter('x2')
+        y1 = ManualParameter('y1')
+        meas.register_parameter(x1)
+        meas.register_parameter(x2)
+        meas.register_parameter(y1, setpoints=[x1, x2])
+
+        with meas.run() as datasaver:
+            datasaver.add_result_columns((x1, np.random.rand(n_rows)),
+                                         (x2, np.arange(n_rows)),
+                                         (y1, np.random.rand(n_rows)))
+        self.dataset = datasaver.dataset
+
+    def teardown(self, n_rows):
+        self.experiment.conn.close()
+        shutil.rmtree(self.tmpdir)
+
+    def time_get_parameter_data(self, n_rows):
+        self.dataset.get_parameter_data('y1')
+
+
+class LoadingRuns:
+    """
+    This benchmark measures how much time it takes to load a run from a
+    database with many runs, by GUID and by counter. Databases of version 6
+    lack the indices on the runs, layouts and dependencies tables that are
+    added by the upgrade to version 7.
+    """
+
+    params = ([1000, 10000, 100000], [6, 7])
+    param_names = ['n_runs', 'db_version']
+
+    timer = time.perf_counter
+
+    def setup(self, n_runs, db_version):
+        self.tmpdir = tempfile.mkdtemp()
+        self.conn = connect(os.path.join(self.tmpdir, 'temp.db'),
+                            version=db_version)
+        experiment = new_experiment("test-experiment",
+                                    sample_name="test-sample",
+                                    conn=self.conn)
+        self.exp_id = experiment.exp_id
+
+        meas = Measurement(experiment)
+        x1 = ManualParameter('x1')
+        y1 = ManualParameter('y1')
+        meas.register_parameter(x1)
+        meas.register_parameter(y1, setpoints=[x1])
+        with meas.run() as datasaver:
+            datasaver.add_result((x1, 0), (y1, 0))
+        run_id = datasaver.run_id
+
+        # Loading a run does not touch its results table, hence it is enough
+        # to copy the rows of the first run in the runs and layouts tables.
+        # uuid4 gives GUIDs of the same format much faster than
+        # generate_guid, which reads the config for every GUID
+        runs = [(f'results-{self.exp_id}-{counter}', counter,
+                 str(uuid.uuid4()))
+                for counter in range(2, n_runs + 1)]
+        with atomic(self.conn) as conn:
+            conn.cursor().executemany(
+                f"""
+                INSERT INTO runs (exp_id, name, result_table_name,
+                                  result_counter, run_timestamp,
+                                  completed_timestamp, is_completed,
+                                  parameters, guid, run_description,
+                                  snapshot)
+                SELECT exp_id, name, ?, ?, run_timestamp,
+                       completed_timestamp, is_completed, parameters, ?,
+                       run_description, snapshot
+                FROM runs WHERE run_id = {run_id}
+                """, runs)
+            conn.execute(
+                f"""
+                INSERT INTO layouts (run_id, parameter, label, unit,
+                                     inferred_from)
+                SELECT runs.run_id, parameter, label, unit, inferred_from
+                FROM runs, layouts
+                WHERE layouts.run_id = {run_id} AND runs.run_id != {run_id}
+                """)
+
+        self.counter = n_runs
+        self.guid = runs[-1][2] if runs else datasaver.dataset.guid
+
+    def teardown(self, n_runs, db_version):
+        self.conn.close()
+        shutil.rmtree(self.tmpdir)
+
+    def time_load_by_guid(self, n_runs, db_version):
+        load_by_guid(self.guid, conn=self.conn)
+
+    def time_load_by_counter(self, n_runs, db_version):
+        load_by_counter(self.counter, self.exp_id, conn=self.conn)
+
+
+class ConcurrentWriteRead:
+    """
+    This benchmark measures how fast data is written to the experiment
+    database while another connection, such as the one of a live plotting
+    process, keeps reading it, and how many times the data is read in the
+    meantime, for each PRAGMA profile.
+    """
+
+    number = 1
+    repeat = 5
+
+    params = list(PRAGMA_PROFILES)
+    param_names = ['pragma_profile']
+
+    timer = time.perf_counter
+
+    n_batches = 200
+    n_values = 100
+
+    def setup(self, pragma_profile):
+        self.tmpdir = tempfile.mkdtemp()
+        qcodes.config["core"]["db_location"] = os.path.join(self.tmpdir,
+                                                            'temp.db')
+        qcodes.config["core"]["db_debug"] = False
+        qcodes.config["core"]["db_pragma_profile"] = pragma_profile
+        initialise_database()
+        self.experiment = new_experiment("test-experiment",
+                                         sample_name="test-sample")
+
+        meas = Measurement(self.experiment)
+        self.x1 = ManualParameter('x1')
+        self.y1 = ManualParameter('y1')
+        meas.register_parameter(self.x1)
+        meas.register_parameter(self.y1, setpoints=[self.x1])
+        self.runner = meas.run()
+        self.datasaver = self.runner.__enter__()
+        # start with some data such that there is something to read
+        self.datasaver.add_result_columns(
+            (self.x1, np.arange(self.n_values)),
+            (self.y1, np.random.rand(self.n_values)))
+
+    def teardown(self, pragma_profile):
+        self.runner.__exit__(None, None, None)
+        self.experiment.conn.close()
+        shutil.rmtree(self.tmpdir)
+        qcodes.config["core"]["db_pragma_profile"] = 'default'
+
+    def _write_while_reading(self):
+        """
+        Write the data in batches, each of which is committed, while reading
+        the data in another thread. Returns the duration of the writing and
+        the number of reads.
+        """
+        writing = threading.Event()
+        writing.set()
+        reads = []
+
+        def read():
+            conn = connect(self.datasaver.dataset.path_to_db)
+            dataset = DataSet(conn=conn, run_id=self.datasaver.run_id)
+            n_reads = 0
+            while writing.is_set():
+                dataset.get_parameter_data('y1')
+                n_reads += 1
+            conn.close()
+            reads.append(n_reads)
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        start = time.perf_counter()
+        for _ in range(self.n_batches):
+            self.datasaver.add_result_columns(
+                (self.x1, np.arange(self.n_values)),
+                (self.y1, np.random.rand(self.n_values)))
+        duration = time.perf_counter() - start
+        writing.clear()
+        reader.join()
+        return duration, reads[0]
+
+    def time_write_while_reading(self, pragma_profile):
+        self._write_while_reading()
+
+    def track_reads_per_second_while_writing(self, pragma_profile):
+        duration, n_reads = self._write_while_reading()
+        return n_reads / duration
+
+    track_reads_per_second_while_writing.unit = 'reads/s'
+
+
+class UpgradingDatabase:
+    """
+    This benchmark measures how much time it takes to upgrade a database of
+    version 5 with many runs with a metadata tag to the latest version, with
+    the run descriptions of the upgrade to version 6 prepared in the calling
+    process and in worker processes.
+    """
+
+    # the upgrade can only be performed once per setup
+    number = 1
+    repeat = 3
+
+    params = ([10000, 100000], [1, 4])
+    param_names = ['n_runs', 'n_workers']
+
+    timer = time.perf_counter
+
+    def setup(self, n_runs, n_workers):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'temp.db')
+        conn = connect(self.path, version=5)
+        experiment = new_experiment("test-experiment",
+                                    sample_name="test-sample", conn=conn)
+
+        meas = Measurement(experiment)
+        x1 = ManualParameter('x1')
+        y1 = ManualParameter('y1')
+        meas.register_parameter(x1)
+        meas.register_parameter(y1, setpoints=[x1])
+        with meas.run() as datasaver:
+            datasaver.add_result((x1, 0), (y1, 0))
+        run_id = datasaver.run_id
+
+        # a run description of version 5, without a 'version' entry
+        description = json.loads(
+            conn.execute('SELECT run_description FROM runs').fetchone()[0])
+        description.pop('version')
+        runs = [(counter, str(uuid.uuid4()))
+                for counter in range(2, n_runs + 1)]
+        with atomic(conn) as conn:
+            conn.execute('ALTER TABLE runs ADD COLUMN sample_temperature')
+            conn.execute('UPDATE runs SET run_description = ?, '
+                         'sample_temperature = 0.01',
+                         (json.dumps(description),))
+            conn.cursor().executemany(
+                f"""
+                INSERT INTO runs (exp_id, name, result_table_name,
+                                  result_counter, run_timestamp,
+                                  completed_timestamp, is_completed,
+                                  parameters, guid, run_description,
+                                  snapshot, sample_temperature)
+                SELECT exp_id, name, result_table_name, ?, run_timestamp,
+                       completed_timestamp, is_completed, parameters, ?,
+                       run_description, snapshot, sample_temperature
+                FROM runs WHERE run_id = {run_id}
+                """, runs)
+        conn.close()
+        # connect without upgrading
+        self.conn = connect(self.path, version=5)
+
+    def teardown(self, n_runs, n_workers):
+        self.conn.close()
+        shutil.rmtree(self.tmpdir)
+
+    def time_upgrade(self, n_runs, n_workers):
+        perform_db_upgrade(self.conn, n_workers=n_workers)
+
+
+class ExtractRuns:
+    """
+    This benchmark measures how much time it takes to extract runs into
+    another database file, row by row with `extract_runs_into_db` or with
+    SQL-level copying with `bulk_extract_runs_into_db`.
+    """
+
+    number = 1
+    repeat = 3
+
+    params = ([10000, 100000], ['row_by_row', 'bulk'])
+    param_names = ['n_rows', 'method']
+
+    timer = time.perf_counter
+
+    n_runs = 5
+
+    def setup(self, n_rows, method):
+        self.tmpdir = tempfile.mkdtemp()
+        self.source_path = os.path.join(self.tmpdir, 'source.db')
+        qcodes.config["core"]["db_location"] = self.source_path
+        qcodes.config["core"]["db_debug"] = False
+        initialise_database()
+        self.experiment = new_experiment("test-experiment",
+                                         sample_name="test-sample")
+
+        meas = Measurement(self.experiment)
+        x1 = ManualParameter('x1')
+        y1 = ManualParameter('y1')
+        meas.register_parameter(x1)
+        meas.register_parameter(y1, setpoints=[x1])
+
+        self.run_ids = []
+        for _ in range(self.n_runs):
+            with meas.run() as datasaver:
+                datasaver.add_result_columns((x1, np.arange(n_rows)),
+                                             (y1, np.random.rand(n_rows)))
+            self.run_ids.append(datasaver.run_id)
+
+    def teardown(self, n_rows, method):
+        self.experiment.conn.close()
+        shutil.rmtree(self.tmpdir)
+
+    def time_extract_runs(self, n_rows, method):
+        target_path = os.path.join(self.tmpdir, f'target_{uuid.uuid4()}.db')
+        if method == 'bulk':
+            bulk_extract_runs_into_db(self.source_path, target_path,
+                                      *self.run_ids, show_progress=False)
+        else:
+            extract_runs_into_db(self.source_path, target_path,
+                                 *self.run_ids)
+
+
+def _read_continuously(path_to_db, run_id, stop, n_reads):
+    """
+    Keep loading a run and reading its data with a read-only connection,
+    like an analysis process does, until stop is set
+    """
+    conn = connect(path_to_db, read_only=True)
+    while not stop.is_set():
+        load_by_id(run_id, conn=conn).get_parameter_data('y1')
+        with n_reads.get_lock():
+            n_reads.value += 1
+    conn.close()
+
+
+class ReadOnlyReadersStress:
+    """
+    This benchmark measures the latency of writing data at 10 kHz, in
+    batches that are committed every 10 ms, while several processes keep
+    reading the run with read-only connections, for each PRAGMA profile of
+    the writer. The percentiles of the latencies of the batches are
+    reported.
+    """
+
+    params = ([0, 1, 4], list(PRAGMA_PROFILES))
+    param_names = ['n_readers', 'pragma_profile']
+
+    timeout = 600
+
+    rate = 10000  # points per second
+    batch_period = 0.01  # seconds
+    duration = 5  # seconds
+
+    def setup_cache(self):
+        latencies = {}
+        for n_readers in self.params[0]:
+            for pragma_profile in self.params[1]:
+                latencies[(n_readers, pragma_profile)] = \
+                    self._write_with_readers(n_readers, pragma_profile)
+        return latencies
+
+    def _write_with_readers(self, n_readers, pragma_profile):
+        """
+        Write at the given rate while n_readers processes read the run and
+        return the latencies of writing the batches in milliseconds as well
+        as the total number of reads
+        """
+        tmpdir = tempfile.mkdtemp()
+        path_to_db = os.path.join(tmpdir, 'temp.db')
+        qcodes.config["core"]["db_location"] = path_to_db
+        qcodes.config["core"]["db_debug"] = False
+        qcodes.config["core"]["db_pragma_profile"] = pragma_profile
+        initialise_database()
+        experiment = new_experiment("test-experiment",
+                                    sample_name="test-sample")
+
+        meas = Measurement(experiment)
+        x1 = ManualParameter('x1')
+        y1 = ManualParameter('y1')
+        meas.register_parameter(x1)
+        meas.register_parameter(y1, setpoints=[x1])
+
+        batch_size = int(self.rate * self.batch_period)
+        n_batches = int(self.duration / self.batch_period)
+        latencies = np.empty(n_batches)
+        stop = multiprocessing.Event()
+        n_reads = multiprocessing.Value('i', 0)
+
+        with meas.run() as datasaver:
+            datasaver.add_result_columns((x1, np.arange(batch_size)),
+                                         (y1, np.random.rand(batch_size)))
+            readers = [multiprocessing.Process(
+                           target=_read_continuously,
+                           args=(path_to_db, datasaver.run_id, stop, n_reads))
+                       for _ in range(n_readers)]
+            for reader in readers:
+                reader.start()
+
+            start = time.perf_counter()
+            for i in range(n_batches):
+                t_batch = time.perf_counter()
+                datasaver.add_result_columns(
+                    (x1, np.arange(batch_size)),
+                    (y1, np.random.rand(batch_size)))
+                latencies[i] = time.perf_counter() - t_batch
+                time.sleep(max(0., start + (i + 1) * self.batch_period
+                               - time.perf_counter()))
+
+            stop.set()
+            for reader in readers:
+                reader.join()
+
+        experiment.conn.close()
+        shutil.rmtree(tmpdir)
+        qcodes.config["core"]["db_pragma_profile"] = 'default'
+        return latencies * 1000, n_reads.value
+
+    def track_write_latency_p50(self, latencies, n_readers, pragma_profile):
+        return np.percentile(latencies[(n_readers, pragma_profile)][0], 50)
+
+    def track_write_latency_p99(self, latencies, n_readers, pragma_profile):
+        return np.percentile(latencies[(n_readers, pragma_profile)][0], 99)
+
+    def track_write_latency_max(self, latencies, n_readers, pragma_profile):
+        return np.max(latencies[(n_readers, pragma_profile)][0])
+
+    def track_reads_per_second(self, latencies, n_readers, pragma_profile):
+        return latencies[(n_readers, pragma_profile)][1] / self.duration
+
+    track_write_latency_p50.unit = 'ms'
+    track_write_latency_p99.unit = 'ms'
+    track_write_latency_max.unit = 'ms'
+    track_reads_per_second.unit = 'reads/s'
+
+
+class ListingRuns:
+    """
+    This benchmark measures how much time it takes to list all runs of an
+    experiment with their GUIDs, names, timestamps, number of results and
+    a metadata tag, by constructing a DataSet for every run and with the
+    catalogue of the runs.
+    """
+
+    params = ([1000, 10000], ['data_sets', 'list_runs'])
+    param_names = ['n_runs', 'method']
+
+    timer = time.perf_counter
+
+    def setup(self, n_runs, method):
+        self.tmpdir = tempfile.mkdtemp()
+        self.conn = connect(os.path.join(self.tmpdir, 'temp.db'))
+        self.experiment = new_experiment("test-experiment",
+                                         sample_name="test-sample",
+                                         conn=self.conn)
+
+        meas = Measurement(self.experiment)
+        x1 = ManualParameter('x1')
+        y1 = ManualParameter('y1')
+        meas.register_parameter(x1)
+        meas.register_parameter(y1, setpoints=[x1])
+        with meas.run() as datasaver:
+            datasaver.add_result_columns((x1, np.arange(100)),
+                                         (y1, np.arange(100)))
+        datasaver.dataset.add_metadata('sample_temperature', 0.01)
+        run_id = datasaver.run_id
+
+        # the copies of the first run share its results table
+        runs = [(counter, str(uuid.uuid4()))
+                for counter in range(2, n_runs + 1)]
+        with atomic(self.conn) as conn:
+            conn.cursor().executemany(
+                f"""
+                INSERT INTO runs (exp_id, name, result_table_name,
+                                  result_counter, run_timestamp,
+                                  completed_timestamp, is_completed,
+                                  parameters, guid, run_description,
+                                  snapshot)
+                SELECT exp_id, name, result_table_name, ?, run_timestamp,
+                       completed_timestamp, is_completed, parameters, ?,
+                       run_description, snapshot
+                FROM runs WHERE run_id = {run_id}
+                """, runs)
+            conn.execute(
+                f"""
+                INSERT INTO run_metadata (run_id, tag, value)
+                SELECT runs.run_id, tag, value
+                FROM runs, run_metadata
+                WHERE run_metadata.run_id = {run_id}
+                AND runs.run_id != {run_id}
+                """)
+            conn.execute(
+                f"""
+                INSERT INTO layouts (run_id, parameter, label, unit,
+                                     inferred_from)
+                SELECT runs.run_id, parameter, label, unit, inferred_from
+                FROM runs, layouts
+                WHERE layouts.run_id = {run_id} AND runs.run_id != {run_id}
+                """)
+
+    def teardown(self, n_runs, method):
+        self.conn.close()
+        shutil.rmtree(self.tmpdir)
+
+    def time_list_runs(self, n_runs, method):
+        if method == 'data_sets':
+            [(dataset.guid, dataset.name, dataset.run_timestamp_raw,
+              len(dataset), dataset.metadata.get('sample_temperature'))
+             for dataset in self.experiment.data_sets()]
+        else:
+            list_runs(self.conn, exp_id=self.experiment.exp_id,
+                      metadata_columns=['sample_temperature'])
+
+
+
+class MetadataQueries:
+    """
+    This benchmark measures how much time it takes to load the metadata of a
+    run and to find runs by their metadata, in a database with many runs
+    with many metadata tags each. Every run has the value run_id % 100 under
+    all tags.
+    """
+
+    params = ([1000, 10000], [10, 300])
+    param_names = ['n_runs', 'n_tags']
+
+    timer = time.perf_counter
+
+    def setup(self, n_runs, n_tags):
+        self.tmpdir = tempfile.mkdtemp()
+        self.run_cache_size = qcodes.config["core"]["db_run_cache_size"]
+        qcodes.config["core"]["db_run_cache_size"] = 0
+        self.conn = connect(os.path.join(self.tmpdir, 'temp.db'))
+        experiment = new_experiment("test-experiment",
+                                    sample_name="test-sample",
+                                    conn=self.conn)
+
+        meas = Measurement(experiment)
+        x1 = ManualParameter('x1')
+        y1 = ManualParameter('y1')
+        meas.register_parameter(x1)
+        meas.register_parameter(y1, setpoints=[x1])
+        with meas.run() as datasaver:
+            datasaver.add_result((x1, 0), (y1, 0))
+        run_id = datasaver.run_id
+
+        runs = [(counter, str(uuid.uuid4()))
+                for counter in range(2, n_runs + 1)]
+        with atomic(self.conn) as conn:
+            conn.cursor().executemany(
+                f"""
+                INSERT INTO runs (exp_id, name, result_table_name,
+                                  result_counter, run_timestamp,
+                                  completed_timestamp, is_completed,
+                                  parameters, guid, run_description,
+                                  snapshot)
+                SELECT exp_id, name, result_table_name, ?, run_timestamp,
+                       completed_timestamp, is_completed, parameters, ?,
+                       run_description, snapshot
+                FROM runs WHERE run_id = {run_id}
+                """, runs)
+            conn.cursor().executemany(
+                """
+                INSERT INTO run_metadata (run_id, tag, value)
+                SELECT run_id, ?, run_id % 100 FROM runs
+                """, [(f'tag_{i}',) for i in range(n_tags)])
+
+        self.run_id = n_runs // 2
+
+    def teardown(self, n_runs, n_tags):
+        qcodes.config["core"]["db_run_cache_size"] = self.run_cache_size
+        self.conn.close()
+        shutil.rmtree(self.tmpdir)
+
+    def time_load_metadata(self, n_runs, n_tags):
+        load_by_id(self.run_id, conn=self.conn).metadata
+
+    def time_find_runs(self, n_runs, n_tags):
+        find_runs(self.conn, tag_0=42, tag_1=42)
+
+
+def _station_snapshot(value):
+    """
+    Return the JSON of the snapshot of a station with 30 instruments with
+    200 parameters each, one of which has the given value
+    """
+    instruments = {
+        f'instr{i}': {
+            'name': f'instr{i}',
+            'parameters': {
+                f'param{j}': {'name': f'param{j}', 'unit': 'V',
+                              'label': f'Parameter {j}',
+                              'value': value if (i, j) == (0, 0) else j / 3,
+                              'ts': '2020-01-01 00:00:00'}
+                for j in range(200)}}
+        for i in range(30)}
+    return json.dumps({'station': {'instruments': instruments}})
+
+
+class SnapshotStorage:
+    """
+    This benchmark measures how much time it takes to add the snapshot of
+    a station with 30 instruments to a run, and how much the database file
+    grows per snapshot, with snapshots that change in one parameter from
+    run to run, for plain and for compressed snapshot storage.
+    """
+
+    params = ([None, 'zlib', 'lzma'],)
+    param_names = ['compression']
+
+    timer = time.perf_counter
+
+    n_runs = 20
+
+    def setup(self, compression):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path_to_db = os.path.join(self.tmpdir, 'temp.db')
+        qcodes.config["core"]["db_location"] = self.path_to_db
+        qcodes.config["core"]["db_debug"] = False
+        qcodes.config["core"]["db_snapshot_compression"] = compression
+        initialise_database()
+        new_experiment("test-experiment", sample_name="test-sample")
+
+        self.snapshots = [_station_snapshot(value)
+                          for value in range(self.n_runs)]
+        self.datasets = []
+        for _ in range(self.n_runs):
+            dataset = DataSet()
+            dataset.mark_started()
+            self.datasets.append(dataset)
+
+    def teardown(self, compression):
+        qcodes.config["core"]["db_snapshot_compression"] = None
+        for dataset in self.datasets:
+            dataset.conn.close()
+        shutil.rmtree(self.tmpdir)
+
+    def time_add_snapshot(self, compression):
+        for dataset, snapshot in zip(self.datasets, self.snapshots):
+            dataset.add_snapshot(snapshot)
+
+    def track_bytes_per_snapshot(self, compression):
+        size = os.path.getsize(self.path_to_db)
+        self.time_add_snapshot(compression)
+        self.datasets[0].conn.execute('VACUUM')
+        return (os.path.getsize(self.path_to_db) - size) / self.n_runs
+
+    track_bytes_per_snapshot.unit = 'bytes'
+
+
+class SnapshotAccess:
+    """
+    This benchmark measures how much time it takes to compare the value of
+    one parameter in the snapshots of many runs, by parsing the snapshots
+    and with `DataSet.snapshot_get`, for plain and compressed snapshots.
+    """
+
+    params = ([None, 'zlib'], ['snapshot', 'snapshot_get'])
+    param_names = ['compression', 'method']
+
+    timer = time.perf_counter
+
+    n_runs = 20
+
+    def setup(self, compression, method):
+        self.tmpdir = tempfile.mkdtemp()
+        qcodes.config["core"]["db_location"] = os.path.join(self.tmpdir,
+                                                            'temp.db')
+        qcodes.config["core"]["db_debug"] = False
+        qcodes.config["core"]["db_snapshot_compression"] = compression
+        initialise_database()
+        experiment = new_experiment("test-experiment",
+                                    sample_name="test-sample")
+        self.run_ids = []
+        for value in range(self.n_runs):
+            dataset = DataSet(conn=experiment.conn)
+            dataset.mark_started()
+            dataset.add_snapshot(_station_snapshot(value))
+            dataset.mark_completed()
+            self.run_ids.append(dataset.run_id)
+        self.conn = experiment.conn
+
+    def teardown(self, compression, method):
+        qcodes.config["core"]["db_snapshot_compression"] = None
+        self.conn.close()
+        shutil.rmtree(self.tmpdir)
+
+    def time_compare_parameter(self, compression, method):
+        for run_id in self.run_ids:
+            dataset = load_by_id(run_id, conn=self.conn)
+            if method == 'snapshot':
+                dataset.snapshot['station']['instruments']['instr0'][
+                    'parameters']['param0']['value']
+            else:
+                dataset.snapshot_get(
+                    'station.instruments.instr0.parameters.param0.value')
+
+
+class PlottingDecimation:
+    """
+    This benchmark measures how much time it takes to plot and render a
+    1D trace and a 2D map of increasing size, with and without decimating
+    the data to the resolution of the figure.
+    """
+
+    params = ([10**4, 10**5, 10**6], ['1D', '2D'], [None, 'auto'])
+    param_names = ['n_points', 'dims', 'max_points']
+
+    timer = time.perf_counter
+
+    def setup(self, n_points, dims, max_points):
+        plt.switch_backend('agg')
+        self.tmpdir = tempfile.mkdtemp()
+        qcodes.config["core"]["db_location"] = os.path.join(self.tmpdir,
+                                                            'temp.db')
+        qcodes.config["core"]["db_debug"] = False
+        initialise_database()
+        experiment = new_experiment("test-experiment",
+                                    sample_name="test-sample")
+
+        meas = Measurement(experiment)
+        x1 = ManualParameter('x1')
+        x2 = ManualParameter('x2')
+        y1 = ManualParameter('y1')
+        meas.register_parameter(x1)
+        if dims == '1D':
+            meas.register_parameter(y1, setpoints=[x1])
+        else:
+            meas.register_parameter(x2)
+            meas.register_parameter(y1, setpoints=[x1, x2])
+            side = int(np.sqrt(n_points))
+            meas.set_shapes({'y1': (side, side)})
+        with meas.run() as datasaver:
+            if dims == '1D':
+                datasaver.add_result_columns(
+                    (x1, np.arange(n_points)),
+                    (y1, np.cumsum(np.random.randn(n_points))))
+            else:
+                datasaver.add_result_columns(
+                    (x1, np.repeat(np.arange(side), side)),
+                    (x2, np.tile(np.arange(side), side)),
+                    (y1, np.random.randn(side * side)))
+        self.dataset = datasaver.dataset
+
+    def teardown(self, n_points, dims, max_points):
+        plt.close('all')
+        self.dataset.conn.close()
+        shutil.rmtree(self.tmpdir)
+
+    def time_plot_and_render(self, n_points, dims, max_points):
+        axes, _ = plot_dataset(self.dataset, max_points=max_points)
+        axes[0].figure.canvas.draw()
+
+
+class GUIDLookups:
+    """
+    This benchmark measures how much time it takes to look up the run_ids of
+    1000 GUIDs in several databases with many runs each, GUID by GUID, in
+    bulk per database and with the persistent side index of
+    `GUIDResolver`, which is up to date except when it is built from
+    scratch.
+    """
+
+    params = ([1000, 100000],)
+    param_names = ['n_runs']
+
+    timer = time.perf_counter
+
+    n_dbs = 3
+    n_guids = 1000
+
+    def setup(self, n_runs):
+        self.tmpdir = tempfile.mkdtemp()
+        self.conns = []
+        guids = []
+        for i in range(self.n_dbs):
+            conn = connect(os.path.join(self.tmpdir, f'db_{i}.db'))
+            experiment = new_experiment("test-experiment",
+                                        sample_name="test-sample",
+                                        conn=conn)
+            meas = Measurement(experiment)
+            meas.register_parameter(ManualParameter('x1'))
+            with meas.run() as datasaver:
+                pass
+            runs = [(counter, str(uuid.uuid4()))
+                    for counter in range(2, n_runs + 1)]
+            with atomic(conn) as atomic_conn:
+                atomic_conn.cursor().executemany(
+                    f"""
+                    INSERT INTO runs (exp_id, name, result_table_name,
+                                      result_counter, run_timestamp,
+                                      completed_timestamp, is_completed,
+                                      parameters, guid, run_description)
+                    SELECT exp_id, name, result_table_name, ?,
+                           run_timestamp, completed_timestamp, is_completed,
+                           parameters, ?, run_description
+                    FROM runs WHERE run_id = {datasaver.run_id}
+                    """, runs)
+            self.conns.append(conn)
+            guids += [guid for _, guid in runs]
+
+        rng = np.random.RandomState(0)
+        self.guids = [guids[i] for i in rng.choice(len(guids), self.n_guids)]
+        self.resolver = GUIDResolver(
+            os.path.join(self.tmpdir, 'index.db'),
+            [conn.path_to_dbfile for conn in self.conns])
+        self.resolver.refresh()
+
+    def teardown(self, n_runs):
+        self.resolver.close()
+        for conn in self.conns:
+            conn.close()
+        shutil.rmtree(self.tmpdir)
+
+    def time_get_runid_from_guid(self, n_runs):
+        for conn in self.conns:
+            for guid in self.guids:
+                get_runid_from_guid(conn, guid)
+
+    def time_get_runids_from_guids(self, n_runs):
+        for conn in self.conns:
+            get_runids_from_guids(conn, self.guids)
+
+    def time_resolve(self, n_runs):
+        self.resolver.resolve(self.guids)
+
+    def time_build_index(self, n_runs):
+        self.resolver.refresh(full=True)
+
+
+class NpyExport:
+    """
+    This benchmark measures how much time and memory it takes to analyse
+    (here: to average) the data of a large run, read from the database and
+    memory-mapped from an export to .npy files, and how long the export
+    takes.
+    """
+
+    params = ([10**5, 10**6],)
+    param_names = ['n_points']
+
+    timer = time.perf_counter
+
+    def setup(self, n_points):
+        self.tmpdir = tempfile.mkdtemp()
+        self.conn = connect(os.path.join(self.tmpdir, 'temp.db'))
+        experiment = new_experiment("test-experiment",
+                                    sample_name="test-sample",
+                                    conn=self.conn)
+        meas = Measurement(experiment)
+        x1 = ManualParameter('x1')
+        y1 = ManualParameter('y1')
+        meas.register_parameter(x1)
+        meas.register_parameter(y1, setpoints=[x1])
+        with meas.run() as datasaver:
+            datasaver.add_result_columns((x1, np.arange(n_points)),
+                                         (y1, np.random.randn(n_points)))
+        self.dataset = datasaver.dataset
+        self.path = self.dataset.export(
+            format='npy', path=os.path.join(self.tmpdir, 'run'))
+
+    def teardown(self, n_points):
+        self.conn.close()
+        shutil.rmtree(self.tmpdir)
+
+    def time_export(self, n_points):
+        self.dataset.export(format='npy',
+                            path=os.path.join(self.tmpdir, 'export'))
+
+    def time_mean_from_db(self, n_points):
+        self.dataset.get_parameter_data('y1')['y1']['y1'].mean()
+
+    def time_mean_from_npy_dir(self, n_points):
+        load_from_npy_dir(self.path)['y1']['y1'].mean()
+
+    def peakmem_mean_from_db(self, n_points):
+        self.dataset.get_parameter_data('y1')['y1']['y1'].mean()
+
+    def peakmem_mean_from_npy_dir(self, n_points):
+        load_from_npy_dir(self.path)['y1']['y1'].mean()
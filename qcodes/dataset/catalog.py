@@ -0,0 +1,215 @@
+"""
+This module provides a catalogue of the runs in a database, for listing and
+browsing many runs quickly. As opposed to constructing a `DataSet` for
+every run, which issues several queries per run, `list_runs` fetches the
+runs matching the given filters, together with their experiments, with a
+single query, and returns them as lightweight `RunInfo` tuples. The number
+of results of the runs is looked up with one more query per page of runs.
+`find_runs` searches runs by their metadata, using the index of the
+run_metadata table.
+"""
+from typing import (Any, Dict, Iterable, List, Mapping, NamedTuple,
+                    Optional, Sequence, Tuple)
+
+from qcodes.dataset.sqlite.connection import (ConnectionPlus,
+                                              atomic_transaction)
+from qcodes.dataset.sqlite.database import get_pooled_connection
+from qcodes.dataset.sqlite.run_shards import attach_run_shard
+
+
+# the number of results tables of which the lengths are looked up with a
+# single compound query, well below the limit of SQLite on compound queries
+_RESULT_COUNTS_CHUNK_SIZE = 200
+
+
+class RunInfo(NamedTuple):
+    """
+    The catalogue entry of a run
+    """
+    run_id: int
+    exp_id: int
+    exp_name: str
+    sample_name: str
+    name: str
+    guid: str
+    run_timestamp_raw: Optional[float]
+    completed_timestamp_raw: Optional[float]
+    is_completed: bool
+    result_count: Optional[int]
+    parameters: Tuple[str, ...]
+    metadata: Dict[str, Any]
+
+
+def _result_counts(conn: ConnectionPlus,
+                   runs: Sequence[Tuple[str, str]]) -> List[int]:
+    """
+    Return the number of results of the given runs, given by their results
+    table names and GUIDs. The lengths of the results tables in the central
+    database are looked up with a single query per chunk of tables, those
+    of runs stored in shards one at a time.
+    """
+    counts: Dict[str, int] = {}
+    in_main: List[str] = []
+    for table_name, guid in runs:
+        if attach_run_shard(conn, guid) is None:
+            in_main.append(table_name)
+        else:
+            cursor = atomic_transaction(
+                conn, f'SELECT MAX(id) FROM "{table_name}"')
+            counts[table_name] = cursor.fetchone()[0] or 0
+
+    for start in range(0, len(in_main), _RESULT_COUNTS_CHUNK_SIZE):
+        chunk = in_main[start:start + _RESULT_COUNTS_CHUNK_SIZE]
+        sql = ' UNION ALL '.join(f'SELECT ?, MAX(id) FROM "{table_name}"'
+                                 for table_name in chunk)
+        cursor = atomic_transaction(conn, sql, *chunk)
+        for table_name, count in cursor.fetchall():
+            counts[table_name] = count or 0
+
+    return [counts[table_name] for table_name, _ in runs]
+
+
+def list_runs(conn: Optional[ConnectionPlus] = None, *,
+              exp_id: Optional[int] = None,
+              exp_name: Optional[str] = None,
+              sample_name: Optional[str] = None,
+              name: Optional[str] = None,
+              started_after: Optional[float] = None,
+              started_before: Optional[float] = None,
+              is_completed: Optional[bool] = None,
+              metadata: Optional[Mapping[str, Any]] = None,
+              tags: Iterable[str] = (),
+              metadata_columns: Iterable[str] = (),
+              result_counts: bool = True,
+              newest_first: bool = False,
+              limit: Optional[int] = None,
+              offset: int = 0) -> List[RunInfo]:
+    """
+    List the runs in a database that match all of the given filters,
+    ordered by run_id.
+
+    Args:
+        conn: The connection to the database. If None, a pooled connection
+            to the database from the config is used.
+        exp_id: Only list runs of the experiment with this exp_id
+        exp_name: Only list runs of experiments with this name
+        sample_name: Only list runs of experiments with this sample name
+        name: Only list runs with this name
+        started_after: Only list runs started at or after this time, in
+            seconds since the epoch (see `DataSet.run_timestamp_raw`)
+        started_before: Only list runs started before this time
+        is_completed: If not None, only list completed or only list
+            not completed runs
+        metadata: Only list runs with these values of the given metadata
+            tags
+        tags: Only list runs that have metadata under all of these tags
+        metadata_columns: The metadata tags to include in the
+            ``metadata`` of the entries. Tags in ``metadata`` and ``tags``
+            are included as well. Runs without metadata under a tag get
+            None.
+        result_counts: Whether to look up the number of results of the
+            runs. If False, the ``result_count`` of the entries is None.
+        newest_first: List the runs in descending order of run_id
+        limit: The maximum number of runs to list, for paging through the
+            runs together with ``offset``
+        offset: The number of matching runs to skip
+
+    Returns:
+        A list of `RunInfo`, one for every matching run
+    """
+    conn = get_pooled_connection() if conn is None else conn
+    metadata = {} if metadata is None else dict(metadata)
+    tags = list(tags)
+    columns = list(dict.fromkeys([*metadata_columns, *metadata, *tags]))
+
+    conditions: List[str] = []
+    values: List[Any] = []
+
+    def add_condition(condition: str, value: Any) -> None:
+        conditions.append(condition)
+        values.append(value)
+
+    if exp_id is not None:
+        add_condition('runs.exp_id = ?', exp_id)
+    if exp_name is not None:
+        add_condition('experiments.name = ?', exp_name)
+    if sample_name is not None:
+        add_condition('experiments.sample_name = ?', sample_name)
+    if name is not None:
+        add_condition('runs.name = ?', name)
+    if started_after is not None:
+        add_condition('runs.run_timestamp >= ?', started_after)
+    if started_before is not None:
+        add_condition('runs.run_timestamp < ?', started_before)
+    if is_completed is not None:
+        add_condition('runs.is_completed = ?', int(is_completed))
+    # the metadata conditions are looked up with the index of run_metadata
+    # on tag and value
+    for tag, value in metadata.items():
+        conditions.append('runs.run_id IN (SELECT run_id FROM run_metadata '
+                          'WHERE tag = ? AND value = ?)')
+        values += [tag, value]
+    for tag in tags:
+        add_condition('runs.run_id IN (SELECT run_id FROM run_metadata '
+                      'WHERE tag = ?)', tag)
+
+    selected_columns = ', '.join(
+        '(SELECT value FROM run_metadata '
+        'WHERE run_metadata.run_id = runs.run_id AND tag = ?)'
+        for _ in columns)
+    sql = f"""
+    SELECT runs.run_id, runs.exp_id, experiments.name,
+           experiments.sample_name, runs.name, runs.guid,
+           runs.run_timestamp, runs.completed_timestamp, runs.is_completed,
+           runs.parameters, runs.result_table_name
+           {', ' + selected_columns if columns else ''}
+    FROM runs
+    JOIN experiments ON experiments.exp_id = runs.exp_id
+    {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+    ORDER BY runs.run_id {'DESC' if newest_first else 'ASC'}
+    LIMIT ? OFFSET ?
+    """
+    values = [*columns, *values, -1 if limit is None else limit, offset]
+    rows = atomic_transaction(conn, sql, *values).fetchall()
+
+    if result_counts:
+        counts: Sequence[Optional[int]] = _result_counts(
+            conn, [(row[10], row[5]) for row in rows])
+    else:
+        counts = [None] * len(rows)
+
+    return [RunInfo(run_id=row[0],
+                    exp_id=row[1],
+                    exp_name=row[2],
+                    sample_name=row[3],
+                    name=row[4],
+                    guid=row[5],
+                    run_timestamp_raw=row[6],
+                    completed_timestamp_raw=row[7],
+                    is_completed=bool(row[8]),
+                    result_count=count,
+                    parameters=tuple(row[9].split(',')) if row[9] else (),
+                    metadata=dict(zip(columns, row[11:])))
+            for row, count in zip(rows, counts)]
+
+
+def find_runs(conn: Optional[ConnectionPlus] = None,
+              **metadata: Any) -> List[RunInfo]:
+    """
+    Find the runs in a database that have the given values of metadata,
+    ordered by run_id. For example, ``find_runs(sample='A', cooldown=3)``
+    finds the runs with metadata 'A' under the tag 'sample' and 3 under the
+    tag 'cooldown'. The runs are looked up by the index of the metadata on
+    tag and value, such that the search is fast for large databases. See
+    `list_runs` for combining the search with other filters.
+
+    Args:
+        conn: The connection to the database. If None, a pooled connection
+            to the database from the config is used.
+        metadata: The values of metadata of the runs to find, by tag
+
+    Returns:
+        A list of `RunInfo`, one for every matching run, with the given
+        metadata as ``metadata``
+    """
+    return list_runs(conn, metadata=metadata)
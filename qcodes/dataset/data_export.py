@@ -1,11 +1,11 @@
-from typing import List, Any, Sequence, Tuple, Dict, Union
+from typing import List, Any, Sequence, Tuple, Dict, Union, Optional
 import logging
 
 import numpy as np
 
 from qcodes.dataset.descriptions.param_spec import ParamSpecBase
 from qcodes.dataset.sqlite.queries import (get_dependencies, get_dependents,
-                                           get_layout)
+                                           get_layout, get_parameter_data)
 from qcodes.dataset.data_set import load_by_id
 
 log = logging.getLogger(__name__)
@@ -72,8 +72,10 @@ def get_data_by_id(run_id: int) -> List:
 
     dependent_parameters: Tuple[ParamSpecBase, ...] = ds.dependent_parameters
 
-    parameter_data = ds.get_parameter_data(
-        *[ps.name for ps in dependent_parameters])
+    # the data is flattened anyway, hence it is not shaped (and padded)
+    # according to the shapes of the run
+    parameter_data = get_parameter_data(
+        ds.conn, ds.table_name, [ps.name for ps in dependent_parameters])
 
     output = []
 
@@ -284,7 +286,8 @@ def datatype_from_setpoints_1d(setpoints: np.ndarray) -> str:
 
 def get_2D_plottype(xpoints: np.ndarray,
                     ypoints: np.ndarray,
-                    zpoints: np.ndarray) -> str:
+                    zpoints: np.ndarray,
+                    shape: Optional[Tuple[int, ...]] = None) -> str:
     """
     Determine plot type for a 2D plot by inspecting the data
 
@@ -299,10 +302,15 @@ def get_2D_plottype(xpoints: np.ndarray,
         xpoints: The x-axis values
         ypoints: The y-axis values
         zpoints: The z-axis (colorbar) values
+        shape: The shape of the sweep as recorded for the run, if any. If
+            the data is on a grid of this shape, the inspection of the data
+            is skipped
 
     Returns:
         Determined plot type as a string
     """
+    if _grid_from_shape(xpoints, ypoints, zpoints, shape) is not None:
+        return '2D_grid'
 
     plottype = datatype_from_setpoints_2d(xpoints, ypoints)
     return plottype
@@ -370,26 +378,66 @@ def datatype_from_setpoints_2d(xpoints: np.ndarray,
     return '2D_unknown'
 
 
-def reshape_2D_data(x: np.ndarray, y: np.ndarray, z: np.ndarray
+def _grid_from_shape(x: np.ndarray, y: np.ndarray, z: np.ndarray,
+                     shape: Optional[Tuple[int, ...]]
+                     ) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Put the data of a 2D sweep of known shape onto a grid, which only takes
+    a reshape and a few vectorised checks. The output is the same as that of
+    `reshape_2D_data`. Returns None if the data does not fill a rectangular
+    grid of the given shape, e.g. if the run has not been completed.
+    """
+    if shape is None or len(shape) != 2 or z.size != np.prod(shape):
+        return None
+    if x.dtype.kind not in 'biuf' or y.dtype.kind not in 'biuf':
+        return None
+    x2 = x.reshape(shape)
+    y2 = y.reshape(shape)
+    z2 = z.reshape(shape)
+    if (x2 == x2[:, :1]).all() and (y2 == y2[:1, :]).all():
+        # x is the outer (slow) axis of the sweep
+        xrow, yrow, z_grid = x2[:, 0], y2[0, :], z2.T
+    elif (x2 == x2[:1, :]).all() and (y2 == y2[:, :1]).all():
+        xrow, yrow, z_grid = x2[0, :], y2[:, 0], z2
+    else:
+        return None
+
+    # the axes are sorted, like the rows found by reshape_2D_data
+    x_order = np.argsort(xrow)
+    y_order = np.argsort(yrow)
+    xrow = xrow[x_order]
+    yrow = yrow[y_order]
+    if not ((np.diff(xrow) > 0).all() and (np.diff(yrow) > 0).all()):
+        return None
+    return xrow, yrow, z_grid[np.ix_(y_order, x_order)]
+
+
+def reshape_2D_data(x: np.ndarray, y: np.ndarray, z: np.ndarray,
+                    shape: Optional[Tuple[int, ...]] = None
                     ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Put the data of a 2D sweep onto a grid. If the shape of the sweep is
+    known, the grid is found by `_grid_from_shape`, otherwise (e.g. for runs
+    without shapes) it is inferred from the data.
+    """
+    grid = _grid_from_shape(x, y, z, shape)
+    if grid is not None:
+        return grid
+
     xrow = np.array(_rows_from_datapoints(x)[0])
     yrow = np.array(_rows_from_datapoints(y)[0])
     nx = len(xrow)
     ny = len(yrow)
 
-    # potentially slow method of filling in the data, should be optimised
     log.debug('Sorting 2D data onto grid')
 
     if isinstance(z[0], str):
         z_to_plot = np.full((ny, nx), '', dtype=z.dtype)
     else:
         z_to_plot = np.full((ny, nx), np.nan)
-    x_index = np.zeros_like(x, dtype=np.int)
-    y_index = np.zeros_like(y, dtype=np.int)
-    for i, xval in enumerate(xrow):
-        x_index[np.where(x == xval)[0]] = i
-    for i, yval in enumerate(yrow):
-        y_index[np.where(y == yval)[0]] = i
+    # the rows are the sorted unique values of the setpoints
+    x_index = np.searchsorted(xrow, x)
+    y_index = np.searchsorted(yrow, y)
 
     z_to_plot[y_index, x_index] = z
 
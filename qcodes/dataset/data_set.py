@@ -1,8 +1,8 @@
 import functools
 import json
 from typing import (Any, Dict, List, Optional, Union, Sized, Callable,
-                    Sequence, Tuple)
-from threading import Thread
+                    Sequence, Tuple, Mapping, Iterator, TYPE_CHECKING)
+from threading import Condition, Lock, Thread
 import time
 import importlib
 import logging
@@ -19,18 +19,26 @@ from qcodes.dataset.sqlite.connection import atomic, atomic_transaction, \
 from qcodes.dataset.sqlite.queries import add_parameter, create_run, \
     completed, get_experiments, get_last_experiment, \
     add_meta_data, mark_run_complete, get_data, get_parameter_data, \
+    iter_parameter_data, \
     get_values, get_setpoints, get_metadata, get_metadata_from_run_id, \
     get_experiment_name_from_experiment_id, \
     get_sample_name_from_experiment_id, get_guid_from_run_id, \
-    get_runid_from_guid, get_run_timestamp_from_run_id, get_run_description,\
+    get_runid_from_guid, get_run_timestamp_from_run_id, get_run_describer, \
     get_completed_timestamp_from_run_id, update_run_description, run_exists,\
-    remove_trigger, set_run_timestamp
+    remove_trigger, set_run_timestamp, DTypeHint
 from qcodes.dataset.sqlite.query_helpers import select_one_where, length, \
-    insert_many_values, insert_values, VALUE, one
+    insert_many_values, insert_values, VALUE, one, insert_many_columns
 from qcodes.dataset.sqlite.database import get_DB_location, connect, \
-    conn_from_dbpath_or_conn
+    conn_from_dbpath_or_conn, get_pooled_connection, reconnect_if_closed
+from qcodes.dataset.sqlite.run_shards import attach_run_shard, \
+    create_run_shard, run_shards_enabled
+from qcodes.dataset.sqlite.snapshot_store import add_snapshot, get_snapshot, \
+    get_snapshot_entry, _json_entry
 from qcodes.instrument.parameter import _BaseParameter
-from qcodes.dataset.descriptions.rundescriber import RunDescriber
+from qcodes.dataset.descriptions.rundescriber import RunDescriber, Shapes
+from qcodes.dataset.data_set_cache import DataSetCache
+from qcodes.dataset.xarray_export import to_xarray_dataset, export_to_netcdf
+from qcodes.dataset.npy_export import export_to_npy_dir
 from qcodes.dataset.descriptions.dependencies import (InterDependencies_,
                                                       DependencyError)
 from qcodes.dataset.descriptions.versioning.v0 import InterDependencies
@@ -40,6 +48,9 @@ from qcodes.dataset.guids import generate_guid
 from qcodes.utils.deprecate import deprecate
 import qcodes.config
 
+if TYPE_CHECKING:
+    import xarray as xr
+
 
 log = logging.getLogger(__name__)
 
@@ -122,10 +133,18 @@ class _Subscriber(Thread):
 
         conn.create_function(self.callback_id, -1, self._cache_data_to_queue)
 
+        # a trigger must be stored in the same database as its table, which
+        # is the shard of the run if it has one
+        shard_schema = attach_run_shard(conn, dataSet.guid)
+        if shard_schema is not None:
+            trigger_name = f'"{shard_schema}".{self.trigger_id}'
+        else:
+            trigger_name = self.trigger_id
+
         parameters = dataSet.get_parameters()
         sql_param_list = ",".join([f"NEW.{p.name}" for p in parameters])
         sql_create_trigger_for_callback = f"""
-        CREATE TRIGGER {self.trigger_id}
+        CREATE TRIGGER {trigger_name}
             AFTER INSERT ON '{self.table_name}'
         BEGIN
             SELECT {self.callback_id}({sql_param_list});
@@ -189,6 +208,204 @@ class _Subscriber(Thread):
         self.log.debug("Stopped subscriber")
 
 
+class _ResultBus:
+    """
+    In-process publish/subscribe bus for the results added to the runs.
+
+    Every DataSet that adds results to a run publishes them as one batch,
+    i.e. a dictionary of parameter names to NumPy arrays along the inserted
+    rows, to the subscribers of the run, which are identified by the GUID of
+    the run. Hence subscribers also get the results written via another
+    DataSet object (e.g. by a background writer) of the same process.
+    Building the batches only happens for runs that have subscribers.
+    """
+
+    def __init__(self) -> None:
+        self._subscribers: Dict[str, List['_BusSubscriber']] = {}
+        self._lock = Lock()
+
+    def register(self, guid: str, subscriber: '_BusSubscriber') -> None:
+        with self._lock:
+            self._subscribers.setdefault(guid, []).append(subscriber)
+
+    def unregister(self, guid: str, subscriber: '_BusSubscriber') -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(guid, [])
+            if subscriber in subscribers:
+                subscribers.remove(subscriber)
+            if not subscribers:
+                self._subscribers.pop(guid, None)
+
+    def has_subscribers(self, guid: str) -> bool:
+        return guid in self._subscribers
+
+    def publish(self, guid: str, batch: Dict[str, numpy.ndarray],
+                n_rows: int) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(guid, []))
+        for subscriber in subscribers:
+            subscriber.put(batch, n_rows)
+
+
+_result_bus = _ResultBus()
+
+
+class _BusSubscriber(Thread):
+    """
+    Class to add a subscriber to a DataSet that receives the results from the
+    in-process result bus. The thread sleeps on a condition variable until
+    at least `min_queue_length` rows have been published, the dataset is
+    completed or the subscriber is stopped, and then calls the callback with
+    all pending results.
+
+    If `as_arrays` is False, the callback gets the results as a list of
+    tuples with one value per parameter of the dataset, in the order of
+    `DataSet.get_parameters`, like the subscribers based on database
+    triggers. Otherwise it gets the list of published batches, i.e. of
+    dictionaries of parameter names to arrays.
+
+    The _BusSubscriber is not meant to be instantiated directly, but rather
+    used via the 'subscribe' method of the DataSet.
+
+    NOTE: Only the results written by the current process are published on
+    the bus. Use the trigger based subscribers to get notified about results
+    written by other processes.
+
+    NOTE: Special care shall be taken when using the *state* object: it is the
+    user's responsibility to operate with it in a thread-safe way.
+    """
+    def __init__(self,
+                 dataSet: 'DataSet',
+                 id_: str,
+                 callback: Callable[..., None],
+                 state: Optional[Any] = None,
+                 loop_sleep_time: int = 0,  # in milliseconds
+                 min_queue_length: int = 1,
+                 callback_kwargs: Optional[Dict[str, Any]] = None,
+                 as_arrays: bool = False
+                 ) -> None:
+        super().__init__(daemon=True)
+
+        self._id = id_
+
+        self.dataSet = dataSet
+        self.guid = dataSet.guid
+        self._data_set_len = len(dataSet)
+        self._parameter_names = [p.name for p in dataSet.get_parameters()]
+
+        self.state = state
+        self.as_arrays = as_arrays
+
+        self._batches: List[Tuple[Dict[str, numpy.ndarray], int]] = []
+        self._queue_length: int = 0
+        self._condition = Condition()
+        self._stop_signal: bool = False
+        self._done: bool = False
+        # convert milliseconds to seconds
+        self._loop_sleep_time = loop_sleep_time / 1000
+        self.min_queue_length = min_queue_length
+
+        if callback_kwargs is None or len(callback_kwargs) == 0:
+            self.callback = callback
+        else:
+            self.callback = functools.partial(callback, **callback_kwargs)
+
+        self.log = logging.getLogger(f"_BusSubscriber {self._id}")
+
+        _result_bus.register(self.guid, self)
+
+    def put(self, batch: Dict[str, numpy.ndarray], n_rows: int) -> None:
+        with self._condition:
+            self._batches.append((batch, n_rows))
+            self._queue_length += n_rows
+            if self._queue_length >= self.min_queue_length:
+                self._condition.notify()
+
+    def run(self) -> None:
+        self.log.debug("Starting subscriber")
+        self._loop()
+
+    def _wake_up(self) -> bool:
+        return (self._stop_signal or self._done
+                or self._queue_length >= self.min_queue_length)
+
+    def _loop(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(self._wake_up)
+                finished = self._stop_signal or self._done
+            if not finished and self._loop_sleep_time > 0:
+                # let results accumulate for at least the given time
+                with self._condition:
+                    self._condition.wait_for(
+                        lambda: self._stop_signal or self._done,
+                        timeout=self._loop_sleep_time)
+                    finished = self._stop_signal or self._done
+            if finished:
+                if self._done:
+                    self._call_callback_on_queue_data()
+                break
+            self._call_callback_on_queue_data()
+        self._clean_up()
+
+    def _take_batches(self) -> Tuple[List[Dict[str, numpy.ndarray]], int]:
+        with self._condition:
+            batches = [batch for batch, _ in self._batches]
+            n_rows = self._queue_length
+            self._batches = []
+            self._queue_length = 0
+        return batches, n_rows
+
+    def _batches_to_rows(self, batches: List[Dict[str, numpy.ndarray]]
+                         ) -> List[Tuple[Any, ...]]:
+        rows: List[Tuple[Any, ...]] = []
+        for batch in batches:
+            n_rows = len(next(iter(batch.values())))
+            columns = []
+            for name in self._parameter_names:
+                column = batch.get(name)
+                if column is None:
+                    columns.append([None] * n_rows)
+                elif column.ndim == 1 and column.dtype != object:
+                    columns.append(column.tolist())
+                else:
+                    columns.append(list(column))
+            rows.extend(zip(*columns))
+        return rows
+
+    def _call_callback_on_queue_data(self) -> None:
+        batches, n_rows = self._take_batches()
+        self._data_set_len += n_rows
+        if self.as_arrays:
+            results: List[Any] = batches
+        else:
+            results = self._batches_to_rows(batches)
+        self.callback(results, self._data_set_len, self.state)
+        self.log.debug(f"{self.callback} called with "
+                       f"{n_rows} results.")
+
+    def done_callback(self) -> None:
+        """
+        Call the callback with the remaining results and stop the thread
+        """
+        self.log.debug("Done callback")
+        with self._condition:
+            self._done = True
+            self._condition.notify()
+        self.join()
+
+    def schedule_stop(self) -> None:
+        with self._condition:
+            if not self._stop_signal:
+                self.log.debug("Scheduling stop")
+                self._stop_signal = True
+                self._condition.notify()
+
+    def _clean_up(self) -> None:
+        _result_bus.unregister(self.guid, self)
+        self.log.debug("Stopped subscriber")
+
+
 class DataSet(Sized):
 
     # the "persistent traits" are the attributes/properties of the DataSet
@@ -232,21 +449,26 @@ class DataSet(Sized):
             metadata: metadata to insert into the dataset. Ignored if run_id
               is provided.
         """
-        self.conn = conn_from_dbpath_or_conn(conn, path_to_db)
+        self._conn = conn_from_dbpath_or_conn(conn, path_to_db)
 
         self._run_id = run_id
+        # the GUID under which the shard of the run is attached, if any
+        self._shard_guid: Optional[str] = None
         self._debug = False
-        self.subscribers: Dict[str, _Subscriber] = {}
-        self._interdeps: InterDependencies_
+        self.subscribers: Dict[str, Union[_Subscriber, _BusSubscriber]] = {}
+        self._cache: Optional[DataSetCache] = None
+        # the run description, metadata and snapshot of an existing run are
+        # only looked up when they are first needed; the snapshot is only
+        # kept once the run is completed
+        self._description: Optional[RunDescriber] = None
+        self._metadata: Optional[Dict[str, Any]] = None
+        self._snapshot_raw: Optional[str] = None
 
         if run_id is not None:
-            if not run_exists(self.conn, run_id):
+            if not run_exists(self._conn, run_id):
                 raise ValueError(f"Run with run_id {run_id} does not exist in "
                                  f"the database")
             self._completed = completed(self.conn, self.run_id)
-            run_desc = self._get_run_description_from_db()
-            self._interdeps = run_desc.interdeps
-            self._metadata = get_metadata_from_run_id(self.conn, run_id)
             self._started = self.run_timestamp_raw is not None
 
         else:
@@ -262,23 +484,46 @@ class DataSet(Sized):
                                      "You can start a new one with:"
                                      " new_experiment(name, sample_name)")
             name = name or "dataset"
+            guid = generate_guid()
+            if run_shards_enabled():
+                shard_schema = create_run_shard(self._conn, guid)
+            else:
+                shard_schema = None
             _, run_id, __ = create_run(self.conn, exp_id, name,
-                                       generate_guid(),
+                                       guid,
                                        parameters=None,
                                        values=values,
-                                       metadata=metadata)
+                                       metadata=metadata,
+                                       shard_schema=shard_schema)
             # this is really the UUID (an ever increasing count in the db)
             self._run_id = run_id
+            self._shard_guid = guid
             self._completed = False
             self._started = False
             if isinstance(specs, InterDependencies_):
-                self._interdeps = specs
+                interdeps = specs
             elif specs is not None:
-                self._interdeps = old_to_new(InterDependencies(*specs))
+                interdeps = old_to_new(InterDependencies(*specs))
             else:
-                self._interdeps = InterDependencies_()
-            self._metadata = get_metadata_from_run_id(self.conn, self.run_id)
+                interdeps = InterDependencies_()
+            self._description = RunDescriber(interdeps=interdeps)
+
 
+    @property
+    def conn(self) -> ConnectionPlus:
+        """
+        The connection to the database. If the results table of the run is
+        stored in a shard of its own, the shard is attached to the
+        connection, see :mod:`.run_shards`. A pooled connection that has
+        been closed is replaced by a new one from the pool.
+        """
+        self._conn = reconnect_if_closed(self._conn)
+        if self._run_id is not None:
+            if self._shard_guid is None:
+                self._shard_guid = get_guid_from_run_id(self._conn,
+                                                        self._run_id)
+            attach_run_shard(self._conn, self._shard_guid)
+        return self._conn
 
     @property
     def run_id(self):
@@ -302,20 +547,61 @@ class DataSet(Sized):
     def guid(self):
         return get_guid_from_run_id(self.conn, self.run_id)
 
+    @property
+    def _cached_guid(self) -> str:
+        """
+        The GUID of the run as cached by `conn`. Unlike `guid`, it is only
+        looked up in the database once, hence it is used when adding results
+        """
+        if self._shard_guid is None:
+            self._shard_guid = get_guid_from_run_id(self.conn, self.run_id)
+        return self._shard_guid
+
     @property
     def snapshot(self) -> Optional[dict]:
-        """Snapshot of the run as dictionary (or None)"""
+        """
+        Snapshot of the run as dictionary (or None). The snapshot is parsed
+        anew on every access, such that modifying the returned dictionary
+        does not affect later results.
+        """
         snapshot_json = self.snapshot_raw
-        if snapshot_json is not None:
-            return json.loads(snapshot_json)
-        else:
+        if snapshot_json is None:
             return None
+        return json.loads(snapshot_json)
 
     @property
     def snapshot_raw(self) -> Optional[str]:
         """Snapshot of the run as a JSON-formatted string (or None)"""
-        return select_one_where(self.conn, "runs", "snapshot",
-                                "run_id", self.run_id)
+        if self._snapshot_raw is not None:
+            return self._snapshot_raw
+        snapshot_raw = get_snapshot(self.conn, self.run_id)
+        if self.completed:
+            self._snapshot_raw = snapshot_raw
+        return snapshot_raw
+
+    def snapshot_get(self, path: str, default: Any = None) -> Any:
+        """
+        Get a single entry of the snapshot of the run, e.g. the value of a
+        parameter of an instrument, without parsing the whole snapshot.
+        This makes comparing the settings of many runs fast.
+
+        Args:
+            path: The keys of the entry in the (nested) snapshot dictionary,
+                separated by dots, e.g.
+                ``'station.instruments.dac.parameters.ch1.value'``
+            default: The value to return if the run has no snapshot or the
+                snapshot has no such entry
+
+        Returns:
+            The entry of the snapshot
+        """
+        keys = path.split('.')
+        try:
+            if self._snapshot_raw is not None:
+                return _json_entry(self.conn, self._snapshot_raw, keys)
+            return get_snapshot_entry(self.conn, self.run_id, keys)
+        except KeyError:
+            return default
 
     @property
     def number_of_results(self):
@@ -376,12 +662,36 @@ class DataSet(Sized):
         """
         return get_run_timestamp_from_run_id(self.conn, self.run_id)
 
+    @property
+    def cache(self) -> DataSetCache:
+        """
+        The in-memory cache of the data of this DataSet, which only reads
+        the rows that have been added since it was last updated. Use
+        `cache.data()` to repeatedly get all the data of a run that is still
+        being written, e.g. for live plotting.
+        """
+        if self._cache is None:
+            self._cache = DataSetCache(self)
+        return self._cache
+
     @property
     def description(self) -> RunDescriber:
-        return RunDescriber(interdeps=self._interdeps)
+        if self._description is None:
+            self._description = self._get_run_description_from_db()
+        return self._description
+
+    @property
+    def _interdeps(self) -> InterDependencies_:
+        return self.description.interdeps
+
+    @property
+    def _shapes(self) -> Optional[Shapes]:
+        return self.description.shapes
 
     @property
     def metadata(self) -> Dict:
+        if self._metadata is None:
+            self._metadata = get_metadata_from_run_id(self.conn, self.run_id)
         return self._metadata
 
     def the_same_dataset_as(self, other: 'DataSet') -> bool:
@@ -461,8 +771,7 @@ class DataSet(Sized):
         """
         Look up the run_description from the database
         """
-        desc_str = get_run_description(self.conn, self.run_id)
-        return serial.from_json_to_current(desc_str)
+        return get_run_describer(self.conn, self.run_id)
 
     def toggle_debug(self):
         """
@@ -470,8 +779,10 @@ class DataSet(Sized):
         echoed back.
         """
         self._debug = not self._debug
-        self.conn.close()
-        self.conn = connect(self.path_to_db, self._debug)
+        # pooled connections may be in use by other objects
+        if self.conn.pooled_as is None:
+            self.conn.close()
+        self._conn = connect(self.path_to_db, self._debug)
 
     def add_parameter(self, spec: ParamSpec):
         """
@@ -481,10 +792,12 @@ class DataSet(Sized):
                                   'Please use DataSet.set_interdependencies '
                                   'instead.')
 
-    def set_interdependencies(self, interdeps: InterDependencies_) -> None:
+    def set_interdependencies(self, interdeps: InterDependencies_,
+                              shapes: Optional[Shapes] = None) -> None:
         """
         Overwrite the interdependencies object (which holds all added
-        parameters and their relationships) of this dataset
+        parameters and their relationships) of this dataset and optionally
+        the expected shapes of the data of its parameters
         """
         if not isinstance(interdeps, InterDependencies_):
             raise TypeError('Wrong input type. Expected InterDepencies_, '
@@ -495,7 +808,13 @@ class DataSet(Sized):
                     'been started.')
             raise RuntimeError(mssg)
 
-        self._interdeps = interdeps
+        if shapes is not None:
+            unknown = set(shapes).difference(interdeps.names)
+            if unknown:
+                raise ValueError(f'Can not set shapes of unknown parameters '
+                                 f'{sorted(unknown)}.')
+
+        self._description = RunDescriber(interdeps=interdeps, shapes=shapes)
 
     def get_parameters(self) -> SPECS:
         rd_v0 = v1_to_v0(self.description)
@@ -512,7 +831,7 @@ class DataSet(Sized):
             metadata: actual metadata
         """
 
-        self._metadata[tag] = metadata
+        self.metadata[tag] = metadata
         # `add_meta_data` is not atomic by itself, hence using `atomic`
         with atomic(self.conn) as conn:
             add_meta_data(conn, self.run_id, {tag: metadata})
@@ -525,9 +844,10 @@ class DataSet(Sized):
             snapshot: the raw JSON dump of the snapshot
             overwrite: force overwrite an existing snapshot
         """
-        if self.snapshot is None or overwrite:
-            add_meta_data(self.conn, self.run_id, {'snapshot': snapshot})
-        elif self.snapshot is not None and not overwrite:
+        if self.snapshot_raw is None or overwrite:
+            add_snapshot(self.conn, self.run_id, snapshot)
+            self._snapshot_raw = None
+        else:
             log.warning('This dataset already has a snapshot. Use overwrite'
                         '=True to overwrite that')
 
@@ -651,6 +971,9 @@ class DataSet(Sized):
                               list(results.keys()),
                               list(results.values())
                               )
+        guid = self._cached_guid
+        if _result_bus.has_subscribers(guid):
+            self._publish_results(guid, [results])
         return index
 
     def add_results(self, results: List[Dict[str, VALUE]]) -> int:
@@ -688,8 +1011,104 @@ class DataSet(Sized):
 
         insert_many_values(self.conn, self.table_name, list(expected_keys),
                            values)
+        guid = self._cached_guid
+        if _result_bus.has_subscribers(guid):
+            self._publish_results(guid, results)
+        return len_before_add
+
+    def add_columns(self, results: Mapping[str, numpy.ndarray]) -> int:
+        """
+        Adds a block of results to the DataSet given as one array of values
+        per parameter (column), as opposed to the one-dict-per-row input of
+        `add_results`. The i-th element of every array goes into the i-th
+        inserted row. For 'array' type parameters, the first axis of the
+        array runs over the rows.
+
+        This is considerably faster than `add_results` for large amounts of
+        data, since no intermediate per-row dictionaries are built.
+
+        Args:
+            results: dictionary with names of parameters as keys and arrays
+                of equal length (along the first axis) as values
+
+        Returns:
+            the index in the DataSet that the **first** result was stored at
+
+        It is an error to provide a value for a key or keyword that is not
+        the name of a parameter in this DataSet.
+
+        It is an error to add results to a completed DataSet.
+        """
+
+        if self.pristine:
+            raise RuntimeError('This DataSet has not been marked as started. '
+                               'Please mark the DataSet as started before '
+                               'adding results to it.')
+
+        if self.completed:
+            raise CompletedError('This DataSet is complete, no further '
+                                 'results can be added to it.')
+        try:
+            parameters = [self._interdeps._id_to_paramspec[name]
+                          for name in results]
+            self._interdeps.validate_subset(parameters)
+        except DependencyError as de:
+            raise ValueError(
+                'Can not add results, missing setpoint values') from de
+
+        values = [self._column_to_sql_values(ps, results[ps.name])
+                  for ps in parameters]
+
+        len_before_add = length(self.conn, self.table_name)
+
+        insert_many_columns(self.conn, self.table_name,
+                            [ps.name for ps in parameters], values)
+        guid = self._cached_guid
+        if _result_bus.has_subscribers(guid):
+            batch = {ps.name: numpy.asarray(results[ps.name])
+                     for ps in parameters}
+            _result_bus.publish(guid, batch, len(values[0]))
         return len_before_add
 
+    @staticmethod
+    def _publish_results(guid: str,
+                         results: Sequence[Mapping[str, VALUE]]) -> None:
+        """
+        Publish the given results, one name-value dictionary per row, as one
+        batch of arrays to the subscribers of the run with the given GUID on
+        the result bus
+        """
+        names = frozenset.union(*[frozenset(d) for d in results])
+        batch = {}
+        for name in names:
+            column = [d.get(name, None) for d in results]
+            try:
+                batch[name] = numpy.array(column)
+            except ValueError:
+                batch[name] = None
+            if batch[name] is None or batch[name].dtype == object:
+                # keep one element per row if the rows differ in shape
+                batch[name] = numpy.empty(len(column), dtype=object)
+                for i, value in enumerate(column):
+                    batch[name][i] = value
+        _result_bus.publish(guid, batch, len(results))
+
+    @staticmethod
+    def _column_to_sql_values(paramspec: ParamSpecBase,
+                              column: numpy.ndarray) -> Sequence[VALUE]:
+        """
+        Convert a column of values into a sequence of per-row values that
+        the registered sqlite adapters can handle. For scalar parameter
+        types this is a single vectorised `tolist` call, for 'array' type
+        parameters the rows are views into the given array.
+        """
+        column = numpy.asarray(column)
+        if paramspec.type == 'array':
+            if column.ndim == 1:
+                column = column.reshape(-1, 1)
+            return list(column)
+        return column.ravel().tolist()
+
     @staticmethod
     def _validate_parameters(*params: Union[str, ParamSpec, _BaseParameter]
                              ) -> List[str]:
@@ -757,7 +1176,9 @@ class DataSet(Sized):
             self,
             *params: Union[str, ParamSpec, _BaseParameter],
             start: Optional[int] = None,
-            end: Optional[int] = None) -> Dict[str, Dict[str, numpy.ndarray]]:
+            end: Optional[int] = None,
+            dtype: Optional[Union[DTypeHint, Mapping[str, DTypeHint]]] = None
+    ) -> Dict[str, Dict[str, numpy.ndarray]]:
         """
         Returns the values stored in the DataSet for the specified parameters
         and their dependencies. If no paramerers are supplied the values will
@@ -771,6 +1192,13 @@ class DataSet(Sized):
         Apart from this expansion the data returned by this method
         is the transpose of the date returned by `get_data`.
 
+        If the shape of the data of a requested parameter has been given
+        when the run was started (see `Measurement.set_shapes`), the arrays
+        of the parameter and its dependencies have this shape. If the run
+        has fewer points than expected, e.g. because it is still running or
+        has been interrupted, the missing points are filled with NaN.
+        Shapes are not applied if start or end are given.
+
         If provided, the start and end arguments select a range of results
         by result count (index). If the range is empty - that is, if the end is
         less than or equal to the start, or if start is after the current end
@@ -785,6 +1213,10 @@ class DataSet(Sized):
                 if None
             end: end value of selection range (by results count); ignored if
                 None
+            dtype: optional dtype hint for the returned arrays. A single
+                dtype is applied to all numeric parameters, a mapping from
+                parameter names to dtypes to the named parameters only. If
+                None, the dtype is inferred from the stored values.
 
         Returns:
             Dictionary from requested parameters to Dict of parameter names
@@ -797,7 +1229,8 @@ class DataSet(Sized):
         else:
             valid_param_names = self._validate_parameters(*params)
         return get_parameter_data(self.conn, self.table_name,
-                                  valid_param_names, start, end)
+                                  valid_param_names, start, end, dtype=dtype,
+                                  shapes=self._shapes)
 
     def get_data_as_pandas_dataframe(self,
                                      *params: Union[str,
@@ -842,10 +1275,77 @@ class DataSet(Sized):
             a column and a indexed by a :py:class:`pandas.MultiIndex` formed
             by the dependencies.
         """
+        if len(params) == 0:
+            valid_param_names = [ps.name
+                                 for ps in self._interdeps.non_dependencies]
+        else:
+            valid_param_names = self._validate_parameters(*params)
+        # the dataframes are indexed by the setpoints, hence the data is not
+        # shaped (and padded) here
+        datadict = get_parameter_data(self.conn, self.table_name,
+                                      valid_param_names, start, end)
+        return self._datadict_to_dataframes(datadict)
+
+    def iter_parameter_data(
+            self,
+            *params: Union[str, ParamSpec, _BaseParameter],
+            chunk_size: int = 100000,
+            as_dataframes: bool = False,
+            dtype: Optional[Union[DTypeHint, Mapping[str, DTypeHint]]] = None
+    ) -> Iterator[Union[Dict[str, Dict[str, numpy.ndarray]],
+                        Dict[str, pd.DataFrame]]]:
+        """
+        Iterate over the values stored in the DataSet for the specified
+        parameters and their dependencies in chunks of a bounded size, such
+        that the memory needed does not depend on the size of the DataSet.
+
+        Every chunk holds the values from at most ``chunk_size`` consecutive
+        rows of the results table and is formatted like the output of
+        :py:meth:`.get_parameter_data`, or, if ``as_dataframes`` is True,
+        like the output of :py:meth:`.get_data_as_pandas_dataframe`. Chunks
+        without any values of the requested parameters are skipped. Only the
+        values that are in the DataSet when the iteration starts are
+        returned.
+
+        Args:
+            *params: string parameter names, QCoDeS Parameter objects, and
+                ParamSpec objects. If no parameters are supplied data for
+                all parameters that are not a dependency of another
+                parameter will be returned.
+            chunk_size: the number of rows of the results table per chunk
+            as_dataframes: if True, yield dicts of
+                :py:class:`pandas.DataFrame` s instead of dicts of numpy
+                arrays
+            dtype: optional dtype hint for the returned arrays, see
+                :py:meth:`.get_parameter_data`
+
+        Yields:
+            The values of one chunk of the DataSet
+        """
+        if len(params) == 0:
+            valid_param_names = [ps.name
+                                 for ps in self._interdeps.non_dependencies]
+        else:
+            valid_param_names = self._validate_parameters(*params)
+        chunks = iter_parameter_data(self.conn, self.table_name,
+                                     valid_param_names,
+                                     chunk_size=chunk_size, dtype=dtype)
+        for chunk in chunks:
+            if as_dataframes:
+                yield self._datadict_to_dataframes(chunk)
+            else:
+                yield chunk
+
+    @staticmethod
+    def _datadict_to_dataframes(
+            datadict: Dict[str, Dict[str, numpy.ndarray]]
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Convert the output of :py:meth:`.get_parameter_data` into a dict of
+        :py:class:`pandas.DataFrame` s, see
+        :py:meth:`.get_data_as_pandas_dataframe`
+        """
         dfs = {}
-        datadict = self.get_parameter_data(*params,
-                                           start=start,
-                                           end=end)
         for name, subdict in datadict.items():
             keys = list(subdict.keys())
             if len(keys) == 0:
@@ -877,6 +1377,82 @@ class DataSet(Sized):
             dfs[name] = df
         return dfs
 
+    def to_xarray_dataset(self,
+                          *params: Union[str, ParamSpec, _BaseParameter]
+                          ) -> 'xr.Dataset':
+        """
+        Returns the values stored in the DataSet for the specified parameters
+        and their dependencies as an :py:class:`xarray.Dataset` with a data
+        variable per requested parameter and the setpoints as coordinates.
+        The metadata of the run is stored in the attributes of the Dataset,
+        and the units and labels of the parameters in the attributes of the
+        variables.
+
+        If the shapes of the data are known (see
+        :py:meth:`.Measurement.set_shapes`), the data is arranged on
+        these shapes. Otherwise, data on a grid is put onto the grid
+        spanned by the unique values of its setpoints, and other data is
+        stored along a single index dimension.
+
+        Requires the optional dependency xarray.
+
+        Args:
+            *params: string parameter names, QCoDeS Parameter objects, and
+                ParamSpec objects. If no parameters are supplied data for
+                all parameters that are not a dependency of another
+                parameter will be returned.
+
+        Returns:
+            The data of the requested parameters as an xarray Dataset
+        """
+        if len(params) == 0:
+            valid_param_names = [ps.name
+                                 for ps in self._interdeps.non_dependencies]
+        else:
+            valid_param_names = self._validate_parameters(*params)
+        return to_xarray_dataset(self, valid_param_names)
+
+    def export(self, format: str = 'netcdf',
+               path: Optional[str] = None) -> str:
+        """
+        Export the data of the DataSet to a file, which can be read without
+        QCoDeS and its database. The data is written one parameter at a
+        time, in one of the formats:
+
+        - 'netcdf': a NetCDF file, with the data laid out like by
+          :py:meth:`.to_xarray_dataset`. Use
+          :py:func:`qcodes.dataset.xarray_export.load_from_netcdf` to load
+          the exported file again. Requires the optional dependencies
+          xarray and netCDF4.
+        - 'npy': a directory of ``.npy`` files, one per array of
+          :py:meth:`.get_parameter_data`, and a JSON file describing them.
+          Use :py:func:`qcodes.dataset.npy_export.load_from_npy_dir` to load
+          the arrays memory-mapped, without copying them into memory.
+
+        Args:
+            format: the format of the export, 'netcdf' or 'npy'
+            path: the path of the file or directory. Defaults to one named
+                after the run id and GUID of the run in the current working
+                directory.
+
+        Returns:
+            The path of the exported file or directory
+        """
+        exporters = {'netcdf': (export_to_netcdf, '.nc'),
+                     'npy': (export_to_npy_dir, '')}
+        if format not in exporters:
+            raise ValueError(f'Unknown export format {format!r}, the '
+                             f'supported formats are: '
+                             f'{", ".join(exporters)}')
+        if self.pristine:
+            raise RuntimeError('Can not export a pristine DataSet, it does '
+                               'not hold any data.')
+        exporter, extension = exporters[format]
+        if path is None:
+            path = f'qcodes_{self.run_id}_{self.guid}{extension}'
+        exporter(self, path)
+        return path
+
     def get_values(self, param_name: str) -> List[List[Any]]:
         """
         Get the values (i.e. not NULLs) of the specified parameter
@@ -915,11 +1491,49 @@ class DataSet(Sized):
                   min_wait: int = 0,
                   min_count: int = 1,
                   state: Optional[Any] = None,
-                  callback_kwargs: Optional[Dict[str, Any]] = None
+                  callback_kwargs: Optional[Dict[str, Any]] = None,
+                  use_trigger: bool = False,
+                  as_arrays: bool = False
                   ) -> str:
+        """
+        Subscribe a callback to the results added to this DataSet. The
+        callback is called from another thread with the new results, the
+        length of the dataset and the given state as
+        `callback(results, length, state)`.
+
+        Args:
+            callback: the function to call
+            min_wait: the minimal time in milliseconds between two calls of
+                the callback
+            min_count: the minimal number of new results for which the
+                callback is called
+            state: an object passed to each call of the callback
+            callback_kwargs: keyword arguments passed to each call of the
+                callback
+            use_trigger: if False (default), the results are received from
+                the in-process result bus. If True, a database trigger is
+                used instead, which is slower but also notifies about the
+                results that other processes write to the database.
+            as_arrays: if True, the callback gets a list of dictionaries of
+                parameter names to arrays of results, otherwise a list of
+                tuples with one value per parameter. Only supported if
+                `use_trigger` is False.
+
+        Returns:
+            the id of the subscriber
+        """
         subscriber_id = uuid.uuid4().hex
-        subscriber = _Subscriber(self, subscriber_id, callback, state,
-                                 min_wait, min_count, callback_kwargs)
+        subscriber: Union[_Subscriber, _BusSubscriber]
+        if use_trigger:
+            if as_arrays:
+                raise ValueError('Subscribers using a database trigger can '
+                                 'not get the results as arrays.')
+            subscriber = _Subscriber(self, subscriber_id, callback, state,
+                                     min_wait, min_count, callback_kwargs)
+        else:
+            subscriber = _BusSubscriber(self, subscriber_id, callback, state,
+                                        min_wait, min_count, callback_kwargs,
+                                        as_arrays)
         self.subscribers[subscriber_id] = subscriber
         subscriber.start()
         return subscriber_id
@@ -962,7 +1576,8 @@ class DataSet(Sized):
         """
         with atomic(self.conn) as conn:
             sub = self.subscribers[uuid]
-            remove_trigger(conn, sub.trigger_id)
+            if isinstance(sub, _Subscriber):
+                remove_trigger(conn, sub.trigger_id)
             sub.schedule_stop()
             sub.join()
             del self.subscribers[uuid]
@@ -982,6 +1597,10 @@ class DataSet(Sized):
             self.subscribers.clear()
 
     def get_metadata(self, tag):
+        # the snapshot is not necessarily stored in the runs table, see
+        # `snapshot_raw`
+        if tag == 'snapshot':
+            return self.snapshot_raw
         return get_metadata(self.conn, tag, self.table_name)
 
     def __len__(self) -> int:
@@ -1018,7 +1637,7 @@ def load_by_id(run_id: int, conn: Optional[ConnectionPlus] = None) -> DataSet:
     if run_id is None:
         raise ValueError('run_id has to be a positive integer, not None.')
 
-    conn = conn or connect(get_DB_location())
+    conn = conn or get_pooled_connection()
 
     d = DataSet(conn=conn, run_id=run_id)
     return d
@@ -1042,7 +1661,7 @@ def load_by_guid(guid: str, conn: Optional[ConnectionPlus] = None) -> DataSet:
         NameError: if no run with the given GUID exists in the database
         RuntimeError: if several runs with the given GUID are found
     """
-    conn = conn or connect(get_DB_location())
+    conn = conn or get_pooled_connection()
 
     # this function raises a RuntimeError if more than one run matches the GUID
     run_id = get_runid_from_guid(conn, guid)
@@ -1064,12 +1683,12 @@ def load_by_counter(counter: int, exp_id: int,
         counter: counter of the dataset within the given experiment
         exp_id: id of the experiment where to look for the dataset
         conn: connection to the database to load from. If not provided, a
-          connection to the DB file specified in the config is made
+          pooled connection to the DB file specified in the config is used
 
     Returns:
         dataset of the given counter in the given experiment
     """
-    conn = conn or connect(get_DB_location())
+    conn = conn or get_pooled_connection()
     sql = """
     SELECT run_id
     FROM
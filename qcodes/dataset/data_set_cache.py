@@ -0,0 +1,225 @@
+"""
+This module provides the in-memory cache of the data of a DataSet, which is
+meant for live plotting and monitoring code that repeatedly needs all the
+data of a run that is still being written.
+
+The cache only fetches the rows that have been added to the results table
+since it was last updated and appends them to growable buffers, such that
+refreshing the data costs time proportional to the number of new rows
+rather than to the total number of rows. If the run is measured in the same
+process, the `DataSaver` can instead feed the results directly into the
+cache, which then does not read from the database at all.
+"""
+from typing import (TYPE_CHECKING, Any, Dict, List, Mapping, Optional,
+                    Sequence, Tuple)
+
+import numpy as np
+
+from qcodes.dataset.sqlite.connection import atomic_transaction
+from qcodes.dataset.sqlite.queries import (
+    completed, _get_parameter_tree_arrays, _column_to_array,
+    _numeric_column_to_array, _expand_to_array_shape)
+from qcodes.dataset.sqlite.query_helpers import VALUE
+
+if TYPE_CHECKING:
+    from qcodes.dataset.data_set import DataSet
+
+
+class _GrowableArray:
+    """
+    An array that grows along its first axis by appending blocks of rows.
+    The underlying buffer is preallocated and its capacity is doubled when
+    it is exhausted, such that appending is amortised O(number of new rows).
+    """
+
+    def __init__(self) -> None:
+        self._buffer: Optional[np.ndarray] = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, values: np.ndarray) -> None:
+        n_new = len(values)
+        if self._buffer is None:
+            self._buffer = np.empty((max(n_new, 16),) + values.shape[1:],
+                                    dtype=values.dtype)
+        elif values.shape[1:] != self._buffer.shape[1:]:
+            # the rows differ in shape, hence the buffer has to hold one
+            # array per row
+            self._buffer = self._to_object_rows(self._buffer)
+            values = self._to_object_rows(values)
+        elif not np.can_cast(values.dtype, self._buffer.dtype):
+            self._buffer = self._buffer.astype(
+                np.result_type(self._buffer.dtype, values.dtype))
+
+        required = self._size + n_new
+        if required > len(self._buffer):
+            capacity = max(required, 2 * len(self._buffer))
+            buffer = np.empty((capacity,) + self._buffer.shape[1:],
+                              dtype=self._buffer.dtype)
+            buffer[:self._size] = self._buffer[:self._size]
+            self._buffer = buffer
+
+        self._buffer[self._size:required] = values
+        self._size = required
+
+    def view(self) -> np.ndarray:
+        """
+        Return the data appended so far. The returned array is a view into
+        the buffer, which is not modified by later appends.
+        """
+        if self._buffer is None:
+            return np.empty(0)
+        return self._buffer[:self._size]
+
+    @staticmethod
+    def _to_object_rows(array: np.ndarray) -> np.ndarray:
+        if array.dtype == object and array.ndim == 1:
+            return array
+        rows = np.empty(len(array), dtype=object)
+        for i, row in enumerate(array):
+            rows[i] = row
+        return rows
+
+
+class DataSetCache:
+    """
+    The in-memory cache of the data of a DataSet. Use `data` to get the data
+    in the same format as returned by `DataSet.get_parameter_data` without
+    arguments.
+
+    The DataSetCache is not meant to be instantiated directly, but rather
+    used via the `cache` attribute of the DataSet.
+    """
+
+    def __init__(self, dataset: 'DataSet') -> None:
+        self._dataset = dataset
+        self._data: Dict[str, Dict[str, _GrowableArray]] = {}
+        # the rowid of the last row of the results table read into the cache
+        self._last_read_rowid = 0
+        # whether all the data of a completed run has been read
+        self._loaded_completed = False
+        # whether the data is fed directly instead of read from the database
+        self._live = False
+
+    @property
+    def live(self) -> bool:
+        """
+        Is the cache fed with the results directly (by the DataSaver)
+        instead of reading them from the database?
+        """
+        return self._live
+
+    def data(self) -> Dict[str, Dict[str, np.ndarray]]:
+        """
+        Return the data of the dataset, reading the new rows from the
+        database first, unless the cache is fed directly. The returned arrays
+        must not be modified.
+        """
+        if not self._live:
+            self.load_data_from_db()
+        return {param: {name: array.view()
+                        for name, array in self._data.get(param, {}).items()}
+                for param, _, _ in self._parameter_trees()}
+
+    def load_data_from_db(self) -> None:
+        """
+        Read the rows that have been added to the results table since the
+        last call into the cache
+        """
+        dataset = self._dataset
+        if self._live or self._loaded_completed or dataset.pristine:
+            return
+        # check if the run is completed before reading, such that no rows
+        # written before the completion can be missed
+        is_completed = completed(dataset.conn, dataset.run_id)
+
+        c = atomic_transaction(dataset.conn,
+                               f'SELECT MAX(rowid) FROM '
+                               f'"{dataset.table_name}"')
+        last_rowid = c.fetchall()[0][0]
+        if last_rowid is not None and last_rowid > self._last_read_rowid:
+            interdeps = dataset.description.interdeps
+            rowids = (self._last_read_rowid + 1, last_rowid)
+            for param, _, _ in self._parameter_trees():
+                self._append_tree(param, _get_parameter_tree_arrays(
+                    dataset.conn, dataset.table_name, interdeps, param,
+                    None, rowids=rowids))
+            self._last_read_rowid = last_rowid
+
+        self._loaded_completed = is_completed
+
+    def add_results(self, results: Sequence[Mapping[str, VALUE]]) -> None:
+        """
+        Add results to the cache, given as one name-value dictionary per row
+        like for `DataSet.add_results`. Once results have been added
+        directly, the cache stops reading from the database; it is meant to
+        be fed by the DataSaver from the start of the run.
+        """
+        self._live = True
+        for param, names, types in self._parameter_trees():
+            rows = [row for row in results if row.get(param) is not None]
+            if len(rows) == 0:
+                continue
+            arrays = [_column_to_array([row.get(name) for row in rows],
+                                       paramtype, None)
+                      for name, paramtype in zip(names, types)]
+            self._append_tree(param, self._expand(arrays, names, types))
+
+    def add_columns(self, results: Mapping[str, np.ndarray]) -> None:
+        """
+        Add results to the cache, given as one array of values per parameter
+        like for `DataSet.add_columns`. See `add_results`.
+        """
+        self._live = True
+        for param, names, types in self._parameter_trees():
+            if param not in results:
+                continue
+            arrays = [self._column_to_array(results[name], paramtype)
+                      for name, paramtype in zip(names, types)]
+            self._append_tree(param, self._expand(arrays, names, types))
+
+    def _parameter_trees(self) -> List[Tuple[str, List[str], List[str]]]:
+        """
+        Return the name of every parameter that is not a dependency of
+        another parameter together with the names and types of the
+        parameters of its tree, i.e. of itself followed by its dependencies
+        """
+        interdeps = self._dataset.description.interdeps
+        trees = []
+        for paramspec in interdeps.non_dependencies:
+            paramspecs = ([paramspec]
+                          + list(interdeps.dependencies.get(paramspec, ())))
+            trees.append((paramspec.name,
+                          [ps.name for ps in paramspecs],
+                          [ps.type for ps in paramspecs]))
+        return trees
+
+    @staticmethod
+    def _column_to_array(column: Any, paramtype: str) -> np.ndarray:
+        column = np.asarray(column)
+        if paramtype == 'array':
+            return column.reshape(-1, 1) if column.ndim == 1 else column
+        column = column.ravel()
+        if paramtype == 'numeric':
+            return _numeric_column_to_array(column, None)
+        return column
+
+    @staticmethod
+    def _expand(arrays: List[np.ndarray], names: List[str],
+                types: List[str]) -> Dict[str, np.ndarray]:
+        # expand all other parameters to the shape of the array parameters
+        # like get_parameter_data does
+        if 'array' in types and any(x != 'array' for x in types):
+            arrays = _expand_to_array_shape(arrays, types,
+                                            [None] * len(types))
+        return dict(zip(names, arrays))
+
+    def _append_tree(self, param: str, arrays: Dict[str, np.ndarray]
+                     ) -> None:
+        if len(arrays) == 0:
+            return
+        tree = self._data.setdefault(param, {})
+        for name, array in arrays.items():
+            tree.setdefault(name, _GrowableArray()).append(array)
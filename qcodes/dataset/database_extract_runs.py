@@ -1,20 +1,25 @@
-from typing import Union, Optional
+from typing import Any, Dict, Optional, Sequence, Union
 from warnings import warn
 import os
+import time
 
 import numpy as np
+from tqdm import tqdm
 
 from qcodes.dataset.descriptions.versioning.converters import new_to_old
 from qcodes.dataset.data_set import DataSet
 from qcodes.dataset.experiment_container import load_or_create_experiment
-from qcodes.dataset.sqlite.connection import atomic, ConnectionPlus
+from qcodes.dataset.sqlite.connection import atomic, transaction, \
+    ConnectionPlus
 from qcodes.dataset.sqlite.database import connect, \
     get_db_version_and_newest_available_version
-from qcodes.dataset.sqlite.queries import add_meta_data, create_run, \
+from qcodes.dataset.sqlite.queries import create_run, \
     get_exp_ids_from_run_ids, get_matching_exp_ids, get_runid_from_guid, \
     is_run_id_in_database, mark_run_complete, new_experiment
 from qcodes.dataset.sqlite.query_helpers import select_many_where, \
     sql_placeholder_string
+from qcodes.dataset.sqlite.run_shards import attach_run_shard
+from qcodes.dataset.sqlite.snapshot_store import add_snapshot
 
 
 def extract_runs_into_db(source_db_path: str,
@@ -35,34 +40,14 @@ def extract_runs_into_db(source_db_path: str,
         upgrade_source_db: If the source DB is found to be in a version that is
           not the newest, should it be upgraded?
     """
-    # Check for versions
-    (s_v, new_v) = get_db_version_and_newest_available_version(source_db_path)
-    if s_v < new_v and not upgrade_source_db:
-        warn(f'Source DB version is {s_v}, but this function needs it to be'
-             f' in version {new_v}. Run this function again with '
-             'upgrade_source_db=True to auto-upgrade the source DB file.')
+    if not _db_versions_ok(source_db_path, target_db_path,
+                           upgrade_source_db, upgrade_target_db):
         return
 
-    if os.path.exists(target_db_path):
-        (t_v, new_v) = get_db_version_and_newest_available_version(target_db_path)
-        if t_v < new_v and not upgrade_target_db:
-            warn(f'Target DB version is {t_v}, but this function needs it to '
-                 f'be in version {new_v}. Run this function again with '
-                 'upgrade_target_db=True to auto-upgrade the target DB file.')
-            return
-
-
     source_conn = connect(source_db_path)
 
     # Validate that all runs are in the source database
-    do_runs_exist = is_run_id_in_database(source_conn, run_ids)
-    if False in do_runs_exist.values():
-        source_conn.close()
-        non_existing_ids = [rid for rid in run_ids if not do_runs_exist[rid]]
-        err_mssg = ("Error: not all run_ids exist in the source database. "
-                    "The following run(s) is/are not present: "
-                    f"{non_existing_ids}")
-        raise ValueError(err_mssg)
+    _validate_runs_exist(source_conn, run_ids)
 
     # Validate that all runs are from the same experiment
 
@@ -73,18 +58,7 @@ def extract_runs_into_db(source_db_path: str,
                          f'Got runs from experiments {source_exp_ids}')
 
     # Fetch the attributes of the runs' experiment
-    # hopefully, this is enough to uniquely identify the experiment
-
-    exp_attr_names = ['name', 'sample_name', 'start_time', 'end_time',
-                      'format_string']
-
-    exp_attr_vals = select_many_where(source_conn,
-                                      'experiments',
-                                      *exp_attr_names,
-                                      where_column='exp_id',
-                                      where_value=source_exp_ids[0])
-
-    exp_attrs = dict(zip(exp_attr_names, exp_attr_vals))
+    exp_attrs = _get_exp_attrs(source_conn, source_exp_ids[0])
 
     # Massage the target DB file to accomodate the runs
     # (create new experiment if needed)
@@ -115,6 +89,145 @@ def extract_runs_into_db(source_db_path: str,
         target_conn.close()
 
 
+def bulk_extract_runs_into_db(source_db_path: str,
+                              target_db_path: str, *run_ids: int,
+                              upgrade_source_db: bool = False,
+                              upgrade_target_db: bool = False,
+                              show_progress: bool = True) -> None:
+    """
+    Extract a selection of runs into another DB file, like
+    :func:`extract_runs_into_db`, but meant for large amounts of data. The
+    runs may come from several experiments; every run is added to an
+    experiment with the same name and sample_name as its experiment in the
+    source DB, which is created if it does not exist. The GUIDs of the runs
+    are preserved and runs already in the target DB are skipped.
+
+    Instead of reading every row into Python, the source DB file is
+    attached to the connection to the target DB file and the results tables
+    are copied with ``INSERT INTO ... SELECT`` statements. All runs are
+    inserted in one transaction. The results tables of runs stored in shards
+    of their own (see :mod:`.run_shards`) are copied through Python.
+
+    Args:
+        source_db_path: Path to the source DB file
+        target_db_path: Path to the target DB file. The target DB file will be
+          created if it does not exist.
+        run_ids: The run_ids of the runs to copy into the target DB file
+        upgrade_source_db: If the source DB is found to be in a version that is
+          not the newest, should it be upgraded?
+        upgrade_target_db: If the target DB is found to be in a version that is
+          not the newest, should it be upgraded?
+        show_progress: Whether to show a progress bar with the number of
+          copied runs and the throughput in rows per second
+    """
+    if not _db_versions_ok(source_db_path, target_db_path,
+                           upgrade_source_db, upgrade_target_db):
+        return
+
+    source_conn = connect(source_db_path)
+    try:
+        _validate_runs_exist(source_conn, run_ids)
+        datasets = [DataSet(run_id=run_id, conn=source_conn)
+                    for run_id in run_ids]
+        for dataset in datasets:
+            if not dataset.completed:
+                raise ValueError('Dataset not completed. An incomplete '
+                                 'dataset can not be copied. The incomplete '
+                                 f'dataset has GUID: {dataset.guid} and '
+                                 f'run_id: {dataset.run_id}')
+        exp_attrs = {dataset.exp_id: _get_exp_attrs(source_conn,
+                                                     dataset.exp_id)
+                     for dataset in datasets}
+    except Exception:
+        source_conn.close()
+        raise
+
+    target_conn = connect(target_db_path)
+    # a database can not be attached within a transaction
+    transaction(target_conn, "ATTACH DATABASE ? AS extract_source",
+                source_db_path)
+    try:
+        with atomic(target_conn) as target_conn:
+            target_exp_ids: Dict[int, int] = {}
+            for source_exp_id, attrs in exp_attrs.items():
+                target_exp_ids[source_exp_id] = _create_exp_if_needed(
+                    target_conn, attrs['name'], attrs['sample_name'],
+                    attrs['format_string'], attrs['start_time'],
+                    attrs['end_time'])
+
+            pbar = tqdm(datasets, unit='run', disable=not show_progress)
+            pbar.set_description("Extracting runs")
+            t_start = time.perf_counter()
+            n_rows = 0
+            for dataset in pbar:
+                n_rows += _extract_single_dataset_into_db(
+                    dataset, target_conn, target_exp_ids[dataset.exp_id],
+                    source_schema='extract_source')
+                elapsed = time.perf_counter() - t_start
+                pbar.set_postfix(rows=n_rows,
+                                 rows_per_s=f'{n_rows / elapsed:.3g}')
+    finally:
+        transaction(target_conn, "DETACH DATABASE extract_source")
+        source_conn.close()
+        target_conn.close()
+
+
+def _db_versions_ok(source_db_path: str, target_db_path: str,
+                    upgrade_source_db: bool, upgrade_target_db: bool) -> bool:
+    """
+    Check that the source and target DB files are in the newest version,
+    or may be upgraded to it, and warn if they are not
+    """
+    (s_v, new_v) = get_db_version_and_newest_available_version(source_db_path)
+    if s_v < new_v and not upgrade_source_db:
+        warn(f'Source DB version is {s_v}, but this function needs it to be'
+             f' in version {new_v}. Run this function again with '
+             'upgrade_source_db=True to auto-upgrade the source DB file.')
+        return False
+
+    if os.path.exists(target_db_path):
+        (t_v, new_v) = get_db_version_and_newest_available_version(target_db_path)
+        if t_v < new_v and not upgrade_target_db:
+            warn(f'Target DB version is {t_v}, but this function needs it to '
+                 f'be in version {new_v}. Run this function again with '
+                 'upgrade_target_db=True to auto-upgrade the target DB file.')
+            return False
+    return True
+
+
+def _validate_runs_exist(source_conn: ConnectionPlus,
+                         run_ids: Sequence[int]) -> None:
+    """
+    Raise (and close the connection) if not all runs are in the source DB
+    """
+    do_runs_exist = is_run_id_in_database(source_conn, run_ids)
+    if False in do_runs_exist.values():
+        source_conn.close()
+        non_existing_ids = [rid for rid in run_ids if not do_runs_exist[rid]]
+        err_mssg = ("Error: not all run_ids exist in the source database. "
+                    "The following run(s) is/are not present: "
+                    f"{non_existing_ids}")
+        raise ValueError(err_mssg)
+
+
+def _get_exp_attrs(source_conn: ConnectionPlus,
+                   exp_id: int) -> Dict[str, Any]:
+    """
+    Fetch the attributes of an experiment, hopefully enough to uniquely
+    identify it
+    """
+    exp_attr_names = ['name', 'sample_name', 'start_time', 'end_time',
+                      'format_string']
+
+    exp_attr_vals = select_many_where(source_conn,
+                                      'experiments',
+                                      *exp_attr_names,
+                                      where_column='exp_id',
+                                      where_value=exp_id)
+
+    return dict(zip(exp_attr_names, exp_attr_vals))
+
+
 def _create_exp_if_needed(target_conn: ConnectionPlus,
                           exp_name: str,
                           sample_name: str,
@@ -154,10 +267,12 @@ def _create_exp_if_needed(target_conn: ConnectionPlus,
 
 def _extract_single_dataset_into_db(dataset: DataSet,
                                     target_conn: ConnectionPlus,
-                                    target_exp_id: int) -> None:
+                                    target_exp_id: int,
+                                    source_schema: Optional[str] = None
+                                    ) -> int:
     """
     NB: This function should only be called from within
-    :meth:extract_runs_into_db
+    :meth:extract_runs_into_db or :meth:bulk_extract_runs_into_db
 
     Insert the given dataset into the specified database file as the latest
     run.
@@ -169,6 +284,12 @@ def _extract_single_dataset_into_db(dataset: DataSet,
         target_conn: connection to the DB. Must be atomically guarded
         target_exp_id: The exp_id of the (target DB) experiment in which to
           insert the run
+        source_schema: The name under which the source DB is attached to
+          the target connection. If given, the results are copied within
+          SQLite instead of row by row through Python.
+
+    Returns:
+        The number of copied rows of the results table
     """
 
     if not dataset.completed:
@@ -181,7 +302,7 @@ def _extract_single_dataset_into_db(dataset: DataSet,
     run_id = get_runid_from_guid(target_conn, dataset.guid)
 
     if run_id != -1:
-        return
+        return 0
 
     if dataset.parameters is not None:
         param_names = dataset.parameters.split(',')
@@ -199,10 +320,20 @@ def _extract_single_dataset_into_db(dataset: DataSet,
                                                      guid=dataset.guid,
                                                      parameters=parspecs,
                                                      metadata=metadata)
-    _populate_results_table(source_conn,
-                            target_conn,
-                            dataset.table_name,
-                            target_table_name)
+    # the results table of a run with a shard is not in the attached source
+    # DB; a shard can not be detached within the transaction of the
+    # extraction, hence such tables are copied through Python
+    if source_schema is None or \
+            attach_run_shard(source_conn, dataset.guid) is not None:
+        n_rows = _populate_results_table(source_conn,
+                                         target_conn,
+                                         dataset.table_name,
+                                         target_table_name)
+    else:
+        n_rows = _copy_results_table(target_conn,
+                                     source_schema,
+                                     dataset.table_name,
+                                     target_table_name)
     mark_run_complete(target_conn, target_run_id)
     _rewrite_timestamps(target_conn,
                         target_run_id,
@@ -210,15 +341,17 @@ def _extract_single_dataset_into_db(dataset: DataSet,
                         dataset.completed_timestamp_raw)
 
     if snapshot_raw is not None:
-        add_meta_data(target_conn, target_run_id, {'snapshot': snapshot_raw})
+        add_snapshot(target_conn, target_run_id, snapshot_raw)
+
+    return n_rows
 
 
 def _populate_results_table(source_conn: ConnectionPlus,
                             target_conn: ConnectionPlus,
                             source_table_name: str,
-                            target_table_name: str) -> None:
+                            target_table_name: str) -> int:
     """
-    Copy over all the entries of the results table
+    Copy over all the entries of the results table and return their number
     """
     get_data_query = f"""
                      SELECT *
@@ -228,16 +361,47 @@ def _populate_results_table(source_conn: ConnectionPlus,
     source_cursor = source_conn.cursor()
     target_cursor = target_conn.cursor()
 
-    for row in source_cursor.execute(get_data_query):
-        column_names = ','.join(row.keys()[1:])  # the first key is "id"
-        values = tuple(val for val in row[1:])
-        value_placeholders = sql_placeholder_string(len(values))
-        insert_data_query = f"""
-                             INSERT INTO "{target_table_name}"
-                             ({column_names})
-                             values {value_placeholders}
-                             """
-        target_cursor.execute(insert_data_query, values)
+    source_cursor.execute(get_data_query)
+    # the first column is "id"
+    column_names = ','.join(column[0]
+                            for column in source_cursor.description[1:])
+    if column_names == '':
+        return 0
+    value_placeholders = sql_placeholder_string(
+        len(source_cursor.description) - 1)
+    insert_data_query = f"""
+                         INSERT INTO "{target_table_name}"
+                         ({column_names})
+                         values {value_placeholders}
+                         """
+    target_cursor.executemany(insert_data_query,
+                              (tuple(row)[1:] for row in source_cursor))
+
+    return target_cursor.rowcount
+
+
+def _copy_results_table(target_conn: ConnectionPlus,
+                        source_schema: str,
+                        source_table_name: str,
+                        target_table_name: str) -> int:
+    """
+    Copy over all the entries of the results table of the source DB, which
+    is attached to the target connection as ``source_schema``, with a
+    single ``INSERT INTO ... SELECT`` statement and return their number
+    """
+    cursor = target_conn.cursor()
+    cursor.execute(f'PRAGMA {source_schema}.table_info("{source_table_name}")')
+    # the first column is "id", which is assigned anew
+    column_names = ','.join(f'"{row[1]}"' for row in cursor.fetchall()[1:])
+    if column_names == '':
+        return 0
+    cursor.execute(f"""
+                   INSERT INTO "{target_table_name}" ({column_names})
+                   SELECT {column_names}
+                   FROM {source_schema}."{source_table_name}"
+                   ORDER BY id
+                   """)
+    return cursor.rowcount
 
 
 def _rewrite_timestamps(target_conn: ConnectionPlus, target_run_id: int,
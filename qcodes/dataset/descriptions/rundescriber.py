@@ -1,8 +1,11 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 
 from qcodes.dataset.descriptions.dependencies import InterDependencies_
 
 
+Shapes = Dict[str, Tuple[int, ...]]
+
+
 class RunDescriber:
     """
     The object that holds the description of each run in the database. This
@@ -14,16 +17,27 @@ class RunDescriber:
     convert themselves to dictionary and added as attributes to the
     RunDescriber, such that the RunDescriber can iteratively convert its
     attributes when converting itself to dictionary.
+
+    Optionally, it holds the expected shapes of the data of the parameters,
+    i.e. a dictionary from the names of the parameters to tuples with the
+    number of points along each axis of the sweep (followed by the shape of
+    the values for array parameters).
     """
 
-    def __init__(self, interdeps: InterDependencies_) -> None:
+    def __init__(self, interdeps: InterDependencies_,
+                 shapes: Optional[Shapes] = None) -> None:
 
         if not isinstance(interdeps, InterDependencies_):
             raise ValueError('The interdeps arg must be of type: '
                              'InterDependencies_. '
                              f'Got {type(interdeps)}.')
 
+        if shapes is not None:
+            shapes = {name: tuple(int(n) for n in shape)
+                      for name, shape in shapes.items()}
+
         self.interdeps = interdeps
+        self.shapes = shapes
 
         self._version = 1
 
@@ -39,6 +53,8 @@ class RunDescriber:
         ser: Dict[str, Any] = {}
         ser['version'] = self._version
         ser['interdependencies'] = self.interdeps._to_dict()
+        if self.shapes is not None:
+            ser['shapes'] = self.shapes
 
         return ser
 
@@ -50,7 +66,8 @@ class RunDescriber:
         """
 
         rundesc = cls(
-            InterDependencies_._from_dict(ser['interdependencies']))
+            InterDependencies_._from_dict(ser['interdependencies']),
+            shapes=ser.get('shapes'))
 
         return rundesc
 
@@ -59,7 +76,11 @@ class RunDescriber:
             return False
         if self.interdeps != other.interdeps:
             return False
+        if self.shapes != other.shapes:
+            return False
         return True
 
     def __repr__(self) -> str:
-        return f"RunDescriber({self.interdeps})"
+        if self.shapes is None:
+            return f"RunDescriber({self.interdeps})"
+        return f"RunDescriber({self.interdeps}, shapes={self.shapes})"
@@ -19,6 +19,11 @@ data storage infrastructure of QCoDeS
 The names of the functions in this module follow the "to_*"/"from_*"
 convention where "*" stands for the storage format. Also note the
 "as_version", "for_storage", "to_current", "to_native" suffixes.
+
+The shapes of the data of a RunDescriber are optional and are stored in an
+extra 'shapes' entry of the dictionary, whatever the version, since they do
+not affect how the rest of the RunDescriber is interpreted. Versions of
+QCoDeS that do not know about shapes simply ignore that entry.
 """
 import io
 import json
@@ -69,7 +74,11 @@ def from_dict_to_current(dct: Dict[str, Any]) -> current.RunDescriber:
     """
     desc = from_dict_to_native(dct)
 
-    return _converters[(desc.version, CURRENT_VERSION)](desc)
+    current_desc = _converters[(desc.version, CURRENT_VERSION)](desc)
+    if dct.get('shapes') is not None:
+        current_desc = current.RunDescriber(current_desc.interdeps,
+                                            shapes=dct['shapes'])
+    return current_desc
 
 
 def to_dict_as_version(desc: SomeRunDescriber,
@@ -78,7 +87,11 @@ def to_dict_as_version(desc: SomeRunDescriber,
     Convert the given RunDescriber into a dictionary that represents a
     RunDescriber of the given version
     """
-    return _converters[(desc.version, version)](desc)._to_dict()
+    ser = _converters[(desc.version, version)](desc)._to_dict()
+    shapes = getattr(desc, 'shapes', None)
+    if shapes is not None:
+        ser['shapes'] = shapes
+    return ser
 
 
 def to_dict_for_storage(desc: SomeRunDescriber) -> Dict[str, Any]:
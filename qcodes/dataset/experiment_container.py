@@ -11,8 +11,8 @@ from qcodes.dataset.sqlite.queries import new_experiment as ne, \
     get_last_experiment, get_experiments, \
     get_experiment_name_from_experiment_id, get_runid_from_expid_and_counter, \
     get_sample_name_from_experiment_id
-from qcodes.dataset.sqlite.database import get_DB_location, get_DB_debug, \
-    connect, conn_from_dbpath_or_conn
+from qcodes.dataset.sqlite.database import get_DB_location, connect, \
+    conn_from_dbpath_or_conn, get_pooled_connection, reconnect_if_closed
 from qcodes.dataset.sqlite.query_helpers import select_one_where
 
 
@@ -47,7 +47,7 @@ class Experiment(Sized):
               to the DB file specified in the config is made
         """
 
-        self.conn = conn_from_dbpath_or_conn(conn, path_to_db)
+        self._conn = conn_from_dbpath_or_conn(conn, path_to_db)
 
         max_id = len(get_experiments(self.conn))
 
@@ -73,6 +73,15 @@ class Experiment(Sized):
             sample_name = sample_name or "some_sample"
             self._exp_id = ne(self.conn, name, sample_name, format_string)
 
+    @property
+    def conn(self) -> ConnectionPlus:
+        """
+        The connection to the database. A pooled connection that has been
+        closed is replaced by a new one from the pool.
+        """
+        self._conn = reconnect_if_closed(self._conn)
+        return self._conn
+
     @property
     def exp_id(self) -> int:
         return self._exp_id
@@ -187,10 +196,11 @@ def experiments()->List[Experiment]:
         All the experiments in the container
     """
     log.info("loading experiments from {}".format(get_DB_location()))
-    rows = get_experiments(connect(get_DB_location(), get_DB_debug()))
+    conn = get_pooled_connection()
+    rows = get_experiments(conn)
     experiments = []
     for row in rows:
-        experiments.append(load_experiment(row['exp_id']))
+        experiments.append(Experiment(exp_id=row['exp_id'], conn=conn))
     return experiments
 
 
@@ -229,7 +239,7 @@ def load_experiment(exp_id: int) -> Experiment:
     """
     if not isinstance(exp_id, int):
         raise ValueError('Experiment ID must be an integer')
-    return Experiment(exp_id=exp_id)
+    return Experiment(exp_id=exp_id, conn=get_pooled_connection())
 
 
 def load_last_experiment() -> Experiment:
@@ -239,10 +249,11 @@ def load_last_experiment() -> Experiment:
     Returns:
         last experiment
     """
-    last_exp_id = get_last_experiment(connect(get_DB_location()))
+    conn = get_pooled_connection()
+    last_exp_id = get_last_experiment(conn)
     if last_exp_id is None:
         raise ValueError('There are no experiments in the database file')
-    return Experiment(exp_id=last_exp_id)
+    return Experiment(exp_id=last_exp_id, conn=conn)
 
 
 def load_experiment_by_name(name: str,
@@ -257,8 +268,8 @@ def load_experiment_by_name(name: str,
     Args:
         name: the name of the experiment
         sample: the name of the sample
-        conn: connection to the database. If not supplied, a new connection
-          to the DB file specified in the config is made
+        conn: connection to the database. If not supplied, a pooled connection
+          to the DB file specified in the config is used
 
     Returns:
         the requested experiment
@@ -266,7 +277,7 @@ def load_experiment_by_name(name: str,
     Raises:
         ValueError if the name is not unique and sample name is None.
     """
-    conn = conn or connect(get_DB_location())
+    conn = conn or get_pooled_connection()
 
     if sample:
         sql = """
@@ -316,13 +327,13 @@ def load_or_create_experiment(experiment_name: str,
     Args:
         experiment_name: Name of the experiment to find or create
         sample_name: Name of the sample
-        conn: Connection to the database. If not supplied, a new connection
-          to the DB file specified in the config is made
+        conn: Connection to the database. If not supplied, a pooled connection
+          to the DB file specified in the config is used
 
     Returns:
         The found or created experiment
     """
-    conn = conn or connect(get_DB_location())
+    conn = conn or get_pooled_connection()
     try:
         experiment = load_experiment_by_name(experiment_name, sample_name,
                                              conn=conn)
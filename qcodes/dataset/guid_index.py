@@ -0,0 +1,256 @@
+"""
+This module provides a resolver of the GUIDs of runs across several database
+files. Looking up many GUIDs by opening every database file and querying it
+GUID by GUID is slow, hence the `GUIDResolver` keeps a persistent index of
+the GUIDs of the runs of a set of database files in a database file of its
+own, the "side index", and looks up any number of GUIDs in it with a single
+query.
+
+The side index is refreshed incrementally: database files that have not
+changed since they were last indexed are not opened, and of those that have
+changed only the runs added since are read, since run_ids only ever grow.
+Changes to the GUIDs of existing runs (e.g. by `update_GUIDs`) are detected
+for the last indexed run only; ``refresh(full=True)`` reindexes everything.
+"""
+import json
+import logging
+import os
+import sqlite3
+from os.path import expanduser
+from typing import (Dict, Iterable, List, NamedTuple, Optional, Sequence,
+                    Tuple)
+
+from qcodes.dataset.sqlite.connection import ConnectionPlus, atomic, \
+    atomic_transaction, transaction
+from qcodes.dataset.sqlite.database import read_only_uri
+
+
+log = logging.getLogger(__name__)
+
+
+class RunLocation(NamedTuple):
+    """
+    The location of a run, the database file and the run_id of the run in it
+    """
+    path_to_db: str
+    run_id: int
+
+
+def _normalise_path(path_to_db: str) -> str:
+    return os.path.normcase(os.path.abspath(expanduser(path_to_db)))
+
+
+def _file_signature(path_to_db: str) -> Optional[str]:
+    """
+    Return a string that changes whenever the database file at the given
+    path is written to, None if the file does not exist. The write-ahead log
+    is taken into account, since the database file itself is only written to
+    when the log is checkpointed.
+    """
+    parts = []
+    for path in (path_to_db, path_to_db + '-wal'):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            if path == path_to_db:
+                return None
+            continue
+        parts.append(f'{stat.st_mtime_ns}:{stat.st_size}')
+    return ';'.join(parts)
+
+
+class GUIDResolver:
+    """
+    A resolver of the GUIDs of runs to the database files and run_ids of the
+    runs, by means of a persistent side index of a set of database files.
+
+    The database files are remembered in the side index, such that a
+    resolver created for an existing side index resolves GUIDs in the same
+    database files.
+
+    Args:
+        path_to_index: The path to the database file of the side index. It
+            is created if it does not exist.
+        paths_to_dbs: The paths to database files to add to the side index,
+            see `add_database`
+    """
+
+    def __init__(self, path_to_index: str,
+                 paths_to_dbs: Iterable[str] = ()) -> None:
+        self.path_to_index = path_to_index
+        self.conn = ConnectionPlus(sqlite3.connect(path_to_index))
+        with atomic(self.conn) as conn:
+            transaction(conn, """
+                        CREATE TABLE IF NOT EXISTS databases (
+                            db_id INTEGER PRIMARY KEY,
+                            path TEXT NOT NULL UNIQUE,
+                            signature TEXT,
+                            last_run_id INTEGER NOT NULL DEFAULT 0,
+                            last_guid TEXT
+                        )
+                        """)
+            transaction(conn, """
+                        CREATE TABLE IF NOT EXISTS runs (
+                            guid TEXT NOT NULL,
+                            db_id INTEGER NOT NULL,
+                            run_id INTEGER NOT NULL,
+                            PRIMARY KEY (guid, db_id, run_id)
+                        ) WITHOUT ROWID
+                        """)
+            transaction(conn, "CREATE INDEX IF NOT EXISTS IX_runs_db_id "
+                              "ON runs (db_id)")
+        for path_to_db in paths_to_dbs:
+            self.add_database(path_to_db)
+
+    @property
+    def databases(self) -> List[str]:
+        """
+        The paths to the database files in the side index, in the order in
+        which they were added
+        """
+        cursor = atomic_transaction(self.conn, 'SELECT path FROM databases '
+                                               'ORDER BY db_id')
+        return [row[0] for row in cursor.fetchall()]
+
+    def add_database(self, path_to_db: str) -> None:
+        """
+        Add a database file to the side index. Its runs are indexed at the
+        next refresh. Adding a database file that is in the side index
+        already is a NOOP.
+        """
+        atomic_transaction(self.conn, 'INSERT OR IGNORE INTO databases '
+                                      '(path) VALUES (?)',
+                           _normalise_path(path_to_db))
+
+    def remove_database(self, path_to_db: str) -> None:
+        """
+        Remove a database file and its runs from the side index
+        """
+        path = _normalise_path(path_to_db)
+        with atomic(self.conn) as conn:
+            transaction(conn, 'DELETE FROM runs WHERE db_id IN '
+                              '(SELECT db_id FROM databases WHERE path = ?)',
+                        path)
+            transaction(conn, 'DELETE FROM databases WHERE path = ?', path)
+
+    def refresh(self, full: bool = False) -> None:
+        """
+        Bring the side index up to date with the database files. Database
+        files that have not been written to since they were last indexed
+        are skipped, of the others only the new runs are indexed, unless
+        the GUID of the last indexed run has changed, in which case the
+        database file is reindexed.
+
+        Args:
+            full: Whether to reindex all database files
+        """
+        if full:
+            with atomic(self.conn) as conn:
+                transaction(conn, 'DELETE FROM runs')
+                transaction(conn, """
+                            UPDATE databases
+                            SET signature = NULL, last_run_id = 0,
+                                last_guid = NULL
+                            """)
+        cursor = atomic_transaction(self.conn, """
+                                    SELECT db_id, path, signature,
+                                           last_run_id, last_guid
+                                    FROM databases
+                                    """)
+        for db_id, path, signature, last_run_id, last_guid in \
+                cursor.fetchall():
+            self._refresh_database(db_id, path, signature, last_run_id,
+                                   last_guid)
+
+    def _refresh_database(self, db_id: int, path: str,
+                          signature: Optional[str], last_run_id: int,
+                          last_guid: Optional[str]) -> None:
+        new_signature = _file_signature(path)
+        if new_signature == signature:
+            return
+        if new_signature is None:
+            log.warning(f'The database file {path} does not exist, its runs '
+                        f'are removed from the GUID index.')
+            last_run_id = 0
+
+        runs: List[Tuple[int, str]] = []
+        if new_signature is not None:
+            db_conn = sqlite3.connect(read_only_uri(path), uri=True)
+            try:
+                if last_run_id > 0:
+                    row = db_conn.execute('SELECT guid FROM runs '
+                                          'WHERE run_id = ?',
+                                          (last_run_id,)).fetchone()
+                    if row is None or row[0] != last_guid:
+                        log.info(f'The runs of {path} have changed, '
+                                 f'reindexing it.')
+                        last_run_id = 0
+                runs = db_conn.execute('SELECT run_id, guid FROM runs '
+                                       'WHERE run_id > ? ORDER BY run_id',
+                                       (last_run_id,)).fetchall()
+            finally:
+                db_conn.close()
+
+        with atomic(self.conn) as conn:
+            if last_run_id == 0:
+                transaction(conn, 'DELETE FROM runs WHERE db_id = ?', db_id)
+            conn.cursor().executemany(
+                'INSERT OR IGNORE INTO runs (guid, db_id, run_id) '
+                'VALUES (?, ?, ?)',
+                # in the order of the primary key, which is much faster
+                sorted((guid, db_id, run_id) for run_id, guid in runs))
+            if runs:
+                last_run_id, last_guid = runs[-1]
+            elif last_run_id == 0:
+                last_guid = None
+            transaction(conn, """
+                        UPDATE databases
+                        SET signature = ?, last_run_id = ?, last_guid = ?
+                        WHERE db_id = ?
+                        """, new_signature, last_run_id, last_guid, db_id)
+        log.debug(f'Indexed {len(runs)} new runs of {path}')
+
+    def resolve(self, guids: Sequence[str],
+                refresh: bool = True) -> Dict[str, List[RunLocation]]:
+        """
+        Look up the database files and run_ids of the runs with the given
+        GUIDs. A run may be found in several database files, e.g. if it has
+        been extracted into another database file with
+        `extract_runs_into_db`.
+
+        Args:
+            guids: The GUIDs to look up
+            refresh: Whether to refresh the side index first
+
+        Returns:
+            A dict from the GUIDs to the locations of their runs, in the
+            order in which the database files were added. GUIDs that are
+            not found are mapped to empty lists.
+        """
+        if refresh:
+            self.refresh()
+        locations: Dict[str, List[RunLocation]] = {guid: [] for guid in guids}
+        cursor = atomic_transaction(self.conn, """
+                                    SELECT runs.guid, databases.path,
+                                           runs.run_id
+                                    FROM json_each(?) AS guids
+                                    JOIN runs ON runs.guid = guids.value
+                                    JOIN databases
+                                    ON databases.db_id = runs.db_id
+                                    ORDER BY databases.db_id, runs.run_id
+                                    """, json.dumps(list(locations)))
+        for guid, path, run_id in cursor.fetchall():
+            locations[guid].append(RunLocation(path, run_id))
+        return locations
+
+    def close(self) -> None:
+        """
+        Close the connection to the side index
+        """
+        self.conn.close()
+
+    def __enter__(self) -> 'GUIDResolver':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
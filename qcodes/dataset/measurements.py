@@ -7,9 +7,12 @@ using the :class:`.Measurement` class.
 
 import json
 import logging
+from queue import Queue, Full
+from threading import Thread
 from time import perf_counter
 from typing import (Callable, Union, Dict, Tuple, List, Sequence, cast, Set,
-                    MutableMapping, MutableSequence, Optional, Any, TypeVar)
+                    Mapping, MutableMapping, MutableSequence, Optional, Any,
+                    TypeVar)
 from inspect import signature
 from numbers import Number
 from copy import deepcopy
@@ -22,9 +25,11 @@ from qcodes.instrument.parameter import ArrayParameter, _BaseParameter, \
     Parameter, MultiParameter, ParameterWithSetpoints
 from qcodes.dataset.experiment_container import Experiment
 from qcodes.dataset.descriptions.param_spec import ParamSpec, ParamSpecBase
+from qcodes.dataset.descriptions.rundescriber import Shapes
 from qcodes.dataset.descriptions.dependencies import (
     InterDependencies_, DependencyError, InferenceError)
-from qcodes.dataset.data_set import DataSet, VALUE
+from qcodes.dataset.data_set import DataSet, VALUE, _Subscriber
+from qcodes.dataset.sqlite.database import connect
 from qcodes.utils.helpers import NumpyJSONEncoder
 from qcodes.utils.deprecate import deprecate
 import qcodes.utils.validators as vals
@@ -63,6 +68,203 @@ def is_number(thing: Any) -> bool:
         return False
 
 
+class _BackgroundWriter(Thread):
+    """
+    Thread that writes the results of a `DataSaver` to the database, such
+    that the measurement loop does not have to wait for the database writes.
+
+    The thread uses its own connection to the database file of the dataset
+    and consumes write jobs from a bounded queue. Putting a job into a full
+    queue blocks, which provides backpressure if the measurement produces
+    data faster than it can be written. If a write fails, the exception is
+    stored in the `error` attribute and all following jobs are discarded.
+
+    The _BackgroundWriter is not meant to be instantiated directly, but rather
+    used via the `write_in_background` argument of the `DataSaver`.
+
+    NOTE: Subscribers of the dataset that use database triggers are only
+    notified about the writes of this thread if they have been added before
+    the thread was created.
+    """
+    def __init__(self, dataset: DataSet, queue_size: int) -> None:
+        super().__init__(daemon=True)
+        self._path_to_db = dataset.path_to_db
+        self._run_id = dataset.run_id
+        # The subscriber triggers call back into python functions that are
+        # registered per connection, hence they must be registered on the
+        # connection of this thread as well
+        self._subscriber_callbacks = {
+            sub.callback_id: sub._cache_data_to_queue
+            for sub in dataset.subscribers.values()
+            if isinstance(sub, _Subscriber)}
+        self.queue: Queue = Queue(maxsize=queue_size)
+        self.error: Optional[Exception] = None
+
+    def run(self) -> None:
+        conn = None
+        dataset = None
+        try:
+            conn = connect(self._path_to_db)
+            for callback_id, func in self._subscriber_callbacks.items():
+                conn.create_function(callback_id, -1, func)
+            dataset = DataSet(conn=conn, run_id=self._run_id)
+        except Exception as e:
+            log.exception('Background writer could not connect to database')
+            self.error = e
+
+        while True:
+            job = self.queue.get()
+            try:
+                if job is None:
+                    break
+                if self.error is None:
+                    method, payload = job
+                    getattr(dataset, method)(payload)
+            except Exception as e:
+                log.exception('Background writer could not commit to '
+                              'database')
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+        if conn is not None:
+            conn.close()
+
+    def put(self, method: str, payload: Any) -> None:
+        """
+        Enqueue a write job, i.e. a call of the DataSet method with the given
+        name with the given payload. Blocks while the queue is full.
+        """
+        while True:
+            self.raise_if_failed()
+            try:
+                self.queue.put((method, payload), timeout=0.1)
+                return
+            except Full:
+                continue
+
+    def drain(self) -> None:
+        """
+        Wait until all enqueued jobs have been written
+        """
+        self.queue.join()
+        self.raise_if_failed()
+
+    def stop(self) -> None:
+        """
+        Write all enqueued jobs and stop the thread
+        """
+        self.queue.put(None)
+        self.join()
+
+    def raise_if_failed(self) -> None:
+        if self.error is not None:
+            raise RuntimeError('Writing results to the database in the '
+                               'background failed.') from self.error
+
+
+# the kinds of numpy dtypes of scalar values of the most common types, for
+# validating the types of scalar results without converting them to arrays
+_SCALAR_KINDS: Dict[type, str] = {
+    float: 'f', str: 'U', complex: 'c',
+    np.float64: 'f', np.float32: 'f', np.int64: 'i', np.int32: 'i',
+    np.complex128: 'c', np.str_: 'U'}
+
+_ALLOWED_KINDS = {'numeric': 'iuf', 'text': 'SU', 'array': 'iufc',
+                  'complex': 'c'}
+
+_SCALAR_CONVERTERS: Dict[str, Callable[[Any], VALUE]] = {
+    'numeric': float, 'text': str, 'complex': complex}
+
+
+def _scalar_kind(value: Any) -> Optional[str]:
+    """
+    Return the kind of the numpy dtype of a scalar value, or None if it is
+    not a scalar of a common type
+    """
+    kind = _SCALAR_KINDS.get(type(value))
+    if kind is None and type(value) is int and -2**63 <= value < 2**63:
+        kind = 'i'
+    return kind
+
+
+class _ResultPlan:
+    """
+    The plan for validating and unpacking the results of
+    `DataSaver.add_result` for a given sequence of parameters (none of which
+    are ArrayParameters or MultiParameters). The plan is compiled once per
+    sequence of parameters and reused for all calls with the same
+    parameters, such that the dependencies of the parameters are validated
+    and the parameter trees are looked up only once. Scalar values of
+    'numeric', 'text' and 'complex' parameters are turned into results
+    directly, everything else goes through the validation of `DataSaver`.
+
+    Args:
+        parameters: The specs of the parameters, in the order of the
+            results, validated to form a valid subset of ``interdeps``
+        interdeps: The interdependencies of the measurement
+    """
+
+    def __init__(self, parameters: Sequence[ParamSpecBase],
+                 interdeps: InterDependencies_) -> None:
+        self.parameters = tuple(parameters)
+        self._allowed_kinds = tuple(_ALLOWED_KINDS[ps.type]
+                                    for ps in self.parameters)
+
+        results = set(self.parameters)
+        # the same (arbitrary) order of parameter trees and of parameters
+        # in trees as in `DataSaver._enqueue_results`
+        trees = []
+        for toplevel_param in (set(interdeps.dependencies)
+                               .intersection(results)):
+            all_params = (set(interdeps.inferences.get(toplevel_param, ()))
+                          .union(interdeps.dependencies[toplevel_param])
+                          .union({toplevel_param}))
+            trees.append((toplevel_param, all_params))
+        standalones = set(interdeps.standalones).intersection(results)
+
+        self.scalar = (
+            all(toplevel_param.type in _SCALAR_CONVERTERS
+                and all(ps.type in _SCALAR_CONVERTERS for ps in all_params)
+                for toplevel_param, all_params in trees)
+            and all(ps.type in ('numeric', 'text') for ps in standalones))
+        if self.scalar:
+            # the index of the value of every parameter, the last one given
+            index = {ps: i for i, ps in enumerate(self.parameters)}
+            self._rows = [tuple((ps.name, _SCALAR_CONVERTERS[ps.type],
+                                 index[ps])
+                                for ps in all_params)
+                          for _, all_params in trees]
+            self._rows += [((ps.name, _SCALAR_CONVERTERS[ps.type],
+                             index[ps]),)
+                           for ps in standalones]
+
+    def scalar_results(self, values: Sequence[Any]
+                       ) -> Optional[List[Dict[str, VALUE]]]:
+        """
+        Turn the given values of the parameters into results, if they are
+        all scalars of common types that are valid for their parameters.
+        Return None otherwise.
+        """
+        if not self.scalar:
+            return None
+        for allowed_kinds, value in zip(self._allowed_kinds, values):
+            kind = _scalar_kind(value)
+            if kind is None or kind not in allowed_kinds:
+                return None
+        return [{name: convert(values[i]) for name, convert, i in row}
+                for row in self._rows]
+
+    def results_dict(self, values: Sequence[Any]
+                     ) -> Dict[ParamSpecBase, np.ndarray]:
+        """
+        Return the standard results dict for the given values of the
+        parameters
+        """
+        return {ps: np.array(value)
+                for ps, value in zip(self.parameters, values)}
+
+
 class DataSaver:
     """
     The class used by the Runner context manager to handle the datasaving to
@@ -71,10 +273,16 @@ class DataSaver:
 
     default_callback: Optional[dict] = None
 
+    # the maximal number of pending flushes when writing in the background
+    background_queue_size = 16
+
     def __init__(self, dataset: DataSet,
                  write_period: numeric_types,
-                 interdeps: InterDependencies_) -> None:
+                 interdeps: InterDependencies_,
+                 write_in_background: bool = False,
+                 in_memory_cache: bool = False) -> None:
         self._dataset = dataset
+        self._in_memory_cache = in_memory_cache
         if DataSaver.default_callback is not None \
                 and 'run_tables_subscription_callback' \
                     in DataSaver.default_callback:
@@ -84,7 +292,7 @@ class DataSaver:
                 'run_tables_subscription_min_wait']
             min_count = DataSaver.default_callback[
                 'run_tables_subscription_min_count']
-            snapshot = dataset.get_metadata('snapshot')
+            snapshot = dataset.snapshot_raw
             self._dataset.subscribe(callback,
                                     min_wait=min_wait,
                                     min_count=min_count,
@@ -102,6 +310,14 @@ class DataSaver:
         self._results: List[Dict[str, VALUE]] = []
         self._last_save_time = perf_counter()
         self._known_dependencies: Dict[str, List[str]] = {}
+        # the compiled plans of add_result by the parameters of the results
+        self._result_plans: Dict[Tuple[Any, ...], Optional[_ResultPlan]] = {}
+
+        self._writer: Optional[_BackgroundWriter] = None
+        if write_in_background:
+            self._writer = _BackgroundWriter(dataset,
+                                             self.background_queue_size)
+            self._writer.start()
 
     def add_result(self, *res_tuple: res_type) -> None:
         """
@@ -130,8 +346,61 @@ class DataSaver:
                 (the exception being that setpoints can always be scalar)
             ParameterTypeError: if a parameter is given a value not matching
                 its type.
+            RuntimeError: if writing in the background has failed
         """
+        if self._writer is not None:
+            self._writer.raise_if_failed()
+
+        plan = self._get_result_plan(res_tuple)
+        if plan is not None:
+            values = [partial_result[1] for partial_result in res_tuple]
+            results = plan.scalar_results(values)
+            if results is not None:
+                self._results += results
+            else:
+                results_dict = plan.results_dict(values)
+                self._validate_result_shapes(results_dict)
+                self._validate_result_types(results_dict)
+                self._enqueue_results(results_dict)
+        else:
+            self._add_unplanned_result(res_tuple)
 
+        if perf_counter() - self._last_save_time > self.write_period:
+            self.flush_data_to_database()
+            self._last_save_time = perf_counter()
+
+    def _get_result_plan(self, res_tuple: Sequence[res_type]
+                         ) -> Optional[_ResultPlan]:
+        """
+        Return the plan of add_result for the parameters of the given
+        results, compiling it on the first call with these parameters. There
+        is no plan (None) for results of ArrayParameters and MultiParameters,
+        whose setpoints are unpacked on every call.
+        """
+        key = tuple(partial_result[0] for partial_result in res_tuple)
+        try:
+            return self._result_plans[key]
+        except KeyError:
+            pass
+        except TypeError:
+            # an unhashable parameter, which is not found by its name anyway
+            return None
+
+        plan = None
+        if not any(isinstance(parameter, (ArrayParameter, MultiParameter))
+                   for parameter in key):
+            parameters = [self._get_paramspec(parameter)
+                          for parameter in key]
+            self._validate_result_deps(dict.fromkeys(parameters))
+            plan = _ResultPlan(parameters, self._interdeps)
+        self._result_plans[key] = plan
+        return plan
+
+    def _add_unplanned_result(self, res_tuple: Sequence[res_type]) -> None:
+        """
+        Validate and enqueue the given results, which contain results of
+        ArrayParameters or MultiParameters
+        """
         # we iterate through the input twice. First we find any array and
         # multiparameters that need to be unbundled and collect the names
         # of all parameters. This also allows users to call
@@ -158,9 +427,97 @@ class DataSaver:
 
         self._enqueue_results(results_dict)
 
-        if perf_counter() - self._last_save_time > self.write_period:
-            self.flush_data_to_database()
-            self._last_save_time = perf_counter()
+    def add_result_columns(self, *res_tuple: res_type) -> None:
+        """
+        Add a block of results to the measurement, given as one array of
+        values per parameter, e.g. for a sweep of 1000 points of a voltage
+        v1 and a measured current c1
+        >> datasaver.add_result_columns((v1, v1_values), (c1, c1_values))
+
+        All arrays must have the same number of elements; the i-th element
+        of each array belongs to the i-th measurement point. Scalar values are
+        broadcast to all points. For 'array' type parameters, the first axis
+        runs over the measurement points.
+
+        As opposed to `add_result`, the values are not unrolled into one
+        dictionary per point, but written to the database column by column.
+        Any results still held in memory are flushed before the block is
+        written, so that the order of the results is preserved.
+
+        Args:
+            res_tuple: tuples of a parameter (or its name) and the array of
+                values for that parameter
+
+        Raises:
+            ValueError: if a parameter name not registered in the parent
+                Measurement object is encountered, if the given parameters
+                do not form complete trees of parameters and setpoints, or if
+                the arrays are not all of the same length
+            ValueError: if a parameter is given a value not matching
+                its type.
+            RuntimeError: if writing in the background has failed
+        """
+        if self._writer is not None:
+            self._writer.raise_if_failed()
+
+        results_dict: Dict[ParamSpecBase, np.ndarray] = {}
+
+        for partial_result in res_tuple:
+            parameter = partial_result[0]
+            if isinstance(parameter, (ArrayParameter, MultiParameter)):
+                raise ValueError(f'Can not add columns for {parameter}. '
+                                 f'{type(parameter).__name__}s are not '
+                                 'supported by add_result_columns, please '
+                                 'use add_result instead.')
+            results_dict.update(self._unpack_partial_result(partial_result))
+
+        self._validate_result_deps(results_dict)
+        self._validate_result_types(results_dict)
+
+        columns = self._make_result_columns(results_dict)
+
+        self.flush_data_to_database()
+        if self._writer is not None:
+            self._writer.put('add_columns', columns)
+        else:
+            self._dataset.add_columns(columns)
+        if self._in_memory_cache:
+            self._dataset.cache.add_columns(columns)
+        self._last_save_time = perf_counter()
+
+    @staticmethod
+    def _make_result_columns(
+            results_dict: Dict[ParamSpecBase, np.ndarray]
+            ) -> Dict[str, np.ndarray]:
+        """
+        Bring the values of a block of results into columns of equal
+        length, broadcasting scalar values
+        """
+        def n_points(ps: ParamSpecBase, values: np.ndarray) -> Optional[int]:
+            if ps.type == 'array':
+                return len(values) if values.ndim > 0 else None
+            return values.size if values.shape != () else None
+
+        lengths = {ps.name: n_points(ps, vals)
+                   for ps, vals in results_dict.items()}
+        distinct_lengths = set(lengths.values()) - {None}
+        if len(distinct_lengths) > 1:
+            raise ValueError('Can not add result columns of different '
+                             f'lengths. Got lengths {lengths}.')
+        n = distinct_lengths.pop() if distinct_lengths else 1
+
+        columns: Dict[str, np.ndarray] = {}
+        for ps, vals in results_dict.items():
+            if lengths[ps.name] is None and ps.type == 'array':
+                columns[ps.name] = np.broadcast_to(np.reshape(vals, (1,)),
+                                                   (n, 1))
+            elif lengths[ps.name] is None:
+                columns[ps.name] = np.broadcast_to(vals, (n,))
+            elif ps.type == 'array':
+                columns[ps.name] = vals
+            else:
+                columns[ps.name] = vals.ravel()
+        return columns
 
     def _unpack_partial_result(
             self,
@@ -171,13 +528,20 @@ class DataSaver:
         dict
         """
         param, values = partial_result
+        return {self._get_paramspec(param): np.array(values)}
+
+    def _get_paramspec(
+            self, param: Union[_BaseParameter, str]) -> ParamSpecBase:
+        """
+        Return the spec of a parameter (not an ArrayParameter or
+        MultiParameter) registered with the measurement
+        """
         try:
-            parameter = self._interdeps._id_to_paramspec[str(param)]
+            return self._interdeps._id_to_paramspec[str(param)]
         except KeyError:
             raise ValueError('Can not add result for parameter '
                              f'{param}, no such parameter registered '
                              'with this measurement.')
-        return {parameter: np.array(values)}
 
     def _unpack_arrayparameter(
         self, partial_result: res_type) -> Dict[ParamSpecBase, np.ndarray]:
@@ -347,11 +711,8 @@ class DataSaver:
         Validate the type of the results
         """
 
-        allowed_kinds = {'numeric': 'iuf', 'text': 'SU', 'array': 'iufc',
-                         'complex': 'c'}
-
         for ps, vals in results_dict.items():
-                if vals.dtype.kind not in allowed_kinds[ps.type]:
+                if vals.dtype.kind not in _ALLOWED_KINDS[ps.type]:
                     raise ValueError(f'Parameter {ps.name} is of type '
                                      f'"{ps.type}", but got a result of '
                                      f'type {vals.dtype} ({vals}).')
@@ -503,21 +864,47 @@ class DataSaver:
 
         return res_list
 
-    def flush_data_to_database(self) -> None:
+    def flush_data_to_database(self, block: bool = False) -> None:
         """
         Write the in-memory results to the database.
+
+        When writing in the background, the results are handed over to the
+        writer thread instead.
+
+        Args:
+            block: When writing in the background, wait until all results
+                have actually been written to the database. Errors that
+                occurred during writing are raised. Ignored otherwise.
         """
         log.debug('Flushing to database')
-        if self._results != []:
+        if self._writer is not None:
+            if self._results != []:
+                self._writer.put('add_results', self._results)
+                if self._in_memory_cache:
+                    self._dataset.cache.add_results(self._results)
+                self._results = []
+            if block:
+                self._writer.drain()
+        elif self._results != []:
             try:
                 write_point = self._dataset.add_results(self._results)
                 log.debug(f'Successfully wrote from index {write_point}')
+                if self._in_memory_cache:
+                    self._dataset.cache.add_results(self._results)
                 self._results = []
             except Exception as e:
                 log.warning(f'Could not commit to database; {e}')
         else:
             log.debug('No results to flush')
 
+    def _stop_background_writer(self) -> None:
+        """
+        Stop the background writer (if any) after it has written all
+        pending results
+        """
+        if self._writer is not None:
+            self._writer.stop()
+
     @property
     def run_id(self) -> int:
         return self._dataset.run_id
@@ -551,7 +938,10 @@ class Runner:
             name: str = '',
             subscribers: Sequence[Tuple[Callable,
                                         Union[MutableSequence,
-                                              MutableMapping]]] = None) -> None:
+                                              MutableMapping]]] = None,
+            write_in_background: bool = False,
+            in_memory_cache: bool = False,
+            shapes: Optional[Shapes] = None) -> None:
 
         self.enteractions = enteractions
         self.exitactions = exitactions
@@ -570,6 +960,9 @@ class Runner:
         self.write_period = float(write_period) \
             if write_period is not None else 5.0
         self.name = name if name else 'results'
+        self._write_in_background = write_in_background
+        self._in_memory_cache = in_memory_cache
+        self._shapes = shapes
 
     def __enter__(self) -> DataSaver:
         # TODO: should user actions really precede the dataset?
@@ -598,7 +991,8 @@ class Runner:
         if self._interdependencies == InterDependencies_():
             raise RuntimeError("No parameters supplied")
         else:
-            self.ds.set_interdependencies(self._interdependencies)
+            self.ds.set_interdependencies(self._interdependencies,
+                                          shapes=self._shapes)
 
         self.ds.mark_started()
 
@@ -612,25 +1006,33 @@ class Runner:
 
         print(f'Starting experimental run with id: {self.ds.run_id}')
 
-        self.datasaver = DataSaver(dataset=self.ds,
-                                   write_period=self.write_period,
-                                   interdeps=self._interdependencies)
+        self.datasaver = DataSaver(
+            dataset=self.ds,
+            write_period=self.write_period,
+            interdeps=self._interdependencies,
+            write_in_background=self._write_in_background,
+            in_memory_cache=self._in_memory_cache)
 
         return self.datasaver
 
     def __exit__(self, exception_type, exception_value, traceback) -> None:
 
-        self.datasaver.flush_data_to_database()
+        try:
+            # when writing in the background, this waits for all results to
+            # be written and raises if that failed
+            self.datasaver.flush_data_to_database(block=True)
+        finally:
+            self.datasaver._stop_background_writer()
 
-        # perform the "teardown" events
-        for func, args in self.exitactions:
-            func(*args)
+            # perform the "teardown" events
+            for func, args in self.exitactions:
+                func(*args)
 
-        # and finally mark the dataset as closed, thus
-        # finishing the measurement
-        self.ds.mark_completed()
+            # and finally mark the dataset as closed, thus
+            # finishing the measurement
+            self.ds.mark_completed()
 
-        self.ds.unsubscribe_all()
+            self.ds.unsubscribe_all()
 
 
 T = TypeVar('T', bound='Measurement')
@@ -659,6 +1061,7 @@ class Measurement:
         self._write_period: Optional[float] = None
         self.name = ''
         self._interdeps = InterDependencies_()
+        self._shapes: Optional[Shapes] = None
 
     @property
     def parameters(self) -> Dict[str, ParamSpecBase]:
@@ -1065,6 +1468,38 @@ class Measurement:
 
         log.info(f'Removed {param} from Measurement.')
 
+    def set_shapes(self,
+                   shapes: Optional[Mapping[Union[str, _BaseParameter],
+                                            Sequence[int]]]) -> None:
+        """
+        Set the expected shapes of the data of the registered parameters,
+        e.g. ``{dmm.v1: (100, 50)}`` for a 2D sweep of 100 x 50 points over
+        the setpoints of ``dmm.v1`` (in the order of the setpoints), followed
+        by the shape of the values for array parameters. The shapes are
+        stored with the run, and ``DataSet.get_parameter_data`` returns the
+        data of these parameters in this shape, filled up with NaN for runs
+        with fewer points, instead of as flat arrays.
+
+        Args:
+            shapes: dictionary from parameters (or their names) to shapes, or
+                None to remove previously set shapes
+        """
+        if shapes is None:
+            self._shapes = None
+            return
+        validated: Shapes = {}
+        for parameter, shape in shapes.items():
+            name = str(parameter)
+            if name not in self._interdeps.names:
+                raise ValueError(f'Can not set the shape of {name}, it is '
+                                 'not registered with this measurement.')
+            if not all(isinstance(n, (int, np.integer)) and n > 0
+                       for n in shape):
+                raise ValueError(f'Invalid shape {shape} of {name}, a shape '
+                                 'must be a sequence of positive integers.')
+            validated[name] = tuple(int(n) for n in shape)
+        self._shapes = validated
+
     def add_before_run(self: T, func: Callable, args: tuple) -> T:
         """
         Add an action to be performed before the measurement.
@@ -1117,13 +1552,29 @@ class Measurement:
 
         return self
 
-    def run(self) -> Runner:
+    def run(self, write_in_background: bool = False,
+            in_memory_cache: bool = False) -> Runner:
         """
         Returns the context manager for the experimental run
+
+        Args:
+            write_in_background: if True, results are written to the
+                database by a separate thread with its own database
+                connection, such that the measurement loop is not blocked by
+                database writes. Errors of that thread are raised by the next
+                call to `add_result` or when exiting the context manager,
+                which also waits for all results to be written.
+            in_memory_cache: if True, the results are also added to the
+                cache of the dataset (`DataSet.cache`) when they are
+                flushed, such that code in the same process can get the data
+                of the run without reading it from the database.
         """
         return Runner(self.enteractions, self.exitactions,
                       self.experiment, station=self.station,
                       write_period=self._write_period,
                       interdeps=self._interdeps,
                       name=self.name,
-                      subscribers=self.subscribers)
+                      subscribers=self.subscribers,
+                      write_in_background=write_in_background,
+                      in_memory_cache=in_memory_cache,
+                      shapes=self._shapes)
@@ -0,0 +1,141 @@
+"""
+This module exports the data of a DataSet to a directory of raw ``.npy``
+files, which are loaded again with `load_from_npy_dir` as memory-mapped
+arrays for analysis without the database. Memory-mapped arrays are not
+copied into the memory of the analysing process: the pages of the files
+are read on demand and shared by all processes that load the same export.
+
+The data of every parameter tree (a parameter and its setpoints, as
+returned by `DataSet.get_parameter_data`) is written to
+``<parameter>/<name>.npy`` in the directory, one tree at a time, such that
+only the data of one tree has to be held in memory. If the shape of the
+data of a parameter is known (see `Measurement.set_shapes`), the arrays
+have this shape. The sidecar file ``qcodes_npy.json`` describes the
+parameter trees, the files, dtypes and shapes of their arrays and holds
+the metadata of the run, like the attributes of an export to NetCDF. It is
+written last, such that a directory with a sidecar file holds a complete
+export.
+"""
+import json
+import os
+from typing import TYPE_CHECKING, Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from qcodes.dataset.sqlite.queries import get_parameter_data
+from qcodes.dataset.xarray_export import _dataset_attrs, _parameters_to_export
+
+if TYPE_CHECKING:
+    from qcodes.dataset.data_set import DataSet
+
+
+SIDECAR_FILE_NAME = 'qcodes_npy.json'
+
+NPY_EXPORT_VERSION = 1
+
+
+def _write_tree(path: str, param: str, tree: Dict[str, np.ndarray],
+                paramspecs: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Write the arrays of a parameter tree to ``<param>/<name>.npy`` in the
+    directory at the given path and return their description for the
+    sidecar file
+    """
+    os.makedirs(os.path.join(path, param), exist_ok=True)
+    description: Dict[str, Dict[str, Any]] = {}
+    for name, array in tree.items():
+        if array.dtype == np.dtype('O'):
+            raise ValueError(f'The data of {name!r} (in the tree of '
+                             f'{param!r}) is of varying shape or type and '
+                             f'can not be exported to .npy files.')
+        file = f'{param}/{name}.npy'
+        np.save(os.path.join(path, file), array, allow_pickle=False)
+        paramspec = paramspecs[name]
+        description[name] = {'file': file,
+                             'dtype': array.dtype.str,
+                             'shape': list(array.shape),
+                             'paramtype': paramspec.type,
+                             'unit': paramspec.unit,
+                             'label': paramspec.label}
+    return description
+
+
+def export_to_npy_dir(dataset: 'DataSet', path: str,
+                      params: Sequence[str] = ()) -> None:
+    """
+    Export the data of the given parameters (by default all parameters
+    that are not dependencies of other parameters) to ``.npy`` files in the
+    directory at the given path, together with the sidecar file describing
+    them. The directory is created if it does not exist.
+    """
+    os.makedirs(path, exist_ok=True)
+    sidecar_path = os.path.join(path, SIDECAR_FILE_NAME)
+    # an earlier export to the same directory is incomplete from now on
+    if os.path.exists(sidecar_path):
+        os.remove(sidecar_path)
+
+    interdeps = dataset.description.interdeps
+    paramspecs = interdeps._id_to_paramspec
+    shapes = dataset.description.shapes
+    trees: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for param in _parameters_to_export(dataset, params):
+        tree = get_parameter_data(dataset.conn, dataset.table_name, [param],
+                                  shapes=shapes)[param]
+        trees[param] = _write_tree(path, param, tree, paramspecs)
+        # the next tree is only fetched after this one has been released
+        del tree
+
+    sidecar = {'version': NPY_EXPORT_VERSION,
+               'attributes': _dataset_attrs(dataset),
+               'parameters': trees}
+    with open(sidecar_path, 'w') as f:
+        json.dump(sidecar, f, indent=2)
+
+
+def _load_sidecar(path: str) -> Dict[str, Any]:
+    sidecar_path = os.path.join(path, SIDECAR_FILE_NAME)
+    if not os.path.exists(sidecar_path):
+        raise FileNotFoundError(f'{path} does not hold a complete export to '
+                                f'.npy files, {SIDECAR_FILE_NAME} is '
+                                f'missing.')
+    with open(sidecar_path) as f:
+        sidecar = json.load(f)
+    if sidecar['version'] > NPY_EXPORT_VERSION:
+        raise RuntimeError(f'The export in {path} is of version '
+                           f'{sidecar["version"]}, which is newer than the '
+                           f'version {NPY_EXPORT_VERSION} supported by this '
+                           f'version of QCoDeS.')
+    return sidecar
+
+
+def load_from_npy_dir(path: str, mmap_mode: Optional[str] = 'r'
+                      ) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Load the data of a run that has been exported to ``.npy`` files with
+    `DataSet.export`, without the database.
+
+    Args:
+        path: The path to the directory of the export
+        mmap_mode: The mode in which the files are memory-mapped, see
+            `numpy.load`. With the default 'r', the arrays are read-only and
+            not copied into memory. If None, the data is read into memory.
+
+    Returns:
+        The data in the layout of `DataSet.get_parameter_data`, a dict from
+        the exported parameters to dicts from the names of the parameters
+        of their trees to arrays
+    """
+    sidecar = _load_sidecar(path)
+    return {param: {name: np.load(os.path.join(path, array['file']),
+                                  mmap_mode=mmap_mode, allow_pickle=False)
+                    for name, array in tree.items()}
+            for param, tree in sidecar['parameters'].items()}
+
+
+def load_npy_dir_attributes(path: str) -> Dict[str, Any]:
+    """
+    Load the metadata of a run that has been exported to ``.npy`` files
+    with `DataSet.export`, such as its GUID, name and run description, as
+    for the attributes of an export to NetCDF
+    """
+    return _load_sidecar(path)['attributes']
@@ -28,6 +28,8 @@ Number = Union[float, int]
 # NamedData is the structure get_data_by_id returns and that plot_by_id
 # uses internally
 NamedData = List[List[Dict[str, Union[str, np.ndarray]]]]
+# the maximum number of points of a 2D plot, or of points along x and y
+MaxPoints2D = Union[int, Tuple[int, int]]
 
 # list of kwargs for plotting function, so that kwargs can be passed to
 # :func:`plot_dataset` and will be distributed to the respective plotting func.
@@ -93,6 +95,7 @@ def plot_dataset(dataset: DataSet,
                                                    Number]] = None,
                  complex_plot_type: str = 'real_and_imag',
                  complex_plot_phase: str = 'radians',
+                 max_points: Optional[Union[int, str]] = None,
                  **kwargs) -> AxesTupleList:
     """
     Construct all plots for a given dataset
@@ -143,6 +146,13 @@ def plot_dataset(dataset: DataSet,
         complex_plot_phase: format of phase for plotting complex-valued data,
             either ``"radians"`` or ``"degrees"``. Applicable only for the
             cases where the dataset contains complex numbers
+        max_points: if given (at least 2), the data is decimated before it
+            is handed to matplotlib, such that no plot has more than this
+            many points: 1D data is reduced to the envelope of its minima and
+            maxima, heatmaps are averaged over blocks of cells and 2D scatter
+            plots keep one point per bin. If ``"auto"``, the number of points
+            is derived from the size of the axes in pixels. The data used for
+            the axes' scaling and the color scale is not decimated.
 
     Returns:
         a list of axes and a list of colorbars of the same length. The
@@ -167,6 +177,12 @@ def plot_dataset(dataset: DataSet,
             'but can only accept "degrees" or "radians".')
     degrees = complex_plot_phase == "degrees"
 
+    if not (max_points is None or max_points == 'auto'
+            or (isinstance(max_points, int) and max_points >= 2)):
+        raise ValueError(f'Invalid max_points given. Received {max_points} '
+                         f'but can only accept an integer of at least 2, '
+                         f'"auto" or None.')
+
     # Retrieve info about the run for the title
 
     experiment_name = dataset.exp_name
@@ -174,6 +190,7 @@ def plot_dataset(dataset: DataSet,
     title = f"Run #{dataset.run_id}, Experiment {experiment_name} ({sample_name})"
 
     alldata: NamedData = get_data_by_id(dataset.run_id)
+    shapes = dataset.description.shapes or {}
     alldata = _complex_to_real_preparser(alldata,
                                          conversion=complex_plot_type,
                                          degrees=degrees)
@@ -221,6 +238,13 @@ def plot_dataset(dataset: DataSet,
                 xpoints = xpoints[order]
                 ypoints = ypoints[order]
 
+            if max_points is not None and plottype != '1D_bar':
+                limit = 2 * _pixel_size(ax)[0] if max_points == 'auto' \
+                    else max_points
+                xpoints, ypoints = _decimate_envelope(xpoints, ypoints,
+                                                      limit)
+
+            if plottype == '1D_line':
                 with _appropriate_kwargs(plottype,
                                          colorbar is not None, **kwargs) as k:
                     ax.plot(xpoints, ypoints, **k)
@@ -255,7 +279,8 @@ def plot_dataset(dataset: DataSet,
             ypoints = flatten_1D_data_for_plot(data[1]['data'])
             zpoints = flatten_1D_data_for_plot(data[2]['data'])
 
-            plottype = get_2D_plottype(xpoints, ypoints, zpoints)
+            shape = shapes.get(data[2]['name'])
+            plottype = get_2D_plottype(xpoints, ypoints, zpoints, shape)
 
             log.debug(f'Determined plottype: {plottype}')
 
@@ -267,6 +292,11 @@ def plot_dataset(dataset: DataSet,
 
             with _appropriate_kwargs(plottype,
                                      colorbar is not None, **kwargs) as k:
+                if plot_func is plot_on_a_plain_grid:
+                    k = dict(k, shape=shape)
+                if max_points is not None:
+                    k = dict(k, max_points=_pixel_size(ax)
+                             if max_points == 'auto' else max_points)
                 ax, colorbar = plot_func(xpoints, ypoints, zpoints,
                                          ax, colorbar,
                                          **k)
@@ -308,6 +338,7 @@ def plot_by_id(run_id: int,
                                                  Number]] = None,
                complex_plot_type: str = 'real_and_imag',
                complex_plot_phase: str = 'radians',
+               max_points: Optional[Union[int, str]] = None,
                **kwargs) -> AxesTupleList:
     """
     Construct all plots for a given `run_id`. All other arguments are forwarded
@@ -323,6 +354,7 @@ def plot_by_id(run_id: int,
                         cutoff_percentile,
                         complex_plot_type,
                         complex_plot_phase,
+                        max_points,
                         **kwargs)
 
 
@@ -464,9 +496,121 @@ def _set_data_axes_labels(ax: matplotlib.axes.Axes,
         cax.set_label(_make_label_for_data_axis(data, 2))
 
 
+def _pixel_size(ax: matplotlib.axes.Axes) -> Tuple[int, int]:
+    """
+    Return the width and height of the axes in pixels
+    """
+    bbox = ax.get_window_extent()
+    return max(int(bbox.width), 1), max(int(bbox.height), 1)
+
+
+def _decimate_envelope(x: np.ndarray, y: np.ndarray,
+                       max_points: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Decimate 1D data to at most ``max_points`` points by dividing it into
+    buckets of consecutive points and keeping the minimum and the maximum
+    of each bucket, such that the plotted envelope of the data, including
+    any spikes, is preserved. ``max_points`` must be at least 2.
+    """
+    if len(y) <= max_points or y.dtype.kind not in 'biuf':
+        return x, y
+    # every bucket contributes up to two points
+    n_buckets = max_points // 2
+    bucket_size = -(-len(y) // n_buckets)
+    n_buckets = -(-len(y) // bucket_size)
+    padding = n_buckets * bucket_size - len(y)
+
+    nans = np.isnan(y) if y.dtype.kind == 'f' else np.zeros(len(y), bool)
+    for_min = np.append(np.where(nans, np.inf, y), np.full(padding, np.inf))
+    for_max = np.append(np.where(nans, -np.inf, y),
+                        np.full(padding, -np.inf))
+    offsets = np.arange(n_buckets) * bucket_size
+    minima = offsets + for_min.reshape(n_buckets, bucket_size).argmin(axis=1)
+    maxima = offsets + for_max.reshape(n_buckets, bucket_size).argmax(axis=1)
+    keep = np.unique(np.concatenate((minima, maxima)))
+    log.debug(f'Decimated {len(y)} points to {len(keep)} points')
+    return x[keep], y[keep]
+
+
+def _decimate_scatter(x: np.ndarray, y: np.ndarray, z: np.ndarray,
+                      max_points: MaxPoints2D
+                      ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Decimate scattered 2D data by dividing the plane into bins and keeping
+    the first point in each bin
+    """
+    if isinstance(max_points, tuple):
+        x_bins, y_bins = max_points
+    else:
+        x_bins = y_bins = max(int(np.sqrt(max_points)), 1)
+    if len(z) <= x_bins * y_bins or x.dtype.kind not in 'biuf' \
+            or y.dtype.kind not in 'biuf':
+        return x, y, z
+
+    def bin_index(values: np.ndarray, n_bins: int) -> np.ndarray:
+        values = np.nan_to_num(values.astype(float))
+        low, high = values.min(), values.max()
+        if high == low:
+            return np.zeros(len(values), dtype=int)
+        index = ((values - low) / (high - low) * n_bins).astype(int)
+        return np.minimum(index, n_bins - 1)
+
+    bins = bin_index(y, y_bins) * x_bins + bin_index(x, x_bins)
+    keep = np.sort(np.unique(bins, return_index=True)[1])
+    log.debug(f'Decimated {len(z)} points to {len(keep)} points')
+    return x[keep], y[keep], z[keep]
+
+
+def _block_factors(nx: int, ny: int,
+                   max_points: MaxPoints2D) -> Tuple[int, int]:
+    """
+    Return the number of cells of a grid along x and y that are combined
+    into blocks, such that the grid of blocks has at most ``max_points``
+    blocks (or at most ``max_points[0]`` along x and ``max_points[1]``
+    along y). The blocks are made as square (in cells) as possible.
+    """
+    if isinstance(max_points, tuple):
+        return -(-nx // max_points[0]), -(-ny // max_points[1])
+    factor = max(int(np.sqrt(nx * ny / max_points)), 1)
+    x_factor, y_factor = min(factor, nx), min(factor, ny)
+    while -(-nx // x_factor) * -(-ny // y_factor) > max_points:
+        if y_factor >= ny:
+            x_factor = -(-nx // max_points)
+        elif x_factor >= nx:
+            y_factor = -(-ny // max_points)
+        elif x_factor <= y_factor:
+            x_factor += 1
+        else:
+            y_factor += 1
+    return x_factor, y_factor
+
+
+def _reduce_blocks(z: np.ndarray, y_factor: int, x_factor: int,
+                   average: bool = True) -> np.ndarray:
+    """
+    Reduce a 2D grid to the grid of blocks of ``y_factor`` by ``x_factor``
+    cells, by averaging the finite cells of every block or, if ``average``
+    is False, by taking the first cell of every block
+    """
+    if not average:
+        return z[::y_factor, ::x_factor]
+    ny, nx = z.shape
+    n_blocks_y = -(-ny // y_factor)
+    n_blocks_x = -(-nx // x_factor)
+    padded = np.full((n_blocks_y * y_factor, n_blocks_x * x_factor), np.nan)
+    padded[:ny, :nx] = z
+    blocks = padded.reshape(n_blocks_y, y_factor, n_blocks_x, x_factor)
+    valid = np.isfinite(blocks)
+    sums = np.where(valid, blocks, 0).sum(axis=(1, 3))
+    counts = valid.sum(axis=(1, 3))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums / counts
+
+
 def plot_2d_scatterplot(x: np.ndarray, y: np.ndarray, z: np.ndarray,
                         ax: matplotlib.axes.Axes,
                         colorbar: matplotlib.colorbar.Colorbar = None,
+                        max_points: Optional[MaxPoints2D] = None,
                         **kwargs) -> AxesTuple:
     """
     Make a 2D scatterplot of the data. ``**kwargs`` are passed to matplotlib's
@@ -480,10 +624,16 @@ def plot_2d_scatterplot(x: np.ndarray, y: np.ndarray, z: np.ndarray,
         z: The z values
         ax: The axis to plot onto
         colorbar: The colorbar to plot into
+        max_points: if given, the maximum number of points to plot, or the
+            number of bins along x and y. The plane is divided into bins
+            and only the first point in each bin is plotted.
 
     Returns:
         The matplotlib axis handles for plot and colorbar
     """
+    if max_points is not None:
+        x, y, z = _decimate_scatter(x, y, z, max_points)
+
     if 'rasterized' in kwargs.keys():
         rasterized = kwargs.pop('rasterized')
     else:
@@ -523,6 +673,8 @@ def plot_on_a_plain_grid(x: np.ndarray,
                          z: np.ndarray,
                          ax: matplotlib.axes.Axes,
                          colorbar: matplotlib.colorbar.Colorbar = None,
+                         shape: Optional[Tuple[int, ...]] = None,
+                         max_points: Optional[MaxPoints2D] = None,
                          **kwargs
                          ) -> AxesTuple:
     """
@@ -543,6 +695,12 @@ def plot_on_a_plain_grid(x: np.ndarray,
         z: The z values
         ax: The axis to plot onto
         colorbar: a colorbar to reuse the axis for
+        shape: the shape of the sweep as recorded for the run, if any, which
+            avoids inferring the grid from the data
+        max_points: if given, the maximum number of cells of the heatmap, or
+            the maximum number of cells along x and y. Blocks of cells of
+            the grid are averaged (or, for string values, represented by
+            their first cell) to stay within it.
 
     Returns:
         The matplotlib axes handle for plot and colorbar
@@ -566,7 +724,7 @@ def plot_on_a_plain_grid(x: np.ndarray,
         z_strings = np.unique(z)
         z = _strings_as_ints(z)
 
-    xrow, yrow, z_to_plot = reshape_2D_data(x, y, z)
+    xrow, yrow, z_to_plot = reshape_2D_data(x, y, z, shape)
 
     # we use a general edge calculator,
     # in the case of non-equidistantly spaced data
@@ -579,6 +737,16 @@ def plot_on_a_plain_grid(x: np.ndarray,
     y_edges = np.concatenate((np.array([yrow[0] - dys[0]]),
                               yrow[:-1] + dys,
                               np.array([yrow[-1] + dys[-1]])))
+
+    if max_points is not None:
+        x_factor, y_factor = _block_factors(len(xrow), len(yrow), max_points)
+        if x_factor > 1 or y_factor > 1:
+            log.debug(f'Averaging blocks of {x_factor}x{y_factor} cells')
+            z_to_plot = _reduce_blocks(z_to_plot, y_factor, x_factor,
+                                       average=not z_is_stringy)
+            x_edges = np.append(x_edges[:-1:x_factor], x_edges[-1])
+            y_edges = np.append(y_edges[:-1:y_factor], y_edges[-1])
+
     if 'rasterized' in kwargs.keys():
         rasterized = kwargs.pop('rasterized')
     else:
@@ -5,8 +5,9 @@ performing nested atomic transactions on an SQLite database.
 """
 import logging
 import sqlite3
+from collections import OrderedDict
 from contextlib import contextmanager
-from typing import Union, Any
+from typing import Union, Any, Dict, Optional, Set, Tuple
 
 import wrapt
 
@@ -28,9 +29,26 @@ class ConnectionPlus(wrapt.ObjectProxy):
             currently in the middle of an atomic block of transactions, thus
             allowing to nest `atomic` context managers
         path_to_dbfile: Path to the database file of the connection.
+        read_only: whether the database file is opened in read-only mode
+        attached_run_shards: the GUIDs of the runs whose shards are attached
+            to the connection, mapped to their schema names, in the order
+            of their last use (see :mod:`.run_shards`)
+        unsharded_runs: the GUIDs of the runs known not to have a shard
+        run_guids_by_table: the GUIDs of runs by the names of their results
+            tables, as far as they have been looked up
+        pooled_as: the path to the database file, the debug and the
+            read-only flag under which the connection is in the connection
+            pool of :mod:`.database`, None if it is not a pooled connection
     """
     atomic_in_progress: bool = False
     path_to_dbfile = ''
+    read_only: bool = False
+    # the following are replaced per instance, they are declared on the
+    # class such that they are set on the proxy, not on the connection
+    attached_run_shards: 'OrderedDict[str, str]' = OrderedDict()
+    unsharded_runs: Set[str] = set()
+    run_guids_by_table: Dict[str, str] = {}
+    pooled_as: Optional[Tuple[str, bool, bool]] = None
 
     def __init__(self, sqlite3_connection: sqlite3.Connection):
         super(ConnectionPlus, self).__init__(sqlite3_connection)
@@ -40,6 +58,9 @@ class ConnectionPlus(wrapt.ObjectProxy):
                              '`ConnectionPlus` object which is not allowed.')
 
         self.path_to_dbfile = path_to_dbfile(sqlite3_connection)
+        self.attached_run_shards = OrderedDict()
+        self.unsharded_runs = set()
+        self.run_guids_by_table = {}
 
 
 def make_connection_plus_from(conn: Union[sqlite3.Connection, ConnectionPlus]
@@ -4,10 +4,17 @@ initialising it. Note that connecting/initialisation take into account
 database version and possibly perform database upgrades.
 """
 import io
+import logging
+import os
+import re
 import sqlite3
+import struct
 import sys
+import threading
+from collections import OrderedDict
 from os.path import expanduser, normpath
-from typing import Union, Tuple, Optional
+from urllib.request import pathname2url
+from typing import Union, Tuple, Optional, Dict, Sequence
 
 import numpy as np
 from numpy import ndarray
@@ -16,13 +23,35 @@ from qcodes.dataset.sqlite.connection import ConnectionPlus
 from qcodes.dataset.sqlite.db_upgrades import _latest_available_version, \
     get_user_version, perform_db_upgrade
 from qcodes.dataset.sqlite.initial_schema import init_db
+from qcodes.dataset.sqlite.run_cache import invalidate_run_caches
 import qcodes.config
 from qcodes.utils.types import complex_types, complex_type_union
 
 
-# utility function to allow sqlite/numpy type
-def _adapt_array(arr: ndarray) -> sqlite3.Binary:
+log = logging.getLogger(__name__)
+
+
+# Arrays can be stored as BLOBs in a compact binary format: a small header
+# holding the dtype and the shape of the array followed by the raw bytes of
+# the array data in C order. The header starts with a magic string that can
+# not be the beginning of an `.npy` file (which is the format used by
+# earlier versions of QCoDeS), so BLOBs of both formats can be told apart.
+# Earlier versions of QCoDeS can not read BLOBs in the compact format, hence
+# it is only written if selected with ``core.db_array_blob_format``.
+#
+# Header layout (all little endian):
+#   magic (4 bytes) | version (uint8) | len(dtype.str) (uint8) |
+#   ndim (uint8) | dtype.str (ascii) | shape (ndim x int64)
+_ARRAY_BLOB_MAGIC = b'\x00QCA'
+_ARRAY_BLOB_VERSION = 1
+_ARRAY_BLOB_HEADER = struct.Struct('<4sBBB')
+
+
+def _adapt_array_npy(arr: ndarray) -> sqlite3.Binary:
     """
+    Serialize an array in the `.npy` format, which is slower but handles
+    any array, e.g. also arrays of objects
+
     See this:
     https://stackoverflow.com/questions/3425320/sqlite3-programmingerror-you-must-not-use-8-bit-bytestrings-unless-you-use-a-te
     """
@@ -32,16 +61,71 @@ def _adapt_array(arr: ndarray) -> sqlite3.Binary:
     return sqlite3.Binary(out.read())
 
 
-def _convert_array(text: bytes) -> ndarray:
+def _convert_array_npy(text: bytes) -> ndarray:
     out = io.BytesIO(text)
     out.seek(0)
     return np.load(out)
 
 
+def get_DB_array_blob_format() -> str:
+    return str(qcodes.config["core"]["db_array_blob_format"])
+
+
+# utility function to allow sqlite/numpy type
+def _adapt_array(arr: ndarray) -> sqlite3.Binary:
+    """
+    Serialize an array into a BLOB in the format selected in the config,
+    the `.npy` format or the compact binary format
+    """
+    if get_DB_array_blob_format() == 'raw':
+        return _adapt_array_raw(arr)
+    return _adapt_array_npy(arr)
+
+
+def _adapt_array_raw(arr: ndarray) -> sqlite3.Binary:
+    """
+    Serialize an array into the compact binary BLOB format. Arrays that can
+    not be represented by their raw bytes (object and structured dtypes) are
+    serialized in the `.npy` format.
+    """
+    dtype = arr.dtype
+    if dtype.hasobject or dtype.fields is not None or arr.ndim > 255:
+        return _adapt_array_npy(arr)
+    dtype_str = dtype.str.encode('ascii')
+    header = _ARRAY_BLOB_HEADER.pack(_ARRAY_BLOB_MAGIC, _ARRAY_BLOB_VERSION,
+                                     len(dtype_str), arr.ndim)
+    shape = struct.pack(f'<{arr.ndim}q', *arr.shape)
+    return sqlite3.Binary(b''.join((header, dtype_str, shape,
+                                    np.ascontiguousarray(arr).tobytes())))
+
+
+def _convert_array(text: bytes) -> ndarray:
+    """
+    Deserialize an array from a BLOB in either format. BLOBs in the `.npy`
+    format are loaded with `np.load`, those in the compact binary format are
+    copied out of the BLOB in one go.
+    """
+    if text[:4] != _ARRAY_BLOB_MAGIC:
+        return _convert_array_npy(text)
+
+    _, version, dtype_len, ndim = _ARRAY_BLOB_HEADER.unpack_from(text)
+    if version != _ARRAY_BLOB_VERSION:
+        raise ValueError(f'Unknown array BLOB version {version}. The '
+                         f'database was probably written by a newer version '
+                         f'of QCoDeS.')
+    offset = _ARRAY_BLOB_HEADER.size
+    dtype = np.dtype(text[offset:offset + dtype_len].decode('ascii'))
+    offset += dtype_len
+    shape = struct.unpack_from(f'<{ndim}q', text, offset)
+    offset += 8 * ndim
+    # the data is copied, since arrays on the buffer of the BLOB would be
+    # read-only
+    return np.frombuffer(text, dtype=dtype,
+                         offset=offset).reshape(shape).copy()
+
+
 def _convert_complex(text: bytes) -> complex_type_union:
-    out = io.BytesIO(text)
-    out.seek(0)
-    return np.load(out)[0]
+    return _convert_array(text)[0]
 
 
 this_session_default_encoding = sys.getdefaultencoding()
@@ -100,24 +184,30 @@ def _adapt_float(fl: float) -> Union[float, str]:
 
 
 def _adapt_complex(value: complex_type_union) -> sqlite3.Binary:
-    out = io.BytesIO()
-    np.save(out, np.array([value]))
-    out.seek(0)
-    return sqlite3.Binary(out.read())
+    return _adapt_array(np.array([value]))
 
 
 def connect(name: str, debug: bool = False,
-            version: int = -1) -> ConnectionPlus:
+            version: int = -1, read_only: bool = False) -> ConnectionPlus:
     """
     Connect or create  database. If debug the queries will be echoed back.
     This function takes care of registering the numpy/sqlite type
     converters that we need.
 
+    A read-only connection is meant for analysis processes that read the
+    database while a measurement is writing to it. The database file is
+    opened in read-only mode and with the ``query_only`` PRAGMA, so that the
+    connection never takes a write lock, and it is neither initialised nor
+    upgraded. Readers do not block the writer (and vice versa) at all if the
+    writer uses the 'wal' PRAGMA profile.
+
     Args:
         name: name or path to the sqlite file
         debug: whether or not to turn on tracing
         version: which version to create. We count from 0. -1 means 'latest'.
             Should always be left at -1 except when testing.
+        read_only: whether to connect to an existing database file in
+            read-only mode. The database must be in the latest version.
 
     Returns:
         conn: connection object to the database (note, it is
@@ -132,8 +222,14 @@ def connect(name: str, debug: bool = False,
     # for some reasons mypy complains about this
     sqlite3.register_converter("array", _convert_array)
 
-    sqlite3_conn = sqlite3.connect(name, detect_types=sqlite3.PARSE_DECLTYPES)
+    if read_only:
+        sqlite3_conn = sqlite3.connect(read_only_uri(name), uri=True,
+                                       detect_types=sqlite3.PARSE_DECLTYPES)
+    else:
+        sqlite3_conn = sqlite3.connect(name,
+                                       detect_types=sqlite3.PARSE_DECLTYPES)
     conn = ConnectionPlus(sqlite3_conn)
+    conn.read_only = read_only
 
     latest_supported_version = _latest_available_version()
     db_version = get_user_version(conn)
@@ -142,6 +238,13 @@ def connect(name: str, debug: bool = False,
         raise RuntimeError(f"Database {name} is version {db_version} but this "
                            f"version of QCoDeS supports up to "
                            f"version {latest_supported_version}")
+    if read_only and db_version < latest_supported_version:
+        conn.close()
+        raise RuntimeError(f"Database {name} is version {db_version} and "
+                           f"can not be upgraded to version "
+                           f"{latest_supported_version} by a read-only "
+                           f"connection. Please connect to it once without "
+                           f"read_only to upgrade it.")
 
     # sqlite3 options
     conn.row_factory = sqlite3.Row
@@ -165,11 +268,32 @@ def connect(name: str, debug: bool = False,
     if debug:
         conn.set_trace_callback(print)
 
+    if read_only:
+        # the journal mode is a property of the database file, which is up
+        # to the writer
+        pragmas = {pragma: value
+                   for pragma, value in get_DB_pragmas().items()
+                   if pragma != 'journal_mode'}
+        pragmas['query_only'] = 'ON'
+        _set_pragmas(conn, name, pragmas)
+        return conn
+
+    _set_pragmas(conn, name, get_DB_pragmas())
+
     init_db(conn)
     perform_db_upgrade(conn, version=version)
     return conn
 
 
+def read_only_uri(path_to_db: str) -> str:
+    """
+    Return the URI to open the database file at the given path in
+    read-only mode
+    """
+    path = pathname2url(os.path.abspath(expanduser(path_to_db)))
+    return f'file:{path}?mode=ro'
+
+
 def get_db_version_and_newest_available_version(path_to_db: str) -> Tuple[int,
                                                                           int]:
     """
@@ -197,6 +321,294 @@ def get_DB_debug() -> bool:
     return bool(qcodes.config["core"]["db_debug"])
 
 
+# The PRAGMA profiles that can be selected with the db_pragma_profile setting
+# of the config. The PRAGMAs of the selected profile are set for every
+# connection made by `connect`; PRAGMAs that are not set keep SQLite's
+# defaults.
+PRAGMA_PROFILES: Dict[str, Dict[str, Union[str, int]]] = {
+    # rollback journal and synchronous=FULL
+    'default': {},
+    # write-ahead logging: readers, e.g. live plotting, do not block the
+    # writer and vice versa, and with synchronous=NORMAL a commit does not
+    # wait for the data to be synced to disk. A power loss may roll back the
+    # most recent commits, but never corrupts the database
+    'wal': {'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'cache_size': -65536,
+            'mmap_size': 268435456,
+            'temp_store': 'MEMORY'},
+}
+
+_SUPPORTED_PRAGMAS = ('journal_mode', 'synchronous', 'cache_size',
+                      'mmap_size', 'temp_store', 'query_only')
+
+# file systems on which SQLite can not use WAL, because the shared memory
+# index of the WAL can not be shared between the hosts accessing the file
+_NETWORK_FILE_SYSTEMS = ('nfs', 'nfs4', 'cifs', 'smbfs', 'smb3', 'afs',
+                         '9p', 'ncpfs', 'fuse.sshfs', 'davfs')
+
+
+def get_DB_pragmas() -> Dict[str, Union[str, int]]:
+    """
+    Return the PRAGMAs of the profile selected in the config, updated with
+    the PRAGMAs given explicitly in the config
+    """
+    profile = qcodes.config["core"]["db_pragma_profile"]
+    try:
+        pragmas = dict(PRAGMA_PROFILES[profile])
+    except KeyError:
+        raise ValueError(f'Unknown db_pragma_profile {profile!r}, expected '
+                         f'one of {list(PRAGMA_PROFILES)}.')
+    pragmas.update(qcodes.config["core"]["db_pragmas"])
+    return pragmas
+
+
+def _is_on_network_file_system(path: str) -> bool:
+    path = os.path.abspath(path)
+    if sys.platform == 'win32':
+        if path.startswith('\\\\'):
+            return True
+        import ctypes
+        drive_remote = 4
+        drive = os.path.splitdrive(path)[0] + '\\'
+        return ctypes.windll.kernel32.GetDriveTypeW(drive) == drive_remote
+    try:
+        with open('/proc/mounts') as mounts:
+            mount_points = [line.split()[1:3] for line in mounts]
+    except OSError:
+        # e.g. macOS, where network shares are not commonly used for the
+        # database
+        return False
+    best_match, fs_type = '', ''
+    for mount_point, mount_fs_type in mount_points:
+        mount_point = mount_point.replace('\\040', ' ')
+        if (path == mount_point or path.startswith(mount_point.rstrip('/')
+                                                   + '/')) \
+                and len(mount_point) > len(best_match):
+            best_match, fs_type = mount_point, mount_fs_type
+    return fs_type in _NETWORK_FILE_SYSTEMS
+
+
+def is_wal_safe(path_to_db: str) -> bool:
+    """
+    Check whether the write-ahead log journal mode (WAL) can be used safely
+    for the database file at the given path. This is not the case for
+    in-memory databases and for files on network file systems, see
+    https://www.sqlite.org/wal.html
+    """
+    if path_to_db in ('', ':memory:') or path_to_db.startswith('file:'):
+        return False
+    return not _is_on_network_file_system(expanduser(path_to_db))
+
+
+def _set_pragmas(conn: ConnectionPlus, path_to_db: str,
+                 pragmas: Dict[str, Union[str, int]]) -> None:
+    """
+    Set the given PRAGMAs on the connection. WAL journal mode is only set if
+    it is safe for the given path, see `is_wal_safe`.
+    """
+    cursor = conn.cursor()
+    for name, value in pragmas.items():
+        if name not in _SUPPORTED_PRAGMAS:
+            raise ValueError(f'Unsupported PRAGMA {name!r}, expected one of '
+                             f'{_SUPPORTED_PRAGMAS}.')
+        if re.fullmatch(r'-?\w+', str(value)) is None:
+            raise ValueError(f'Invalid value {value!r} for PRAGMA {name}.')
+        if name == 'journal_mode' and str(value).upper() == 'WAL':
+            if not is_wal_safe(path_to_db):
+                log.warning(f'Not using WAL journal mode for the database '
+                            f'{path_to_db}, since this is not safe for '
+                            f'in-memory databases and on network file '
+                            f'systems.')
+                continue
+        cursor.execute(f'PRAGMA {name} = {value}')
+        if name == 'journal_mode':
+            mode = cursor.fetchone()[0]
+            if mode.upper() != str(value).upper():
+                log.warning(f'Could not set the journal mode of the database '
+                            f'{path_to_db} to {value}, it is {mode}.')
+
+
+def get_DB_connection_pool_size() -> int:
+    return int(qcodes.config["core"]["db_connection_pool_size"])
+
+
+# path to the database file, thread identifier, debug and read-only flags
+_PoolKey = Tuple[str, int, bool, bool]
+
+
+class _ConnectionPool:
+    """
+    A pool of open connections to database files, such that loading many
+    runs or experiments does not require to connect to (and hence to check
+    the version of) the same database file over and over again.
+
+    Connections are keyed by the path to the database file, the debug and
+    read-only flags and the thread that requested them, since sqlite3
+    connections can only be used in the thread that created them. If the
+    pool grows beyond its maximum size, the least recently requested
+    connections are removed from the pool and closed, unless they belong to
+    another thread or are in the middle of a transaction. `DataSet` and
+    `Experiment` objects that still hold a closed pooled connection get a
+    new one from the pool on their next access to the database, see
+    `reconnect_if_closed`.
+    """
+
+    def __init__(self) -> None:
+        self._connections: 'OrderedDict[_PoolKey, ConnectionPlus]' = \
+            OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path_to_db: str, debug: bool, read_only: bool,
+            max_size: int) -> ConnectionPlus:
+        key = (normpath(expanduser(path_to_db)), threading.get_ident(), debug,
+               read_only)
+        with self._lock:
+            conn = self._connections.get(key)
+            if conn is not None and _is_open(conn):
+                self._connections.move_to_end(key)
+                return conn
+
+        conn = connect(path_to_db, debug, read_only=read_only)
+        conn.pooled_as = (path_to_db, debug, read_only)
+
+        with self._lock:
+            self._connections[key] = conn
+            removed = []
+            while len(self._connections) > max_size:
+                removed.append(self._connections.popitem(last=False))
+        _close_removed(removed)
+        return conn
+
+    def contains(self, conn: ConnectionPlus) -> bool:
+        with self._lock:
+            return any(conn is pooled
+                       for pooled in self._connections.values())
+
+    def invalidate(self, path_to_db: Optional[str] = None) -> None:
+        with self._lock:
+            if path_to_db is None:
+                keys = list(self._connections)
+            else:
+                path = normpath(expanduser(path_to_db))
+                keys = [key for key in self._connections if key[0] == path]
+            removed = [(key, self._connections.pop(key)) for key in keys]
+        _close_removed(removed)
+
+    def close_all(self) -> None:
+        this_thread = threading.get_ident()
+        with self._lock:
+            for (_, thread, _, _), conn in self._connections.items():
+                # connections of other threads can not be closed from here,
+                # they are closed once they are garbage collected
+                if thread == this_thread:
+                    conn.close()
+            self._connections.clear()
+
+
+def _close_removed(removed: Sequence[Tuple[_PoolKey, ConnectionPlus]]
+                   ) -> None:
+    """
+    Close the connections removed from the pool, except those of other
+    threads, which can not be closed from here and are closed once they are
+    garbage collected, and those in the middle of a transaction
+    """
+    this_thread = threading.get_ident()
+    for (_, thread, _, _), conn in removed:
+        if thread == this_thread and not conn.atomic_in_progress \
+                and not conn.in_transaction:
+            conn.close()
+
+
+def _is_open(conn: ConnectionPlus) -> bool:
+    try:
+        conn.total_changes
+    except sqlite3.ProgrammingError:
+        return False
+    return True
+
+
+_connection_pool = _ConnectionPool()
+
+
+def get_DB_read_only() -> bool:
+    return bool(qcodes.config["core"]["db_read_only"])
+
+
+def get_pooled_connection(path_to_db: Optional[str] = None,
+                          read_only: Optional[bool] = None
+                          ) -> ConnectionPlus:
+    """
+    Get a connection to a database file from the connection pool of this
+    process, or make a new one and add it to the pool. A pooled connection
+    is shared by all callers in the same thread. If it is closed, the
+    `DataSet` and `Experiment` objects sharing it get a new connection from
+    the pool on their next access to the database.
+
+    The maximum number of connections in the pool is set by
+    ``qcodes.config.core.db_connection_pool_size``. If it is 0, a new
+    connection is returned on every call, exactly as by `connect`.
+
+    The pooled connections are used by the functions that load runs and
+    experiments, e.g. `load_by_id`, `experiments` and the plotting
+    functions. Set ``qcodes.config.core.db_read_only`` in analysis processes
+    to make them read-only connections, see `connect`.
+
+    Args:
+        path_to_db: The path to the database file. If None, the location
+            from the config is used.
+        read_only: Whether to get a read-only connection. If None, the
+            setting from the config is used.
+
+    Returns:
+        A `ConnectionPlus` object
+    """
+    path_to_db = get_DB_location() if path_to_db is None else path_to_db
+    read_only = get_DB_read_only() if read_only is None else read_only
+    max_size = get_DB_connection_pool_size()
+    if max_size < 1 or path_to_db == ':memory:':
+        return connect(path_to_db, get_DB_debug(), read_only=read_only)
+    return _connection_pool.get(path_to_db, get_DB_debug(), read_only,
+                                max_size)
+
+
+def reconnect_if_closed(conn: ConnectionPlus) -> ConnectionPlus:
+    """
+    Return the given connection, unless it is a pooled connection that has
+    been closed (or can not be used in the current thread), in which case a
+    pooled connection to the same database file is returned instead
+    """
+    if conn.pooled_as is None or _is_open(conn):
+        return conn
+    path_to_db, debug, read_only = conn.pooled_as
+    return _connection_pool.get(path_to_db, debug, read_only,
+                                max(get_DB_connection_pool_size(), 1))
+
+
+def invalidate_pooled_connections(path_to_db: Optional[str] = None) -> None:
+    """
+    Remove the connections to a database file from the connection pool, such
+    that the next request for a connection to that file makes a new one.
+    This is needed if the file is replaced, e.g. by deleting it and creating
+    a new database at the same path. The removed connections of the current
+    thread are closed.
+
+    Args:
+        path_to_db: The path to the database file. If None, the connections
+            to all database files are removed.
+    """
+    _connection_pool.invalidate(path_to_db)
+
+
+def close_pooled_connections() -> None:
+    """
+    Close all pooled connections of the current thread and empty the
+    connection pool. `DataSet` and `Experiment` objects that were loaded via
+    a pooled connection get a new one on their next access to the database.
+    """
+    _connection_pool.close_all()
+
+
 def initialise_database() -> None:
     """
     Initialise a database in the location specified by the config object
@@ -206,6 +618,10 @@ def initialise_database() -> None:
     Args:
         config: An instance of the config object
     """
+    # the database file may have been replaced, so pooled connections to
+    # it and cached runs from it may be stale
+    invalidate_pooled_connections(get_DB_location())
+    invalidate_run_caches(get_DB_location())
     conn = connect(get_DB_location(), get_DB_debug())
     # init is actually idempotent so it's safe to always call!
     init_db(conn)
@@ -4,7 +4,8 @@ QCoDeS database. It also provides concreted upgrade functions between all
 the database versions which exist so far.
 
 The module contains :mod:`.version` module for working with the version of
-QCoDeS databases.
+QCoDeS databases, and :mod:`.batching` module for performing the upgrade
+steps that go through all runs in resumable batches.
 
 If needed, this module may contain modules with upgrade-specific code. The
 intention is to be able to decouple the code of the upgrade functions from
@@ -14,16 +15,19 @@ principle, the upgrade functions should not have dependecies from
 """
 import logging
 from functools import wraps
-from typing import Dict, Callable
+from inspect import signature
+from typing import Dict, Callable, Optional
 
 import numpy as np
 
 from qcodes.dataset.guids import generate_guid
 from qcodes.dataset.sqlite.connection import ConnectionPlus, \
     atomic_transaction, atomic, transaction
+from qcodes.dataset.sqlite.db_upgrades.batching import UpgradeOptions, \
+    UpgradeProgress, clear_checkpoints, upgrade_runs_in_batches
 from qcodes.dataset.sqlite.db_upgrades.version import get_user_version, \
     set_user_version
-from qcodes.dataset.sqlite.query_helpers import many_many, one, insert_column
+from qcodes.dataset.sqlite.query_helpers import many_many, insert_column
 
 
 log = logging.getLogger(__name__)
@@ -49,13 +53,17 @@ def upgrader(func: Callable[[ConnectionPlus], None]):
     Decorator for database version upgrade functions. An upgrade function
     must have the name `perform_db_upgrade_N_to_M` where N = M-1. For
     simplicity, an upgrade function must take a single argument of type
-    `ConnectionPlus`. The upgrade function must either perform the upgrade
+    `ConnectionPlus`, and optionally an `UpgradeOptions` argument named
+    ``options``. The upgrade function must either perform the upgrade
     and return (no return values allowed) or fail to perform the upgrade,
     in which case it must raise a RuntimeError. A failed upgrade must be
-    completely rolled back before the RuntimeError is raises.
+    completely rolled back before the RuntimeError is raises, except for
+    the batches of an upgrade that goes through the runs with
+    `upgrade_runs_in_batches`, which are kept and resumed from.
 
     The decorator takes care of logging about the upgrade and managing the
-    database versioning.
+    database versioning. The decorated function takes the connection and,
+    optionally, the options of the upgrade.
     """
     name_comps = func.__name__.split('_')
     if not len(name_comps) == 6:
@@ -74,8 +82,11 @@ def upgrader(func: Callable[[ConnectionPlus], None]):
                          ' Can only upgrade from version N'
                          ' to version N+1')
 
+    takes_options = 'options' in signature(func).parameters
+
     @wraps(func)
-    def do_upgrade(conn: ConnectionPlus) -> None:
+    def do_upgrade(conn: ConnectionPlus,
+                   options: Optional[UpgradeOptions] = None) -> None:
 
         log.info(f'Starting database upgrade version {from_version} '
                  f'to {to_version}')
@@ -87,9 +98,14 @@ def upgrader(func: Callable[[ConnectionPlus], None]):
             return
 
         # This function either raises or returns
-        func(conn)
-
-        set_user_version(conn, to_version)
+        if takes_options:
+            func(conn, options=options or UpgradeOptions())
+        else:
+            func(conn)
+
+        with atomic(conn) as atomic_conn:
+            clear_checkpoints(atomic_conn)
+            set_user_version(atomic_conn, to_version)
         log.info(f'Succesfully performed upgrade {from_version} '
                  f'-> {to_version}')
 
@@ -98,32 +114,52 @@ def upgrader(func: Callable[[ConnectionPlus], None]):
     return do_upgrade
 
 
-def perform_db_upgrade(conn: ConnectionPlus, version: int = -1) -> None:
+def perform_db_upgrade(conn: ConnectionPlus, version: int = -1,
+                       batch_size: int = 1000, n_workers: int = 1,
+                       progress: Optional[UpgradeProgress] = None) -> None:
     """
     This is intended to perform all upgrades as needed to bring the
     db from version 0 to the most current version (or the version specified).
     All the perform_db_upgrade_X_to_Y functions must raise if they cannot
     upgrade and be a NOOP if the current version is higher than their target.
 
+    The upgrade steps that go through all runs do so in batches, each of
+    which is committed with a checkpoint. If such a step is interrupted, it
+    is resumed from the last checkpoint the next time the database is
+    upgraded, e.g. by connecting to it. To upgrade a large database with
+    other options than the defaults, connect to it without upgrading and
+    pass the connection, e.g.
+    >> perform_db_upgrade(connect(path, version=0), n_workers=4)
+
     Args:
         conn: object for connection to the database
         version: Which version to upgrade to. We count from 0. -1 means
           'newest version'
+        batch_size: The number of consecutive run_ids upgraded and
+          committed at a time
+        n_workers: The number of worker processes that prepare batches in
+          parallel, for the steps that only read the run descriptions to do
+          so
+        progress: A callback for the progress of the steps, see
+          `UpgradeProgress`
     """
     version = _latest_available_version() if version == -1 else version
+    options = UpgradeOptions(batch_size=batch_size, n_workers=n_workers,
+                             progress=progress)
 
     current_version = get_user_version(conn)
     if current_version < version:
         log.info("Commencing database upgrade")
         for target_version in sorted(_UPGRADE_ACTIONS)[:version]:
-            _UPGRADE_ACTIONS[target_version](conn)
+            _UPGRADE_ACTIONS[target_version](conn, options)
 
 
 # DATABASE UPGRADE FUNCTIONS
 
 
 @upgrader
-def perform_db_upgrade_0_to_1(conn: ConnectionPlus) -> None:
+def perform_db_upgrade_0_to_1(conn: ConnectionPlus,
+                              options: UpgradeOptions) -> None:
     """
     Perform the upgrade from version 0 to version 1
 
@@ -135,34 +171,33 @@ def perform_db_upgrade_0_to_1(conn: ConnectionPlus) -> None:
     n_run_tables = len(cur.fetchall())
 
     if n_run_tables == 1:
-        with atomic(conn) as conn:
-            sql = "ALTER TABLE runs ADD COLUMN guid TEXT"
-            transaction(conn, sql)
-            # now assign GUIDs to existing runs
-            cur = transaction(conn, 'SELECT run_id FROM runs')
-            run_ids = [r[0] for r in many_many(cur, 'run_id')]
-
-            for run_id in run_ids:
-                query = f"""
-                        SELECT run_timestamp
-                        FROM runs
-                        WHERE run_id == {run_id}
-                        """
-                cur = transaction(conn, query)
-                timestamp = one(cur, 'run_timestamp')
-                timeint = int(np.round(timestamp*1000))
-                sql = f"""
-                        UPDATE runs
-                        SET guid = ?
-                        where run_id == {run_id}
-                        """
-                sampleint = 3736062718  # 'deafcafe'
-                cur.execute(sql, (generate_guid(timeint=timeint,
-                                                sampleint=sampleint),))
+        insert_column(conn, 'runs', 'guid', 'TEXT')
+        upgrade_runs_in_batches(conn, 1, "Upgrading database, version 0 -> 1",
+                                _0to1_upgrade_batch, options)
     else:
         raise RuntimeError(f"found {n_run_tables} runs tables expected 1")
 
 
+def _0to1_upgrade_batch(conn: ConnectionPlus, first: int, last: int,
+                        _: None) -> None:
+    """
+    Assign GUIDs to the runs in the given range of run_ids
+    """
+    query = """
+            SELECT run_id, run_timestamp
+            FROM runs
+            WHERE run_id BETWEEN ? AND ?
+            """
+    cur = transaction(conn, query, first, last)
+    sampleint = 3736062718  # 'deafcafe'
+    guids = [(generate_guid(timeint=int(np.round(timestamp*1000)),
+                            sampleint=sampleint), run_id)
+             for run_id, timestamp in many_many(cur, 'run_id',
+                                                'run_timestamp')]
+    conn.cursor().executemany("UPDATE runs SET guid = ? WHERE run_id == ?",
+                              guids)
+
+
 @upgrader
 def perform_db_upgrade_1_to_2(conn: ConnectionPlus) -> None:
     """
@@ -194,7 +229,8 @@ def perform_db_upgrade_1_to_2(conn: ConnectionPlus) -> None:
 
 
 @upgrader
-def perform_db_upgrade_2_to_3(conn: ConnectionPlus) -> None:
+def perform_db_upgrade_2_to_3(conn: ConnectionPlus,
+                              options: UpgradeOptions) -> None:
     """
     Perform the upgrade from version 2 to version 3
 
@@ -204,11 +240,12 @@ def perform_db_upgrade_2_to_3(conn: ConnectionPlus) -> None:
     object
     """
     from qcodes.dataset.sqlite.db_upgrades.upgrade_2_to_3 import upgrade_2_to_3
-    upgrade_2_to_3(conn)
+    upgrade_2_to_3(conn, options)
 
 
 @upgrader
-def perform_db_upgrade_3_to_4(conn: ConnectionPlus) -> None:
+def perform_db_upgrade_3_to_4(conn: ConnectionPlus,
+                              options: UpgradeOptions) -> None:
     """
     Perform the upgrade from version 3 to version 4. This really
     repeats the version 3 upgrade as it originally had two bugs in
@@ -219,7 +256,7 @@ def perform_db_upgrade_3_to_4(conn: ConnectionPlus) -> None:
     other parameters. Both have since been fixed so rerun the upgrade.
     """
     from qcodes.dataset.sqlite.db_upgrades.upgrade_3_to_4 import upgrade_3_to_4
-    upgrade_3_to_4(conn)
+    upgrade_3_to_4(conn, options)
 
 
 @upgrader
@@ -237,7 +274,8 @@ def perform_db_upgrade_4_to_5(conn: ConnectionPlus) -> None:
 
 
 @upgrader
-def perform_db_upgrade_5_to_6(conn: ConnectionPlus) -> None:
+def perform_db_upgrade_5_to_6(conn: ConnectionPlus,
+                              options: UpgradeOptions) -> None:
     """
     Perform the upgrade from version 5 to version 6.
 
@@ -246,4 +284,66 @@ def perform_db_upgrade_5_to_6(conn: ConnectionPlus) -> None:
     not be tracked as schema upgrades.
     """
     from qcodes.dataset.sqlite.db_upgrades.upgrade_5_to_6 import upgrade_5_to_6
-    upgrade_5_to_6(conn)
+    upgrade_5_to_6(conn, options)
+
+
+@upgrader
+def perform_db_upgrade_6_to_7(conn: ConnectionPlus) -> None:
+    """
+    Perform the upgrade from version 6 to version 7
+
+    Add indices for the lookups of runs by experiment and counter and by
+    result table name, and of layouts and dependencies by run and parameter
+    and by dependent parameter, respectively. Runs are already indexed by
+    GUID since version 2.
+    """
+
+    sql = "SELECT name FROM sqlite_master WHERE type='table' AND name='runs'"
+    cur = atomic_transaction(conn, sql)
+    n_run_tables = len(cur.fetchall())
+
+    if n_run_tables == 1:
+        _IX_runs_exp_id_result_counter = """
+                                         CREATE INDEX
+                                         IF NOT EXISTS
+                                         IX_runs_exp_id_result_counter
+                                         ON runs (exp_id, result_counter)
+                                         """
+        _IX_runs_result_table_name = """
+                                     CREATE INDEX
+                                     IF NOT EXISTS IX_runs_result_table_name
+                                     ON runs (result_table_name)
+                                     """
+        _IX_layouts_run_id_parameter = """
+                                       CREATE INDEX
+                                       IF NOT EXISTS
+                                       IX_layouts_run_id_parameter
+                                       ON layouts (run_id, parameter)
+                                       """
+        _IX_dependencies_dependent = """
+                                     CREATE INDEX
+                                     IF NOT EXISTS IX_dependencies_dependent
+                                     ON dependencies (dependent)
+                                     """
+        with atomic(conn) as conn:
+            transaction(conn, _IX_runs_exp_id_result_counter)
+            transaction(conn, _IX_runs_result_table_name)
+            transaction(conn, _IX_layouts_run_id_parameter)
+            transaction(conn, _IX_dependencies_dependent)
+    else:
+        raise RuntimeError(f"found {n_run_tables} runs tables expected 1")
+
+
+@upgrader
+def perform_db_upgrade_7_to_8(conn: ConnectionPlus,
+                              options: UpgradeOptions) -> None:
+    """
+    Perform the upgrade from version 7 to version 8.
+
+    Move the metadata of runs from a column per tag in the runs table to the
+    run_metadata table, indexed by tag and value, such that the metadata of
+    a run is read with a single query and runs are searched by metadata
+    without a table scan.
+    """
+    from qcodes.dataset.sqlite.db_upgrades.upgrade_7_to_8 import upgrade_7_to_8
+    upgrade_7_to_8(conn, options)
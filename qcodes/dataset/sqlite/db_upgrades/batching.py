@@ -0,0 +1,208 @@
+"""
+This module provides the infrastructure for the steps of database upgrades
+that go through all runs. Such a step is performed in batches of runs with
+consecutive run_ids, each of which is committed together with a checkpoint,
+such that an upgrade that is interrupted (e.g. by a crash) is resumed after
+the last committed batch the next time it is performed, instead of being
+started over. The progress of the steps is shown with tqdm and can be
+reported to a callback.
+
+The part of the upgrade of a batch that only reads from the database may be
+performed in worker processes, for disjoint ranges of runs, while the
+upgraded runs are written by the main process.
+"""
+import logging
+import sqlite3
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import (Any, Callable, Deque, Iterator, NamedTuple, Optional,
+                    Sequence, Tuple)
+
+from tqdm import tqdm
+
+from qcodes.dataset.sqlite.connection import ConnectionPlus, atomic, \
+    atomic_transaction, transaction
+from qcodes.dataset.sqlite.query_helpers import one
+
+
+log = logging.getLogger(__name__)
+
+# The callback for the progress of upgrade steps. It is called after every
+# committed batch with the description of the step, the run_id up to which
+# the runs have been upgraded and the largest run_id.
+UpgradeProgress = Callable[[str, int, int], None]
+
+# the table of the checkpoints of upgrade steps in progress, which only
+# exists while an upgrade step is in progress
+CHECKPOINTS_TABLE = 'db_upgrade_checkpoints'
+
+# the number of batches that are prepared ahead per worker process
+_BATCHES_AHEAD_PER_WORKER = 2
+
+
+class UpgradeOptions(NamedTuple):
+    """
+    The options of the upgrade steps that go through all runs
+
+    Args:
+        batch_size: The number of consecutive run_ids upgraded and
+            committed at a time
+        n_workers: The number of worker processes that prepare the upgrade
+            of batches in parallel, for the steps that support it. With 1,
+            everything is done in the calling process.
+        progress: A callback for the progress, see `UpgradeProgress`
+    """
+    batch_size: int = 1000
+    n_workers: int = 1
+    progress: Optional[UpgradeProgress] = None
+
+
+def get_checkpoint(conn: ConnectionPlus, version: int) -> int:
+    """
+    Return the run_id up to which the runs have been upgraded by the upgrade
+    step to the given version, 0 if the step has not been started
+    """
+    sql = "SELECT name FROM sqlite_master WHERE type='table' AND name=?"
+    if atomic_transaction(conn, sql, CHECKPOINTS_TABLE).fetchone() is None:
+        return 0
+    sql = f"SELECT last_run_id FROM {CHECKPOINTS_TABLE} WHERE version = ?"
+    row = atomic_transaction(conn, sql, version).fetchone()
+    return 0 if row is None else row[0]
+
+
+def _set_checkpoint(conn: ConnectionPlus, version: int,
+                    last_run_id: int) -> None:
+    transaction(conn, f"""
+                CREATE TABLE IF NOT EXISTS {CHECKPOINTS_TABLE} (
+                    version INTEGER PRIMARY KEY,
+                    last_run_id INTEGER NOT NULL
+                )
+                """)
+    transaction(conn, f"""
+                INSERT OR REPLACE INTO {CHECKPOINTS_TABLE}
+                (version, last_run_id) VALUES (?, ?)
+                """, version, last_run_id)
+
+
+def clear_checkpoints(conn: ConnectionPlus) -> None:
+    """
+    Remove the checkpoints of a completed upgrade step
+    """
+    transaction(conn, f"DROP TABLE IF EXISTS {CHECKPOINTS_TABLE}")
+
+
+def upgrade_runs_in_batches(
+        conn: ConnectionPlus,
+        version: int,
+        description: str,
+        upgrade_batch: Callable[[ConnectionPlus, int, int, Any], None],
+        options: UpgradeOptions,
+        prepare_batch: Optional[Callable[[ConnectionPlus, int, int], Any]]
+        = None) -> None:
+    """
+    Perform an upgrade step that goes through all runs in batches of
+    consecutive run_ids. Every batch is upgraded in a transaction of its
+    own, which also records the batch in a checkpoint. The step starts after
+    the checkpoint of an earlier, interrupted attempt, if any.
+
+    Args:
+        conn: The connection to the database
+        version: The version the step upgrades to
+        description: The description of the step for its progress
+        upgrade_batch: The function that upgrades the runs of a batch,
+            called with the connection, the first and the last run_id of the
+            batch and what ``prepare_batch`` returned for the batch (None if
+            not given)
+        options: The options of the upgrade
+        prepare_batch: The function that prepares the upgrade of the runs of
+            a batch, only reading from the database, called with the
+            connection and the first and the last run_id of the batch. With
+            more than one worker, it is called in the worker processes with
+            read-only connections of their own, hence it must be a function
+            at module level and return a picklable value.
+    """
+    cursor = atomic_transaction(conn, 'SELECT MAX(run_id) FROM runs')
+    max_run_id = one(cursor, 0) or 0
+    start = get_checkpoint(conn, version)
+    if start > 0:
+        log.info(f'Resuming the upgrade to version {version} after run '
+                 f'{start}')
+
+    batches = [(first, min(first + options.batch_size - 1, max_run_id))
+               for first in range(start + 1, max_run_id + 1,
+                                  options.batch_size)]
+    prepared = _prepare_batches(conn, batches, prepare_batch,
+                                options.n_workers)
+
+    # no progress bar for databases without runs to upgrade, like new ones
+    pbar = tqdm(total=max_run_id, initial=start, unit='run',
+                disable=not batches)
+    pbar.set_description(description)
+    try:
+        for (first, last), batch_data in zip(batches, prepared):
+            with atomic(conn) as atomic_conn:
+                upgrade_batch(atomic_conn, first, last, batch_data)
+                _set_checkpoint(atomic_conn, version, last)
+            log.debug(f'Upgrade to version {version} in transition, runs up '
+                      f'to {last}: OK')
+            pbar.update(last - first + 1)
+            if options.progress is not None:
+                options.progress(description, last, max_run_id)
+    finally:
+        # stops the worker processes, if any
+        prepared.close()
+        pbar.close()
+
+
+def _prepare_batches(
+        conn: ConnectionPlus,
+        batches: Sequence[Tuple[int, int]],
+        prepare_batch: Optional[Callable[[ConnectionPlus, int, int], Any]],
+        n_workers: int) -> Iterator[Any]:
+    """
+    Yield what ``prepare_batch`` returns for every batch, in order. With
+    more than one worker, the batches are prepared in worker processes,
+    a few batches ahead of the batch that is yielded.
+    """
+    if prepare_batch is None:
+        for _ in batches:
+            yield None
+        return
+
+    path = conn.path_to_dbfile
+    if n_workers <= 1 or path == '':
+        # in-memory databases can not be read by other processes
+        for first, last in batches:
+            yield prepare_batch(conn, first, last)
+        return
+
+    remaining = iter(batches)
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        pending: Deque[Future] = deque(
+            executor.submit(_prepare_batch_in_worker, path, prepare_batch,
+                            first, last)
+            for first, last in islice(remaining,
+                                      _BATCHES_AHEAD_PER_WORKER * n_workers))
+        while pending:
+            batch_data = pending.popleft().result()
+            for first, last in islice(remaining, 1):
+                pending.append(executor.submit(_prepare_batch_in_worker, path,
+                                               prepare_batch, first, last))
+            yield batch_data
+
+
+def _prepare_batch_in_worker(
+        path: str,
+        prepare_batch: Callable[[ConnectionPlus, int, int], Any],
+        first: int, last: int) -> Any:
+    # the database is in the middle of an upgrade, hence it is connected to
+    # without any of the checks and upgrades of `connect`
+    from qcodes.dataset.sqlite.database import read_only_uri
+    sqlite3_conn = sqlite3.connect(read_only_uri(path), uri=True)
+    conn = ConnectionPlus(sqlite3_conn)
+    conn.row_factory = sqlite3.Row
+    try:
+        return prepare_batch(conn, first, last)
+    finally:
+        conn.close()
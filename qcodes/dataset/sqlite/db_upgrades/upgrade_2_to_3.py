@@ -3,11 +3,10 @@ import logging
 from collections import defaultdict
 from typing import Dict, DefaultDict, List, Sequence, Tuple
 
-from tqdm import tqdm
-
-from qcodes.dataset.sqlite.connection import ConnectionPlus, transaction, \
-    atomic, atomic_transaction
-from qcodes.dataset.sqlite.query_helpers import one
+from qcodes.dataset.sqlite.connection import ConnectionPlus, transaction
+from qcodes.dataset.sqlite.db_upgrades.batching import UpgradeOptions, \
+    upgrade_runs_in_batches
+from qcodes.dataset.sqlite.query_helpers import insert_column
 from qcodes.dataset.descriptions.param_spec import ParamSpec
 from qcodes.dataset.descriptions.versioning.v0 import InterDependencies
 
@@ -183,38 +182,23 @@ def _2to3_get_paramspecs(conn: ConnectionPlus,
     return paramspecs
 
 
-def upgrade_2_to_3(conn: ConnectionPlus) -> None:
+def _2to3_upgrade_runs(conn: ConnectionPlus, version: int,
+                       description: str, options: UpgradeOptions) -> None:
     """
-    Perform the upgrade from version 2 to version 3
-
-    Insert a new column, run_description, to the runs table and fill it out
-    for exisitng runs with information retrieved from the layouts and
-    dependencies tables represented as the json output of a RunDescriber
-    object
+    Fill out the run_description column of all runs with information
+    retrieved from the layouts and dependencies tables represented as the
+    json output of a RunDescriber object, in batches of runs
     """
+    result_tables = _2to3_get_result_tables(conn)
+    layout_ids_all = _2to3_get_layout_ids(conn)
+    indeps_all = _2to3_get_indeps(conn)
+    deps_all = _2to3_get_deps(conn)
+    layouts = _2to3_get_layouts(conn)
+    dependencies = _2to3_get_dependencies(conn)
 
-    no_of_runs_query = "SELECT max(run_id) FROM runs"
-    no_of_runs = one(atomic_transaction(conn, no_of_runs_query), 'max(run_id)')
-    no_of_runs = no_of_runs or 0
-
-    # If one run fails, we want the whole upgrade to roll back, hence the
-    # entire upgrade is one atomic transaction
-
-    with atomic(conn) as conn:
-        sql = "ALTER TABLE runs ADD COLUMN run_description TEXT"
-        transaction(conn, sql)
-
-        result_tables = _2to3_get_result_tables(conn)
-        layout_ids_all = _2to3_get_layout_ids(conn)
-        indeps_all = _2to3_get_indeps(conn)
-        deps_all = _2to3_get_deps(conn)
-        layouts = _2to3_get_layouts(conn)
-        dependencies = _2to3_get_dependencies(conn)
-
-        pbar = tqdm(range(1, no_of_runs+1))
-        pbar.set_description("Upgrading database")
-
-        for run_id in pbar:
+    def upgrade_batch(conn: ConnectionPlus, first: int, last: int,
+                      _: None) -> None:
+        for run_id in range(first, last + 1):
 
             if run_id in layout_ids_all:
 
@@ -254,3 +238,21 @@ def upgrade_2_to_3(conn: ConnectionPlus) -> None:
             cur = conn.cursor()
             cur.execute(sql, (json_str, run_id))
             log.debug(f"Upgrade in transition, run number {run_id}: OK")
+
+    upgrade_runs_in_batches(conn, version, description, upgrade_batch,
+                            options)
+
+
+def upgrade_2_to_3(conn: ConnectionPlus, options: UpgradeOptions) -> None:
+    """
+    Perform the upgrade from version 2 to version 3
+
+    Insert a new column, run_description, to the runs table and fill it out
+    for exisitng runs with information retrieved from the layouts and
+    dependencies tables represented as the json output of a RunDescriber
+    object. The runs are upgraded in batches, see
+    :func:`.upgrade_runs_in_batches`.
+    """
+    insert_column(conn, 'runs', 'run_description', 'TEXT')
+    _2to3_upgrade_runs(conn, 3, "Upgrading database, version 2 -> 3",
+                       options)
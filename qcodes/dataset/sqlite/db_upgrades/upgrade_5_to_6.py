@@ -1,44 +1,61 @@
 import json
-
-from tqdm import tqdm
+from typing import List, Tuple
 
 from qcodes.dataset.descriptions.versioning.v0 import InterDependencies
-from qcodes.dataset.sqlite.connection import ConnectionPlus, atomic, \
+from qcodes.dataset.sqlite.connection import ConnectionPlus, \
     atomic_transaction
-from qcodes.dataset.sqlite.queries import get_run_description, \
-    update_run_description
-from qcodes.dataset.sqlite.query_helpers import one
+from qcodes.dataset.sqlite.db_upgrades.batching import UpgradeOptions, \
+    upgrade_runs_in_batches
 
 
-def upgrade_5_to_6(conn: ConnectionPlus) -> None:
+def _5to6_prepare_batch(conn: ConnectionPlus, first: int,
+                        last: int) -> List[Tuple[str, int]]:
+    """
+    Return the upgraded run descriptions of the runs in the given range of
+    run_ids together with their run_ids. This only reads from the database,
+    hence it may run in a worker process.
+    """
+    sql = """
+          SELECT run_id, run_description
+          FROM runs
+          WHERE run_id BETWEEN ? AND ?
+          """
+    rows = atomic_transaction(conn, sql, first, last).fetchall()
+
+    empty_idps_ser = InterDependencies()._to_dict()
+
+    new_descriptions = []
+    for run_id, json_str in rows:
+        if json_str is None:
+            new_json = json.dumps({'version': 0,
+                                   'interdependencies': empty_idps_ser})
+        else:
+            ser = json.loads(json_str)
+            new_ser = {'version': 0}  # let 'version' be the first entry
+            new_ser['interdependencies'] = ser['interdependencies']
+            new_json = json.dumps(new_ser)
+        new_descriptions.append((new_json, run_id))
+    return new_descriptions
+
+
+def _5to6_upgrade_batch(conn: ConnectionPlus, first: int, last: int,
+                        new_descriptions: List[Tuple[str, int]]) -> None:
+    conn.cursor().executemany('UPDATE runs SET run_description = ? '
+                              'WHERE run_id = ?', new_descriptions)
+
+
+def upgrade_5_to_6(conn: ConnectionPlus, options: UpgradeOptions) -> None:
     """
     Perform the upgrade from version 5 to version 6.
 
     The upgrade ensures that the runs_description has a top-level entry
     called 'version'. Note that version changes of the runs_description will
     not be tracked as schema upgrades.
+
+    The runs are upgraded in batches, see :func:`.upgrade_runs_in_batches`.
+    The new run descriptions only depend on the old ones, hence they are
+    prepared in worker processes if the options ask for more than one.
     """
-    no_of_runs_query = "SELECT max(run_id) FROM runs"
-    no_of_runs = one(atomic_transaction(conn, no_of_runs_query), 'max(run_id)')
-    no_of_runs = no_of_runs or 0
-
-    # If one run fails, we want the whole upgrade to roll back, hence the
-    # entire upgrade is one atomic transaction
-
-    with atomic(conn) as conn:
-        pbar = tqdm(range(1, no_of_runs+1))
-        pbar.set_description("Upgrading database, version 5 -> 6")
-
-        empty_idps_ser = InterDependencies()._to_dict()
-
-        for run_id in pbar:
-            json_str = get_run_description(conn, run_id)
-            if json_str is None:
-                new_json = json.dumps({'version': 0,
-                                       'interdependencies': empty_idps_ser})
-            else:
-                ser = json.loads(json_str)
-                new_ser = {'version': 0}  # let 'version' be the first entry
-                new_ser['interdependencies'] = ser['interdependencies']
-                new_json = json.dumps(new_ser)
-            update_run_description(conn, run_id, new_json)
+    upgrade_runs_in_batches(conn, 6, "Upgrading database, version 5 -> 6",
+                            _5to6_upgrade_batch, options,
+                            prepare_batch=_5to6_prepare_batch)
@@ -0,0 +1,58 @@
+from qcodes.dataset.sqlite.connection import ConnectionPlus, atomic, \
+    atomic_transaction, transaction
+from qcodes.dataset.sqlite.db_upgrades.batching import UpgradeOptions, \
+    upgrade_runs_in_batches
+from qcodes.dataset.sqlite.query_helpers import many_many
+
+
+# the columns of the runs table that do not hold metadata, as of version 7.
+# The 'snapshot_id' column is added to databases with compressed snapshots.
+_NON_METADATA_COLUMNS = ("run_id", "exp_id", "name", "result_table_name",
+                         "result_counter", "run_timestamp",
+                         "completed_timestamp", "is_completed", "parameters",
+                         "guid", "run_description", "snapshot", "snapshot_id")
+
+
+def upgrade_7_to_8(conn: ConnectionPlus, options: UpgradeOptions) -> None:
+    """
+    Perform the upgrade from version 7 to version 8.
+
+    Add the run_metadata table that holds the metadata of runs as one row
+    per run and tag, indexed by tag and value, and copy the metadata held in
+    columns of the runs table into it, in batches of runs (see
+    :func:`.upgrade_runs_in_batches`). The metadata columns of the runs
+    table are left in place but no longer used.
+    """
+    cursor = atomic_transaction(conn, 'PRAGMA table_info(runs)')
+    tags = [row[0] for row in many_many(cursor, 'name')
+            if row[0] not in _NON_METADATA_COLUMNS]
+
+    with atomic(conn) as conn:
+        transaction(conn, """
+                    CREATE TABLE IF NOT EXISTS run_metadata (
+                        run_id INTEGER NOT NULL,
+                        tag TEXT NOT NULL,
+                        value,
+                        PRIMARY KEY (run_id, tag),
+                        FOREIGN KEY (run_id) REFERENCES runs (run_id)
+                    )
+                    """)
+        transaction(conn, """
+                    CREATE INDEX IF NOT EXISTS IX_run_metadata_tag_value
+                    ON run_metadata (tag, value)
+                    """)
+
+    def upgrade_batch(conn: ConnectionPlus, first: int, last: int,
+                      _: None) -> None:
+        for tag in tags:
+            transaction(conn, f"""
+                        INSERT INTO run_metadata (run_id, tag, value)
+                        SELECT run_id, ?, "{tag}"
+                        FROM runs
+                        WHERE "{tag}" IS NOT NULL
+                        AND run_id BETWEEN ? AND ?
+                        ORDER BY run_id
+                        """, tag, first, last)
+
+    upgrade_runs_in_batches(conn, 8, "Upgrading database, version 7 -> 8",
+                            upgrade_batch, options)
@@ -4,18 +4,20 @@ specific to the domain of QCoDeS database.
 
 Historically this code was part of sqlite_base.py file.
 """
+import json
 import logging
 import sqlite3
 import time
 import unicodedata
 import warnings
 from typing import Dict, List, Optional, Any, Sequence, Union, Tuple, \
-    Callable, cast
+    Callable, Iterator, Mapping, Type, cast
 
 import numpy as np
 
 import qcodes as qc
-from qcodes.dataset.descriptions.rundescriber import RunDescriber
+from qcodes.dataset.descriptions.dependencies import InterDependencies_
+from qcodes.dataset.descriptions.rundescriber import RunDescriber, Shapes
 from qcodes.dataset.descriptions.param_spec import ParamSpec
 from qcodes.dataset.descriptions.versioning.converters import old_to_new
 from qcodes.dataset.descriptions.versioning import v0
@@ -23,6 +25,11 @@ from qcodes.dataset.descriptions.versioning import serialization as serial
 from qcodes.dataset.guids import parse_guid, generate_guid
 from qcodes.dataset.sqlite.connection import transaction, ConnectionPlus, \
     atomic_transaction, atomic
+from qcodes.dataset.sqlite.database import _convert_numeric
+from qcodes.dataset.sqlite.run_cache import run_description_cache, \
+    run_cache_key, get_run_cache_size
+from qcodes.dataset.sqlite.run_shards import rename_run_shard, \
+    attach_run_shard_of_table
 from qcodes.dataset.sqlite.query_helpers import sql_placeholder_string, \
     many_many, one, many, select_one_where, select_many_where, insert_values, \
     insert_column, VALUES, update_where
@@ -35,6 +42,9 @@ log = logging.getLogger(__name__)
 _unicode_categories = ('Lu', 'Ll', 'Lt', 'Lm', 'Lo', 'Nd', 'Pc', 'Pd', 'Zs')
 
 
+# anything that numpy.dtype accepts, e.g. 'int64', numpy.float32 or int
+DTypeHint = Union[str, np.dtype, Type[Any]]
+
 # in the current version, these are the standard columns of the "runs" table
 # Everything else is metadata
 RUNS_TABLE_COLUMNS = ["run_id", "exp_id", "name", "result_table_name",
@@ -135,8 +145,11 @@ def get_parameter_data(conn: ConnectionPlus,
                        table_name: str,
                        columns: Sequence[str] = (),
                        start: Optional[int] = None,
-                       end: Optional[int] = None) -> \
-        Dict[str, Dict[str, np.ndarray]]:
+                       end: Optional[int] = None,
+                       dtype: Optional[Union[DTypeHint,
+                                             Mapping[str, DTypeHint]]] = None,
+                       shapes: Optional[Shapes] = None
+                       ) -> Dict[str, Dict[str, np.ndarray]]:
     """
     Get data for one or more parameters and its dependencies. The data
     is returned as numpy arrays within 2 layers of nested dicts. The keys of
@@ -151,7 +164,9 @@ def get_parameter_data(conn: ConnectionPlus,
     Note that this assumes that all array type parameters have the same length.
     This should always be the case for a parameter and its dependencies.
 
-    Note that all numeric data will at the moment be returned as floating point
+    Unless a ``dtype`` is given, the dtype of numeric data is inferred from
+    the stored values, except for numeric parameters that are expanded to
+    the shape of array parameters, which are returned as floating point
     values.
 
     Args:
@@ -161,15 +176,15 @@ def get_parameter_data(conn: ConnectionPlus,
             are returned.
         start: start of range; if None, then starts from the top of the table
         end: end of range; if None, then ends at the bottom of the table
+        dtype: optional dtype hint. A single dtype is applied to all
+            parameters of type 'numeric', a mapping from parameter names to
+            dtypes is applied to the named parameters regardless of their
+            type.
+        shapes: optional mapping from parameter names to the expected shape
+            of their data, see `_apply_shape`. Ignored if start or end are
+            given.
     """
-    sql = """
-    SELECT run_id FROM runs WHERE result_table_name = ?
-    """
-    c = atomic_transaction(conn, sql, table_name)
-    run_id = one(c, 'run_id')
-
-    rd = serial.from_json_to_current(get_run_description(conn, run_id))
-    interdeps = rd.interdeps
+    interdeps = _get_interdeps_from_result_table_name(conn, table_name)
 
     output = {}
     if len(columns) == 0:
@@ -177,61 +192,265 @@ def get_parameter_data(conn: ConnectionPlus,
 
     # loop over all the requested parameters
     for output_param in columns:
-        output_param_spec = interdeps._id_to_paramspec[output_param]
-        # find all the dependencies of this param
-        paramspecs = [output_param_spec] \
-                   + list(interdeps.dependencies.get(output_param_spec, ()))
-        param_names = [param.name for param in paramspecs]
-        types = [param.type for param in paramspecs]
-
-        res = get_parameter_tree_values(conn,
-                                        table_name,
-                                        output_param,
-                                        *param_names[1:],
-                                        start=start,
-                                        end=end)
-
-        # if we have array type parameters expand all other parameters
-        # to arrays
-        if 'array' in types and ('numeric' in types or 'text' in types
-                                 or 'complex' in types):
-            first_array_element = types.index('array')
-            numeric_elms = [i for i, x in enumerate(types)
-                            if x == "numeric"]
-            complex_elms = [i for i, x in enumerate(types)
-                            if x == 'complex']
-            text_elms = [i for i, x in enumerate(types)
-                         if x == "text"]
-            for row in res:
-                for element in numeric_elms:
-                    row[element] = np.full_like(row[first_array_element],
-                                                row[element],
-                                                dtype=np.float)
-                    # todo should we handle int/float types here
-                    # we would in practice have to perform another
-                    # loop to check that all elements of a given can be cast to
-                    # int without loosing precision before choosing an integer
-                    # representation of the array
-                for element in complex_elms:
-                    row[element] = np.full_like(row[first_array_element],
-                                                row[element],
-                                                dtype=np.complex)
-                for element in text_elms:
-                    strlen = len(row[element])
-                    row[element] = np.full_like(row[first_array_element],
-                                                row[element],
-                                                dtype=f'U{strlen}')
-
-        # Benchmarking shows that transposing the data with python types is
-        # faster than transposing the data using np.array.transpose
-        res_t = map(list, zip(*res))
-        output[output_param] = {name: np.array(column_data)
-                                for name, column_data
-                                in zip(param_names, res_t)}
+        output[output_param] = _get_parameter_tree_arrays(
+            conn, table_name, interdeps, output_param, dtype,
+            start=start, end=end)
+        if (shapes is not None and output_param in shapes
+                and start is None and end is None):
+            output[output_param] = _apply_shape(output[output_param],
+                                                shapes[output_param])
 
     return output
 
 
+def _apply_shape(tree: Dict[str, np.ndarray],
+                 shape: Tuple[int, ...]) -> Dict[str, np.ndarray]:
+    """
+    Reshape the arrays of a parameter and its dependencies to the expected
+    shape of the data. If there are fewer values than expected, the arrays
+    are preallocated with NaN and filled in the order of the sweep, which
+    requires numeric (or complex) values. If this is not possible, e.g.
+    because there are more values than expected, the arrays are returned
+    unchanged.
+    """
+    size = int(np.prod(shape))
+    if any(array.dtype == np.dtype('O') for array in tree.values()):
+        return tree
+    if all(array.size == size for array in tree.values()):
+        return {name: array.reshape(shape) for name, array in tree.items()}
+    if not all(array.size < size and array.dtype.kind in 'biufc'
+               for array in tree.values()):
+        log.warning(f'Can not apply the shape {shape} to data of size '
+                    f'{[array.size for array in tree.values()]}.')
+        return tree
+    shaped = {}
+    for name, array in tree.items():
+        full = np.full(shape, np.nan,
+                       dtype=np.result_type(array.dtype, np.float64))
+        full.reshape(-1)[:array.size] = array.ravel()
+        shaped[name] = full
+    return shaped
+
+
+def iter_parameter_data(conn: ConnectionPlus,
+                        table_name: str,
+                        columns: Sequence[str] = (),
+                        chunk_size: int = 100000,
+                        dtype: Optional[Union[DTypeHint,
+                                              Mapping[str, DTypeHint]]] = None
+                        ) -> Iterator[Dict[str, Dict[str, np.ndarray]]]:
+    """
+    Iterate over the data of one or more parameters and its dependencies in
+    chunks. Every chunk has the same format as the output of
+    `get_parameter_data` and holds the data from (at most) chunk_size
+    consecutive rows of the results table, such that only one chunk needs to
+    be held in memory at a time. Chunks in which none of the requested
+    parameters has any data are skipped; a parameter that has no data in a
+    chunk is mapped to an empty dict. Only the rows that exist when the
+    iteration starts are returned.
+
+    Args:
+        conn: database connection
+        table_name: name of the table
+        columns: list of columns. If no columns are provided, all parameters
+            are returned.
+        chunk_size: the number of rows of the results table per chunk
+        dtype: optional dtype hint, see `get_parameter_data`
+    """
+    if chunk_size < 1:
+        raise ValueError(f'chunk_size must be a positive integer, '
+                         f'got {chunk_size}.')
+
+    interdeps = _get_interdeps_from_result_table_name(conn, table_name)
+
+    if len(columns) == 0:
+        columns = [ps.name for ps in interdeps.non_dependencies]
+
+    c = atomic_transaction(conn, f'SELECT MIN(rowid), MAX(rowid) '
+                                 f'FROM "{table_name}"')
+    first_rowid, last_rowid = c.fetchall()[0]
+    if first_rowid is None:
+        return
+
+    for lower in range(first_rowid, last_rowid + 1, chunk_size):
+        upper = min(lower + chunk_size - 1, last_rowid)
+        chunk = {output_param: _get_parameter_tree_arrays(
+                     conn, table_name, interdeps, output_param, dtype,
+                     rowids=(lower, upper))
+                 for output_param in columns}
+        if any(chunk.values()):
+            yield chunk
+
+
+def _get_interdeps_from_result_table_name(conn: ConnectionPlus,
+                                          table_name: str
+                                          ) -> InterDependencies_:
+    sql = """
+    SELECT run_id FROM runs WHERE result_table_name = ?
+    """
+    c = atomic_transaction(conn, sql, table_name)
+    run_id = one(c, 'run_id')
+
+    return get_run_describer(conn, run_id).interdeps
+
+
+def _get_parameter_tree_arrays(conn: ConnectionPlus,
+                               table_name: str,
+                               interdeps: InterDependencies_,
+                               output_param: str,
+                               dtype: Optional[Union[DTypeHint,
+                                                     Mapping[str, DTypeHint]]],
+                               start: Optional[int] = None,
+                               end: Optional[int] = None,
+                               rowids: Optional[Tuple[int, int]] = None
+                               ) -> Dict[str, np.ndarray]:
+    """
+    Get the data of one parameter and its dependencies as a dict of arrays,
+    which is empty if there is no data. See `get_parameter_data` and
+    `_build_parameter_tree_query` for the arguments.
+    """
+    output_param_spec = interdeps._id_to_paramspec[output_param]
+    # find all the dependencies of this param
+    paramspecs = [output_param_spec] \
+               + list(interdeps.dependencies.get(output_param_spec, ()))
+    param_names = [param.name for param in paramspecs]
+    types = [param.type for param in paramspecs]
+    dtypes = [_dtype_from_hint(dtype, param) for param in paramspecs]
+
+    # numeric values are fetched without passing every single value
+    # through the registered converter and are converted per column
+    # in _numeric_column_to_array instead
+    raw_names = [name for name, paramtype in zip(param_names, types)
+                 if paramtype == 'numeric']
+    sql = _build_parameter_tree_query(table_name, param_names,
+                                      start=start, end=end,
+                                      raw_columns=raw_names, rowids=rowids)
+    # the shard of the run may have been detached since the connection was
+    # obtained, e.g. between the chunks of `iter_parameter_data`
+    attach_run_shard_of_table(conn, table_name)
+    # plain tuples are much cheaper to create and to transpose than
+    # sqlite3.Row objects
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(sql, ())
+    rows = cursor.fetchall()
+
+    if len(rows) == 0:
+        return {}
+
+    # zip transposes the rows in C, after which every column is
+    # converted to an array in one go
+    arrays = [_column_to_array(column_data, paramtype, column_dtype)
+              for column_data, paramtype, column_dtype
+              in zip(zip(*rows), types, dtypes)]
+
+    # if we have array type parameters expand all other parameters
+    # to arrays
+    if 'array' in types and any(x != 'array' for x in types):
+        arrays = _expand_to_array_shape(arrays, types, dtypes)
+
+    return dict(zip(param_names, arrays))
+
+
+def _dtype_from_hint(dtype: Optional[Union[DTypeHint,
+                                           Mapping[str, DTypeHint]]],
+                     paramspec: ParamSpec) -> Optional[np.dtype]:
+    """
+    Resolve the dtype hint given to `get_parameter_data` for a single
+    parameter. Returns None if the dtype should be inferred.
+    """
+    if dtype is None:
+        return None
+    if isinstance(dtype, Mapping):
+        hint = dtype.get(paramspec.name)
+        return None if hint is None else np.dtype(hint)
+    if paramspec.type == 'numeric':
+        return np.dtype(dtype)
+    return None
+
+
+def _column_to_array(values: Sequence[Any],
+                     paramtype: str,
+                     dtype: Optional[np.dtype]) -> np.ndarray:
+    """
+    Convert the values of one column, as returned by sqlite, into a numpy
+    array. Columns of array type are stacked into a single array with the
+    row as the first axis unless the arrays are of different shapes, in which
+    case an array of arrays (of object dtype) is returned.
+    """
+    n_rows = len(values)
+    if paramtype == 'array':
+        shapes = {np.shape(value) for value in values}
+        if len(shapes) == 1:
+            stacked = np.stack(values)
+            return stacked if dtype is None else stacked.astype(dtype,
+                                                                copy=False)
+        ragged = np.empty(n_rows, dtype=object)
+        for i, value in enumerate(values):
+            ragged[i] = value if dtype is None else np.asarray(value, dtype)
+        return ragged
+    if paramtype == 'numeric':
+        return _numeric_column_to_array(values, dtype)
+    return np.array(values, dtype=dtype)
+
+
+def _numeric_column_to_array(values: Sequence[Any],
+                             dtype: Optional[np.dtype]) -> np.ndarray:
+    """
+    Convert the raw values of a numeric column, i.e. values that have not
+    been passed through `_convert_numeric`, into an array. Without a dtype
+    the result is the same as if the converter had been applied to every
+    value: an integer array if all values are integral, a float array
+    otherwise.
+    """
+    array = np.array(values)
+    if array.dtype.kind not in 'biuf':
+        # NaNs are stored as 'nan' strings, and numeric columns may also
+        # hold other strings or NULLs; these rare cases are handled
+        # value by value
+        array = np.array([None if value is None
+                          else _convert_numeric(str(value).encode())
+                          for value in values])
+    if dtype is not None:
+        return array.astype(dtype, copy=False)
+    if (array.dtype.kind == 'f' and np.isfinite(array).all()
+            and (array == np.trunc(array)).all()):
+        return array.astype(np.int64)
+    return array
+
+
+def _expand_to_array_shape(arrays: List[np.ndarray],
+                           types: Sequence[str],
+                           dtypes: Sequence[Optional[np.dtype]]
+                           ) -> List[np.ndarray]:
+    """
+    Expand the scalar (per row) columns to the shape of the first array
+    column such that all returned arrays have the same shape.
+    """
+    first_array = arrays[types.index('array')]
+    expanded = []
+    for array, paramtype, dtype in zip(arrays, types, dtypes):
+        if paramtype == 'array':
+            expanded.append(array)
+            continue
+        if dtype is None:
+            dtype = {'numeric': np.dtype(np.float64),
+                     'complex': np.dtype(np.complex128)}.get(paramtype,
+                                                             array.dtype)
+        if first_array.dtype == np.dtype('O'):
+            # variable length arrays can not be expanded in one step
+            ragged = np.empty(len(array), dtype=object)
+            for i, (value, row) in enumerate(zip(array, first_array)):
+                ragged[i] = np.full_like(row, value, dtype=dtype)
+            expanded.append(ragged)
+        else:
+            row_shape = (len(array),) + (1,) * (first_array.ndim - 1)
+            full = np.empty(first_array.shape, dtype=dtype)
+            full[...] = array.reshape(row_shape)
+            expanded.append(full)
+    return expanded
+
+
 def get_values(conn: ConnectionPlus,
                table_name: str,
                param_name: str) -> List[List[Any]]:
@@ -256,6 +475,55 @@ def get_values(conn: ConnectionPlus,
     return res
 
 
+def _build_parameter_tree_query(result_table_name: str,
+                                columns: Sequence[str],
+                                start: Optional[int] = None,
+                                end: Optional[int] = None,
+                                raw_columns: Sequence[str] = (),
+                                rowids: Optional[Tuple[int, int]] = None
+                                ) -> str:
+    """
+    Build the query selecting the given columns of the rows of a data table
+    where the first column has non-NULL values. See
+    `get_parameter_tree_values` for the meaning of start and end. The values
+    of the columns in raw_columns are returned as stored, i.e. without
+    applying the converter registered for their declared type. If given,
+    only the rows with a rowid within the (inclusive) range rowids are
+    considered.
+    """
+    offset = (start - 1) if start is not None else 0
+    limit = (end - offset) if end is not None else -1
+
+    if start is not None and end is not None and start > end:
+        limit = 0
+
+    # Note: if we use placeholders for the SELECT part, then we get rows
+    # back that have "?" as all their keys, making further data extraction
+    # impossible
+    #
+    # Also, placeholders seem to be ignored in the WHERE X IS NOT NULL line
+
+    columns_for_select = ','.join(columns)
+    # the unary + is a no-op on the value, but the result of an expression
+    # has no declared type and hence no converter is applied to it
+    outer_columns = ','.join(f'+{column}' if column in raw_columns
+                             else column for column in columns)
+    rowid_condition = (f' AND rowid BETWEEN {rowids[0]} AND {rowids[1]}'
+                       if rowids is not None else '')
+
+    sql_subquery = f"""
+                   (SELECT {columns_for_select}
+                    FROM "{result_table_name}"
+                    WHERE {columns[0]} IS NOT NULL{rowid_condition})
+                   """
+    sql = f"""
+          SELECT {outer_columns}
+          FROM {sql_subquery}
+          LIMIT {limit} OFFSET {offset}
+          """
+    return sql
+
+
 def get_parameter_tree_values(conn: ConnectionPlus,
                               result_table_name: str,
                               toplevel_param_name: str,
@@ -287,31 +555,9 @@ def get_parameter_tree_values(conn: ConnectionPlus,
         index is parameter value (first toplevel_param, then other_param_names)
     """
 
-    offset = (start - 1) if start is not None else 0
-    limit = (end - offset) if end is not None else -1
-
-    if start is not None and end is not None and start > end:
-        limit = 0
-
-    # Note: if we use placeholders for the SELECT part, then we get rows
-    # back that have "?" as all their keys, making further data extraction
-    # impossible
-    #
-    # Also, placeholders seem to be ignored in the WHERE X IS NOT NULL line
-
     columns = [toplevel_param_name] + list(other_param_names)
-    columns_for_select = ','.join(columns)
-
-    sql_subquery = f"""
-                   (SELECT {columns_for_select}
-                    FROM "{result_table_name}"
-                    WHERE {toplevel_param_name} IS NOT NULL)
-                   """
-    sql = f"""
-          SELECT {columns_for_select}
-          FROM {sql_subquery}
-          LIMIT {limit} OFFSET {offset}
-          """
+    sql = _build_parameter_tree_query(result_table_name, columns,
+                                      start=start, end=end)
 
     cursor = conn.cursor()
     cursor.execute(sql, ())
@@ -447,6 +693,46 @@ def get_runid_from_guid(conn: ConnectionPlus, guid: str) -> Union[int, None]:
     return run_id
 
 
+def get_runids_from_guids(conn: ConnectionPlus,
+                          guids: Sequence[str]) -> List[int]:
+    """
+    Get the run_ids of many runs based on their guids at once. The guids
+    are joined against the runs table as a table-valued JSON array with a
+    single query, which uses the index of the runs table on the guid and,
+    unlike a temporary table, works on read-only connections too.
+
+    Args:
+        conn: connection to the database
+        guids: the guids to look up
+
+    Returns:
+        The run_ids in the order of the guids, -1 for guids not found
+
+    Raises:
+        RuntimeError if more than one run with any of the given GUIDs exists
+    """
+    query = """
+            SELECT guids.key, runs.run_id
+            FROM json_each(?) AS guids
+            JOIN runs ON runs.guid = guids.value
+            """
+    cursor = atomic_transaction(conn, query, json.dumps(list(guids)))
+    run_ids = [-1] * len(guids)
+    duplicates = set()
+    for position, run_id in cursor.fetchall():
+        if run_ids[position] != -1:
+            duplicates.add(guids[position])
+        run_ids[position] = run_id
+    if duplicates:
+        errormssg = ('Critical consistency error: multiple runs with'
+                     ' the same GUID found! Several runs have the GUIDs '
+                     f'{sorted(duplicates)}')
+        log.critical(errormssg)
+        raise RuntimeError(errormssg)
+
+    return run_ids
+
+
 @deprecate()
 def get_layout(conn: ConnectionPlus,
                layout_id) -> Dict[str, str]:
@@ -1160,6 +1446,10 @@ def _update_run_description(conn: ConnectionPlus, run_id: int,
     with atomic(conn) as conn:
         conn.cursor().execute(sql, (description, run_id))
 
+    key = run_cache_key(conn.path_to_dbfile, run_id)
+    if key is not None:
+        run_description_cache.pop(key)
+
 
 def set_run_timestamp(conn: ConnectionPlus, run_id: int) -> None:
     """
@@ -1297,22 +1587,29 @@ def _validate_table_name(table_name: str) -> bool:
 def _create_run_table(conn: ConnectionPlus,
                       formatted_name: str,
                       parameters: Optional[List[ParamSpec]] = None,
-                      values: Optional[VALUES] = None
+                      values: Optional[VALUES] = None,
+                      schema: Optional[str] = None
                       ) -> None:
     """Create run table with formatted_name as name
 
     Args:
         conn: database connection
         formatted_name: the name of the table to create
+        schema: the name of the attached database in which to create the
+            table, e.g. the shard of the run. Defaults to the main database.
     """
     _validate_table_name(formatted_name)
+    if schema is not None:
+        table = f'"{schema}"."{formatted_name}"'
+    else:
+        table = f'"{formatted_name}"'
 
     with atomic(conn) as conn:
 
         if parameters and values:
             _parameters = ",".join([p.sql_repr() for p in parameters])
             query = f"""
-            CREATE TABLE "{formatted_name}" (
+            CREATE TABLE {table} (
                 id INTEGER PRIMARY KEY,
                 {_parameters}
             );
@@ -1324,7 +1621,7 @@ def _create_run_table(conn: ConnectionPlus,
         elif parameters:
             _parameters = ",".join([p.sql_repr() for p in parameters])
             query = f"""
-            CREATE TABLE "{formatted_name}" (
+            CREATE TABLE {table} (
                 id INTEGER PRIMARY KEY,
                 {_parameters}
             );
@@ -1332,7 +1629,7 @@ def _create_run_table(conn: ConnectionPlus,
             transaction(conn, query)
         else:
             query = f"""
-            CREATE TABLE "{formatted_name}" (
+            CREATE TABLE {table} (
                 id INTEGER PRIMARY KEY
             );
             """
@@ -1343,7 +1640,8 @@ def create_run(conn: ConnectionPlus, exp_id: int, name: str,
                guid: str,
                parameters: Optional[List[ParamSpec]] = None,
                values:  List[Any] = None,
-               metadata: Optional[Dict[str, Any]] = None
+               metadata: Optional[Dict[str, Any]] = None,
+               shard_schema: Optional[str] = None
                ) -> Tuple[int, int, str]:
     """ Create a single run for the experiment.
 
@@ -1359,6 +1657,8 @@ def create_run(conn: ConnectionPlus, exp_id: int, name: str,
         - parameters: optional list of parameters this run has
         - values:  optional list of values for the parameters
         - metadata: optional metadata dictionary
+        - shard_schema: optional schema name of the attached shard of the
+          run in which to create the results table, see :mod:`.run_shards`
 
     Returns:
         - run_counter: the id of the newly created run (not unique)
@@ -1375,7 +1675,8 @@ def create_run(conn: ConnectionPlus, exp_id: int, name: str,
         if metadata:
             add_meta_data(conn, run_id, metadata)
         _update_experiment_run_counter(conn, exp_id, run_counter)
-        _create_run_table(conn, formatted_name, parameters, values)
+        _create_run_table(conn, formatted_name, parameters, values,
+                          schema=shard_schema)
 
     return run_counter, run_id, formatted_name
 
@@ -1388,50 +1689,93 @@ def get_run_description(conn: ConnectionPlus, run_id: int) -> str:
                             "run_id", run_id)
 
 
+def get_run_describer(conn: ConnectionPlus, run_id: int) -> RunDescriber:
+    """
+    Return the deserialized run description of the specified run. The run
+    descriptions of completed runs are cached, see :mod:`.run_cache`.
+    """
+    key = run_cache_key(conn.path_to_dbfile, run_id)
+    maxsize = get_run_cache_size()
+    use_cache = key is not None and maxsize > 0
+
+    if use_cache:
+        cached = run_description_cache.get(key)
+        if cached is not None:
+            return cached
+
+    desc_str, is_completed = select_many_where(
+        conn, "runs", "run_description", "is_completed",
+        where_column="run_id", where_value=run_id)
+    run_describer = serial.from_json_to_current(desc_str)
+
+    if use_cache and is_completed:
+        run_description_cache.put(key, run_describer, maxsize)
+    return run_describer
+
+
 def get_metadata(conn: ConnectionPlus, tag: str, table_name: str):
     """ Get metadata under the tag from table
     """
+    sql = """
+    SELECT EXISTS (SELECT 1 FROM run_metadata WHERE tag = ?),
+           (SELECT run_metadata.value
+            FROM run_metadata
+            JOIN runs ON runs.run_id = run_metadata.run_id
+            WHERE runs.result_table_name = ? AND run_metadata.tag = ?)
+    """
+    is_tag, value = atomic_transaction(conn, sql,
+                                       tag, table_name, tag).fetchone()
+    if is_tag:
+        return value
+    # the standard columns of the runs table are readable as metadata too
     return select_one_where(conn, "runs", tag,
                             "result_table_name", table_name)
 
 
 def get_metadata_from_run_id(conn: ConnectionPlus, run_id: int) -> Dict:
     """
-    Get all metadata associated with the specified run
+    Get all metadata associated with the specified run.
     """
-    non_metadata = RUNS_TABLE_COLUMNS
-
-    metadata = {}
-    possible_tags = []
-
-    # first fetch all columns of the runs table
-    query = "PRAGMA table_info(runs)"
-    cursor = conn.cursor()
-    for row in cursor.execute(query):
-        if row['name'] not in non_metadata:
-            possible_tags.append(row['name'])
-
-    # and then fetch whatever metadata the run might have
-    for tag in possible_tags:
-        query = f"""
-                SELECT "{tag}"
-                FROM runs
-                WHERE run_id = ?
-                AND "{tag}" IS NOT NULL
-                """
-        cursor.execute(query, (run_id,))
-        row = cursor.fetchall()
-        if row != []:
-            metadata[tag] = row[0][tag]
-
-    return metadata
+    sql = """
+    SELECT tag, value
+    FROM run_metadata
+    WHERE run_id = ?
+    ORDER BY rowid
+    """
+    rows = atomic_transaction(conn, sql, run_id).fetchall()
+    return {tag: value for tag, value in rows}
+
+
+def _set_run_metadata(conn: ConnectionPlus, run_id: int,
+                      metadata: Dict[str, Any]) -> None:
+    """
+    Set the metadata of a run, the values under the standard columns of the
+    runs table in place and all other tags in the run_metadata table
+    """
+    columns = {tag: value for tag, value in metadata.items()
+               if tag in RUNS_TABLE_COLUMNS}
+    if columns:
+        update_where(conn, 'runs', 'run_id', run_id, **columns)
+    for tag, value in metadata.items():
+        if tag in columns:
+            continue
+        cursor = transaction(conn, """
+                             UPDATE run_metadata SET value = ?
+                             WHERE run_id = ? AND tag = ?
+                             """, value, run_id, tag)
+        if cursor.rowcount == 0:
+            transaction(conn, """
+                        INSERT INTO run_metadata (run_id, tag, value)
+                        VALUES (?, ?, ?)
+                        """, run_id, tag, value)
 
 
 def insert_meta_data(conn: ConnectionPlus, row_id: int, table_name: str,
                      metadata: Dict[str, Any]) -> None:
     """
     Insert new metadata column and add values. Note that None is not a valid
-    metadata value
+    metadata value. The metadata of runs is held in the run_metadata table
+    rather than in columns of the runs table.
 
     Args:
         - conn: the connection to the sqlite database
@@ -1443,6 +1787,9 @@ def insert_meta_data(conn: ConnectionPlus, row_id: int, table_name: str,
         if val is None:
             raise ValueError(f'Tag {tag} has value None. '
                              ' That is not a valid metadata value!')
+    if table_name == 'runs':
+        _set_run_metadata(conn, row_id, metadata)
+        return
     for key in metadata.keys():
         insert_column(conn, table_name, key)
     update_meta_data(conn, row_id, table_name, metadata)
@@ -1459,7 +1806,10 @@ def update_meta_data(conn: ConnectionPlus, row_id: int, table_name: str,
         - table_name: the table to add to, defaults to runs
         - metadata: the metadata to add
     """
-    update_where(conn, table_name, 'rowid', row_id, **metadata)
+    if table_name == 'runs':
+        _set_run_metadata(conn, row_id, metadata)
+    else:
+        update_where(conn, table_name, 'rowid', row_id, **metadata)
 
 
 def add_meta_data(conn: ConnectionPlus,
@@ -1530,9 +1880,9 @@ def update_GUIDs(conn: ConnectionPlus) -> None:
                     'the GUIDs.')
         return
 
-    query = f"select MAX(run_id) from runs"
-    c = atomic_transaction(conn, query)
-    no_of_runs = c.fetchall()[0][0]
+    # the GUIDs of all runs are fetched at once
+    query = "SELECT run_id, guid FROM runs ORDER BY run_id"
+    runs = atomic_transaction(conn, query).fetchall()
 
     # now, there are four actions we can take
 
@@ -1549,7 +1899,7 @@ def update_GUIDs(conn: ConnectionPlus) -> None:
                     ' code, but a non-zero location code. Please manually '
                     'resolve this, skipping the run now.')
 
-    def _both_zero(run_id: int, conn, guid_comps) -> None:
+    def _both_zero(run_id: int, conn, guid_comps, old_guid_str) -> None:
         guid_str = generate_guid(timeint=guid_comps['time'],
                                  sampleint=guid_comps['sample'])
         with atomic(conn) as conn:
@@ -1560,6 +1910,7 @@ def update_GUIDs(conn: ConnectionPlus) -> None:
                    """
             cur = conn.cursor()
             cur.execute(sql, (guid_str,))
+        rename_run_shard(conn, old_guid_str, guid_str)
 
         log.info(f'Succesfully updated run number {run_id}.')
 
@@ -1569,14 +1920,13 @@ def update_GUIDs(conn: ConnectionPlus) -> None:
                (True, False): _location_only_zero,
                (False, False): _both_nonzero}
 
-    for run_id in range(1, no_of_runs+1):
-        guid_str = get_guid_from_run_id(conn, run_id)
+    for run_id, guid_str in runs:
         guid_comps = parse_guid(guid_str)
         loc = guid_comps['location']
         ws = guid_comps['work_station']
 
         log.info(f'Updating run number {run_id}...')
-        actions[(loc == 0, ws == 0)](run_id, conn, guid_comps)
+        actions[(loc == 0, ws == 0)](run_id, conn, guid_comps, guid_str)
 
 
 def remove_trigger(conn: ConnectionPlus, trigger_id: str) -> None:
@@ -6,7 +6,7 @@ import itertools
 import sqlite3
 from distutils.version import LooseVersion
 from numbers import Number
-from typing import List, Any, Union, Dict, Tuple, Optional
+from typing import List, Any, Union, Dict, Tuple, Optional, Sequence
 
 import numpy as np
 from numpy import ndarray
@@ -222,6 +222,46 @@ def insert_many_values(conn: ConnectionPlus,
     return return_value
 
 
+def insert_many_columns(conn: ConnectionPlus,
+                        formatted_name: str,
+                        columns: List[str],
+                        values: Sequence[Sequence[VALUE]],
+                        ) -> int:
+    """
+    Inserts many values given column by column, i.e. transposed with
+    respect to the input of `insert_many_values`. The rows are streamed
+    into a single prepared statement via `executemany`, so no intermediate
+    per-row containers are built.
+
+    Example input:
+    columns: ['xparam', 'yparam']
+    values: [[x1, x2, x3], [y1, y2, y3]]
+
+    Returns:
+        the number of inserted rows
+    """
+    lengths = [len(val) for val in values]
+    if len(set(lengths)) > 1:
+        raise ValueError('Wrong input format for values. Must specify the '
+                         'same number of values for all columns. Received'
+                         f' lengths {lengths}.')
+    if len(columns) != len(values):
+        raise ValueError(f'Got {len(columns)} column names but values for '
+                         f'{len(values)} columns.')
+
+    _columns = ",".join(columns)
+    query = f"""INSERT INTO "{formatted_name}"
+                ({_columns})
+                VALUES
+                {sql_placeholder_string(len(columns))}
+             """
+
+    with atomic(conn) as conn:
+        conn.cursor().executemany(query, zip(*values))
+
+    return lengths[0] if lengths else 0
+
+
 def modify_values(conn: ConnectionPlus,
                   formatted_name: str,
                   index: int,
@@ -0,0 +1,104 @@
+"""
+This module provides a bounded least-recently-used cache for the
+deserialized run descriptions of completed runs, such that loading and
+plotting the same run over and over again does not require to query and
+parse its run description over and over again.
+
+The cache is keyed by the path to the database file and the run_id.
+Entries are invalidated by the functions of :mod:`.queries` that update the
+run description of a run. Changes made to a database file by other
+processes are not tracked, which is why only completed runs, whose run
+description can not change anymore, are cached. The metadata of runs is
+not cached, since metadata is commonly added to completed runs, also by
+other processes.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+from os.path import expanduser, normpath
+from typing import Any, Hashable, Optional, Tuple
+
+import qcodes
+
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class _LRUCache:
+    """
+    A thread-safe mapping with a maximum number of entries. If the maximum
+    is exceeded, the least recently used entries are evicted.
+    """
+
+    def __init__(self) -> None:
+        self._data: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, maxsize: int) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self, path: Optional[str] = None) -> None:
+        with self._lock:
+            if path is None:
+                self._data.clear()
+                return
+            for key in [key for key in self._data if key[0] == path]:
+                del self._data[key]
+
+    def info(self, maxsize: int) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, maxsize, len(self._data))
+
+
+run_description_cache = _LRUCache()
+
+
+def get_run_cache_size() -> int:
+    return int(qcodes.config["core"]["db_run_cache_size"])
+
+
+def run_cache_key(path_to_db: str, run_id: int) -> Optional[Tuple[str, int]]:
+    """
+    Return the key for the given run, or None if runs of this database can
+    not be cached, e.g. because it is an in-memory database.
+    """
+    if path_to_db in ('', ':memory:'):
+        return None
+    return normpath(expanduser(path_to_db)), run_id
+
+
+def invalidate_run_caches(path_to_db: Optional[str] = None) -> None:
+    """
+    Remove the cached run descriptions of all runs in the given database
+    file, or of all database files if no path is given.
+    """
+    path = None if path_to_db is None else normpath(expanduser(path_to_db))
+    run_description_cache.clear(path)
+
+
+def run_cache_info() -> CacheInfo:
+    """
+    Return the statistics of the run description cache as a
+    (hits, misses, maxsize, currsize) named tuple.
+    """
+    return run_description_cache.info(get_run_cache_size())
@@ -0,0 +1,175 @@
+"""
+This module provides the optional sharded storage layout, in which the
+central database file only holds the catalogue of experiments and runs,
+while the results table of every run lives in a database file of its own,
+the "shard" of the run. A shard is stored next to the central database
+file, as ``<name of the database>_runs/<guid of the run>.db``, such that
+completed runs can be moved, compressed or deleted independently and the
+central database file stays small.
+
+Shards are attached to the connections to the central database on demand.
+Since SQLite looks up unqualified table names in all attached databases,
+the queries on results tables work unchanged. SQLite only allows a few
+databases to be attached to a connection at the same time, hence the least
+recently used shards are detached again.
+
+The layout of new runs is selected with the ``db_run_shards`` setting of the
+config; runs of both layouts can be read regardless of the setting.
+"""
+import os
+import sqlite3
+from typing import Optional
+
+import qcodes
+from qcodes.dataset.sqlite.connection import ConnectionPlus
+from qcodes.dataset.sqlite.database import read_only_uri
+
+
+# SQLite allows 10 attached databases per connection by default, some of
+# which are left for other uses, e.g. `bulk_extract_runs_into_db`
+MAX_ATTACHED_SHARDS = 7
+
+
+def run_shards_enabled() -> bool:
+    """
+    Are the results tables of new runs stored in shards?
+    """
+    return bool(qcodes.config["core"]["db_run_shards"])
+
+
+def run_shard_directory(path_to_db: str) -> str:
+    """
+    Return the directory holding the shards of the runs of a database file
+    """
+    return os.path.splitext(path_to_db)[0] + '_runs'
+
+
+def run_shard_path(path_to_db: str, guid: str) -> str:
+    """
+    Return the path of the shard of a run of a database file
+    """
+    return os.path.join(run_shard_directory(path_to_db), f'{guid}.db')
+
+
+def _schema_name(guid: str) -> str:
+    return 'run_' + guid.replace('-', '_')
+
+
+def _register(conn: ConnectionPlus, guid: str, schema: str) -> None:
+    shards = conn.attached_run_shards
+    shards[guid] = schema
+    shards.move_to_end(guid)
+
+
+def _detach_least_recently_used(conn: ConnectionPlus) -> None:
+    shards = conn.attached_run_shards
+    while len(shards) >= MAX_ATTACHED_SHARDS:
+        guid, schema = next(iter(shards.items()))
+        try:
+            conn.execute(f'DETACH DATABASE "{schema}"')
+        except sqlite3.OperationalError:
+            # the shard is in use by the current transaction; the attach
+            # may still succeed if the limit of SQLite is not reached
+            return
+        del shards[guid]
+
+
+def create_run_shard(conn: ConnectionPlus, guid: str) -> Optional[str]:
+    """
+    Create the shard of a new run and attach it to the connection. Must not
+    be called within a transaction.
+
+    Returns:
+        The schema name of the shard, in which the results table of the
+        run is to be created, or None if the database is not stored in a
+        file, in which case the results table is stored in it directly
+    """
+    if conn.path_to_dbfile == '':
+        return None
+    path = run_shard_path(conn.path_to_dbfile, guid)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _detach_least_recently_used(conn)
+    schema = _schema_name(guid)
+    conn.execute(f'ATTACH DATABASE ? AS "{schema}"', (path,))
+    _register(conn, guid, schema)
+    journal_mode = qcodes.config["core"]["db_pragmas"].get('journal_mode')
+    if journal_mode is None and \
+            qcodes.config["core"]["db_pragma_profile"] == 'wal':
+        journal_mode = 'WAL'
+    if journal_mode is not None:
+        conn.execute(f'PRAGMA "{schema}".journal_mode={journal_mode}')
+    return schema
+
+
+def attach_run_shard(conn: ConnectionPlus, guid: str) -> Optional[str]:
+    """
+    Make sure that the shard of a run, if it has one, is attached to the
+    connection.
+
+    Returns:
+        The schema name of the shard, or None if the results table of the
+        run is stored in the central database
+    """
+    shards = conn.attached_run_shards
+    schema = shards.get(guid)
+    if schema is not None:
+        shards.move_to_end(guid)
+        return schema
+    if guid in conn.unsharded_runs or conn.path_to_dbfile == '':
+        return None
+    path = run_shard_path(conn.path_to_dbfile, guid)
+    if not os.path.exists(path):
+        conn.unsharded_runs.add(guid)
+        return None
+    if conn.read_only:
+        path = read_only_uri(path)
+    _detach_least_recently_used(conn)
+    schema = _schema_name(guid)
+    conn.execute(f'ATTACH DATABASE ? AS "{schema}"', (path,))
+    _register(conn, guid, schema)
+    return schema
+
+
+def attach_run_shard_of_table(conn: ConnectionPlus,
+                              table_name: str) -> Optional[str]:
+    """
+    Make sure that the shard of the run with the given results table, if
+    it has one, is attached to the connection. The shards attached to a
+    connection may be detached again whenever the shard of another run is
+    attached, hence the queries on results tables call this right before
+    they are executed, rather than relying on an earlier attach.
+
+    Returns:
+        The schema name of the shard, or None if the results table of the
+        run is stored in the central database
+    """
+    if conn.path_to_dbfile == '':
+        return None
+    guid = conn.run_guids_by_table.get(table_name)
+    if guid is None:
+        row = conn.execute('SELECT guid FROM runs WHERE result_table_name = ?',
+                           (table_name,)).fetchone()
+        if row is None:
+            return None
+        guid = row[0]
+        conn.run_guids_by_table[table_name] = guid
+    return attach_run_shard(conn, guid)
+
+
+def rename_run_shard(conn: ConnectionPlus, old_guid: str,
+                     new_guid: str) -> None:
+    """
+    Rename the shard of a run, if it has one, after its GUID has changed
+    """
+    for table_name, guid in list(conn.run_guids_by_table.items()):
+        if guid == old_guid:
+            del conn.run_guids_by_table[table_name]
+    if conn.path_to_dbfile == '':
+        return
+    old_path = run_shard_path(conn.path_to_dbfile, old_guid)
+    if not os.path.exists(old_path):
+        return
+    schema = conn.attached_run_shards.pop(old_guid, None)
+    if schema is not None:
+        conn.execute(f'DETACH DATABASE "{schema}"')
+    os.rename(old_path, run_shard_path(conn.path_to_dbfile, new_guid))
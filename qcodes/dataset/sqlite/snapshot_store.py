@@ -0,0 +1,350 @@
+"""
+This module provides the optional compressed storage of the snapshots of
+runs. Instead of storing the JSON of the snapshot of every run in the runs
+table, the snapshots are stored compressed in the ``snapshots`` table, which
+the runs refer to by the ``snapshot_id`` column of the runs table.
+
+Identical snapshots, which are common for runs of the same station, are
+stored only once, as they are identified by the hash of their JSON. A
+snapshot that differs from the most recently stored snapshot, usually the
+snapshot of the previous run, only in a few parameters is stored as a
+structural delta against it, i.e. as the entries of (nested) dictionaries
+that are added, removed or changed. To bound the time to load a snapshot,
+the length of chains of deltas is limited.
+
+The storage of new snapshots is selected with the ``db_snapshot_compression``
+setting of the config; snapshots are read the same way regardless of the
+setting and of how they are stored.
+"""
+import hashlib
+import json
+import lzma
+import sqlite3
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import qcodes
+from qcodes.dataset.sqlite.connection import (ConnectionPlus, atomic,
+                                              atomic_transaction,
+                                              transaction)
+from qcodes.dataset.sqlite.query_helpers import insert_column, update_where
+
+
+# the column of the runs table referring to the snapshot of the run in the
+# snapshots table
+SNAPSHOT_ID_COLUMN = 'snapshot_id'
+
+# the maximum number of deltas that have to be applied to a fully stored
+# snapshot to load a snapshot
+MAX_DELTA_CHAIN_LENGTH = 16
+
+_CODECS = {
+    'zlib': (zlib.compress, zlib.decompress),
+    'lzma': (lzma.compress, lzma.decompress),
+}
+
+# the snapshot most recently stored in each database file, by its
+# snapshot_id, hash and the parsed snapshot, since parsing the JSON of the
+# snapshot to diff against is most of the cost of diffing
+_latest_snapshots: Dict[str, Tuple[int, str, Dict[str, Any]]] = {}
+
+_snapshots_table_schema = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    snapshot_id INTEGER PRIMARY KEY,
+    -- the SHA-256 hash of the JSON of the snapshot
+    hash TEXT UNIQUE,
+    -- the snapshot against which the snapshot is stored as a delta, or
+    -- NULL if it is stored fully
+    base_id INTEGER,
+    -- the number of deltas to apply to a fully stored snapshot
+    chain_length INTEGER,
+    codec TEXT,
+    data BLOB,
+    FOREIGN KEY(base_id)
+    REFERENCES
+        snapshots(snapshot_id)
+);
+"""
+
+
+def snapshot_compression() -> Optional[str]:
+    """
+    Return the compression of newly stored snapshots, or None if snapshots
+    are stored as plain JSON in the runs table
+    """
+    codec = qcodes.config["core"]["db_snapshot_compression"]
+    if codec is not None and codec not in _CODECS:
+        raise ValueError(f'Unknown snapshot compression {codec}, use one of '
+                         f'{", ".join(_CODECS)}.')
+    return codec
+
+
+def _delta(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Return the structural delta that turns the old dictionary into the new
+    one. Changed dictionaries are diffed recursively, all other changed
+    values are replaced as a whole.
+    """
+    delta: Dict[str, Any] = {}
+    for key, value in new.items():
+        if key not in old:
+            delta[key] = ['set', value]
+        elif old[key] == value:
+            continue
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            delta[key] = ['patch', _delta(old[key], value)]
+        else:
+            delta[key] = ['set', value]
+    for key in old:
+        if key not in new:
+            delta[key] = ['del']
+    return delta
+
+
+def _apply_delta(old: Dict[str, Any],
+                 delta: Dict[str, Any]) -> Dict[str, Any]:
+    new = dict(old)
+    for key, (op, *args) in delta.items():
+        if op == 'del':
+            del new[key]
+        elif op == 'set':
+            new[key] = args[0]
+        else:
+            new[key] = _apply_delta(old[key], args[0])
+    return new
+
+
+def _chain(conn: ConnectionPlus, snapshot_id: int) -> List[sqlite3.Row]:
+    """
+    Return the base_id, codec and data of a snapshot and of the snapshots
+    it is stored as deltas against, starting with the snapshot itself
+    """
+    sql = """
+    WITH RECURSIVE chain(base_id, codec, data, position) AS (
+        SELECT base_id, codec, data, 0
+        FROM snapshots WHERE snapshot_id = ?
+        UNION ALL
+        SELECT snapshots.base_id, snapshots.codec, snapshots.data,
+               chain.position + 1
+        FROM snapshots JOIN chain ON snapshots.snapshot_id = chain.base_id
+    )
+    SELECT base_id, codec, data FROM chain ORDER BY position
+    """
+    rows = atomic_transaction(conn, sql, snapshot_id).fetchall()
+    if len(rows) == 0:
+        raise RuntimeError(f'The snapshot with snapshot_id {snapshot_id} '
+                           f'does not exist.')
+    return rows
+
+
+def _load_chain(conn: ConnectionPlus, snapshot_id: int) -> str:
+    """
+    Load a snapshot by applying the chain of deltas to the fully stored
+    snapshot at its start
+    """
+    decoded = [_CODECS[codec][1](data).decode('utf-8')
+               for _, codec, data in reversed(_chain(conn, snapshot_id))]
+    if len(decoded) == 1:
+        return decoded[0]
+    snapshot = json.loads(decoded[0])
+    for delta in decoded[1:]:
+        snapshot = _apply_delta(snapshot, json.loads(delta))
+    return json.dumps(snapshot)
+
+
+def _parse(snapshot: str) -> Optional[Dict[str, Any]]:
+    try:
+        parsed = json.loads(snapshot)
+    except ValueError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+def _store(conn: ConnectionPlus, snapshot: str, codec: str) -> int:
+    """
+    Store a snapshot in the snapshots table, unless it is stored already,
+    and return its snapshot_id. Must be called within a transaction.
+    """
+    transaction(conn, _snapshots_table_schema)
+    digest = hashlib.sha256(snapshot.encode('utf-8')).hexdigest()
+    cursor = transaction(conn, 'SELECT snapshot_id FROM snapshots '
+                               'WHERE hash = ?', digest)
+    row = cursor.fetchone()
+    if row is not None:
+        return row[0]
+
+    compress = _CODECS[codec][0]
+    data = None
+    base_id = None
+    chain_length = 0
+    new = _parse(snapshot)
+
+    latest = transaction(conn, 'SELECT snapshot_id, hash, chain_length '
+                               'FROM snapshots ORDER BY snapshot_id DESC '
+                               'LIMIT 1').fetchone()
+    if new is not None and latest is not None \
+            and latest[2] < MAX_DELTA_CHAIN_LENGTH:
+        cached = _latest_snapshots.get(conn.path_to_dbfile)
+        if cached is not None and cached[:2] == tuple(latest[:2]):
+            old: Optional[Dict[str, Any]] = cached[2]
+        else:
+            old = _parse(_load_chain(conn, latest[0]))
+        if old is not None:
+            delta = json.dumps(_delta(old, new))
+            # the delta must be much smaller than the snapshot to be worth
+            # it, and it must reproduce the JSON exactly, which is not the
+            # case if, e.g., it was not written by `json.dumps` with the
+            # default formatting
+            if len(delta) < len(snapshot) // 2 and \
+                    json.dumps(_apply_delta(old, json.loads(delta))) \
+                    == snapshot:
+                data = compress(delta.encode('utf-8'))
+                base_id = latest[0]
+                chain_length = latest[2] + 1
+    if data is None:
+        data = compress(snapshot.encode('utf-8'))
+
+    cursor = transaction(conn, 'INSERT INTO snapshots (hash, base_id, '
+                               'chain_length, codec, data) '
+                               'VALUES (?, ?, ?, ?, ?)',
+                         digest, base_id, chain_length, codec, data)
+    snapshot_id = cursor.lastrowid
+    if new is not None and conn.path_to_dbfile != '':
+        _latest_snapshots[conn.path_to_dbfile] = (snapshot_id, digest, new)
+    return snapshot_id
+
+
+def add_snapshot(conn: ConnectionPlus, run_id: int, snapshot: str) -> None:
+    """
+    Add the JSON of a snapshot to a run, replacing its snapshot if it has
+    one. The snapshot is stored according to the ``db_snapshot_compression``
+    setting of the config.
+    """
+    codec = snapshot_compression()
+    with atomic(conn) as conn:
+        if codec is None:
+            insert_column(conn, 'runs', 'snapshot')
+            update_where(conn, 'runs', 'run_id', run_id, snapshot=snapshot)
+            if _has_snapshot_id_column(conn):
+                update_where(conn, 'runs', 'run_id', run_id,
+                             **{SNAPSHOT_ID_COLUMN: None})
+        else:
+            snapshot_id = _store(conn, snapshot, codec)
+            insert_column(conn, 'runs', SNAPSHOT_ID_COLUMN, 'INTEGER')
+            update_where(conn, 'runs', 'run_id', run_id,
+                         **{SNAPSHOT_ID_COLUMN: snapshot_id, 'snapshot': None})
+
+
+def _has_snapshot_id_column(conn: ConnectionPlus) -> bool:
+    cursor = atomic_transaction(conn, 'PRAGMA table_info(runs)')
+    return any(row['name'] == SNAPSHOT_ID_COLUMN for row in cursor)
+
+
+def get_snapshot(conn: ConnectionPlus, run_id: int) -> Optional[str]:
+    """
+    Return the JSON of the snapshot of a run, or None if it has none,
+    regardless of how the snapshot is stored
+    """
+    cursor = atomic_transaction(conn, 'SELECT * FROM runs WHERE run_id = ?',
+                                run_id)
+    row = cursor.fetchone()
+    if row is None:
+        raise RuntimeError(f'No run with run_id {run_id} exists.')
+    columns = row.keys()
+    if SNAPSHOT_ID_COLUMN in columns and row[SNAPSHOT_ID_COLUMN] is not None:
+        return _load_chain(conn, row[SNAPSHOT_ID_COLUMN])
+    if 'snapshot' in columns:
+        return row['snapshot']
+    return None
+
+
+def _json_entry(conn: ConnectionPlus, snapshot: str,
+                keys: Sequence[str]) -> Any:
+    """
+    Look up an entry of the JSON of a snapshot with the JSON functions of
+    SQLite, which is much faster than parsing the whole JSON in Python
+    """
+    path = '$' + ''.join('."' + key.replace('"', '\\"') + '"'
+                         for key in keys)
+    try:
+        cursor = atomic_transaction(conn, 'SELECT json_type(?, ?), '
+                                          'json_extract(?, ?)',
+                                    snapshot, path, snapshot, path)
+    except sqlite3.OperationalError as e:
+        raise ValueError('The snapshot is not valid JSON.') from e
+    json_type, entry = cursor.fetchone()
+    if json_type is None:
+        raise KeyError('.'.join(keys))
+    if json_type in ('object', 'array'):
+        return json.loads(entry)
+    if json_type in ('true', 'false'):
+        return bool(entry)
+    return entry
+
+
+def _entry(snapshot: Any, keys: Sequence[str]) -> Any:
+    for key in keys:
+        if not isinstance(snapshot, dict) or key not in snapshot:
+            raise KeyError('.'.join(keys))
+        snapshot = snapshot[key]
+    return snapshot
+
+
+# the entry is not changed by a delta
+_UNCHANGED = object()
+
+
+def _delta_entry(delta: Dict[str, Any], keys: Sequence[str]) -> Any:
+    """
+    Look up an entry of a snapshot in the delta against its base snapshot.
+    Return `_UNCHANGED` if the entry is the same as in the base snapshot,
+    or None if the entry is a dictionary that is only partly changed.
+    """
+    for position, key in enumerate(keys):
+        if key not in delta:
+            return _UNCHANGED
+        op, *args = delta[key]
+        if op == 'del':
+            raise KeyError('.'.join(keys))
+        if op == 'set':
+            return _entry(args[0], keys[position + 1:])
+        delta = args[0]
+    return None
+
+
+def get_snapshot_entry(conn: ConnectionPlus, run_id: int,
+                       keys: Sequence[str]) -> Any:
+    """
+    Return a single entry of the snapshot of a run, given by the keys of
+    the nested dictionaries, without parsing the whole snapshot in Python.
+    For a snapshot stored as a delta, the entry is looked up in the deltas
+    first and only in the fully stored snapshot if no delta changes it.
+
+    Raises:
+        KeyError if the run has no snapshot or the snapshot has no such
+            entry
+    """
+    cursor = atomic_transaction(conn, 'SELECT * FROM runs WHERE run_id = ?',
+                                run_id)
+    row = cursor.fetchone()
+    if row is None:
+        raise RuntimeError(f'No run with run_id {run_id} exists.')
+    columns = row.keys()
+    if SNAPSHOT_ID_COLUMN in columns and row[SNAPSHOT_ID_COLUMN] is not None:
+        snapshot_id = row[SNAPSHOT_ID_COLUMN]
+    elif 'snapshot' in columns and row['snapshot'] is not None:
+        return _json_entry(conn, row['snapshot'], keys)
+    else:
+        raise KeyError('.'.join(keys))
+
+    for base_id, codec, data in _chain(conn, snapshot_id):
+        decoded = _CODECS[codec][1](data).decode('utf-8')
+        if base_id is None:
+            return _json_entry(conn, decoded, keys)
+        entry = _delta_entry(json.loads(decoded), keys)
+        if entry is None:
+            return _entry(json.loads(_load_chain(conn, snapshot_id)), keys)
+        if entry is not _UNCHANGED:
+            return entry
+    raise RuntimeError(f'The snapshot with snapshot_id {snapshot_id} has no '
+                       f'fully stored base snapshot.')
@@ -0,0 +1,308 @@
+"""
+This module converts the data of a DataSet into an :class:`xarray.Dataset`
+and exports it to NetCDF files, which can be loaded again with
+`load_from_netcdf` for analysis without the database.
+
+As opposed to converting the pandas DataFrames of
+`DataSet.get_data_as_pandas_dataframe`, the coordinates are built directly
+from the columns of the setpoints. If the shape of the data of a parameter
+is known (see `Measurement.set_shapes`) and the data fills a grid of this
+shape, the setpoints are read off the axes of the grid. Otherwise, the
+setpoints of data on a (possibly incomplete) grid are found with
+`numpy.unique`, and scattered data is stored along a single index
+dimension.
+
+xarray (and netCDF4 for NetCDF files) are optional dependencies of QCoDeS.
+"""
+import json
+from typing import (TYPE_CHECKING, Any, Dict, List, Optional, Sequence,
+                    Tuple)
+
+import numpy as np
+
+import qcodes.dataset.descriptions.versioning.serialization as serial
+from qcodes.dataset.sqlite.queries import get_parameter_data
+
+if TYPE_CHECKING:
+    import xarray as xr
+    from qcodes.dataset.data_set import DataSet
+
+
+# data on an incomplete grid is put onto the full grid, filled up with NaN,
+# unless the grid has more than this many times as many points as the data
+MAX_GRID_FILL_FACTOR = 4
+
+
+def _import_xarray() -> Any:
+    try:
+        import xarray
+    except ImportError as e:
+        raise ImportError('Converting a DataSet to xarray requires the '
+                          'xarray package, and exporting it to NetCDF the '
+                          'netCDF4 package. Please install them, e.g. with '
+                          '"pip install xarray netCDF4".') from e
+    return xarray
+
+
+def _fill_value(dtype: np.dtype) -> Tuple[np.dtype, Any]:
+    """
+    Return the dtype of an array that can hold the values of the given
+    dtype as well as the fill value for missing values
+    """
+    if dtype.kind in 'biuf':
+        return np.result_type(dtype, np.float64), np.nan
+    if dtype.kind == 'c':
+        return dtype, np.nan
+    if dtype.kind == 'U':
+        return dtype, ''
+    return np.dtype(object), None
+
+
+def _axes_of_grid(tree: Dict[str, np.ndarray], setpoints: Sequence[str],
+                  shape: Optional[Tuple[int, ...]]
+                  ) -> Optional[List[Tuple[str, np.ndarray]]]:
+    """
+    If the data of a parameter tree fills a grid of the given shape, with
+    every setpoint varying along exactly one axis, return the setpoints
+    and their values along their axis, in the order of the axes.
+    """
+    if shape is None or len(setpoints) != len(shape) or len(setpoints) == 0:
+        return None
+    if any(array.size != np.prod(shape) or array.dtype == np.dtype('O')
+           for array in tree.values()):
+        return None
+    ndim = len(shape)
+    axes: Dict[int, Tuple[str, np.ndarray]] = {}
+    for setpoint in setpoints:
+        values = tree[setpoint].reshape(shape)
+        for axis in range(ndim):
+            if axis in axes:
+                continue
+            index = [0] * ndim
+            index[axis] = slice(None)
+            along_axis = values[tuple(index)]
+            broadcast_shape = [1] * ndim
+            broadcast_shape[axis] = shape[axis]
+            if (values == along_axis.reshape(broadcast_shape)).all():
+                axes[axis] = (setpoint, along_axis)
+                break
+        else:
+            return None
+    return [axes[axis] for axis in range(ndim)]
+
+
+class _XArrayBuilder:
+    """
+    Builds the data arrays of the parameter trees of a DataSet one at a
+    time, such that only the data of one tree needs to be held in memory.
+    Scattered data of trees with the same setpoints shares the index
+    dimension.
+    """
+
+    def __init__(self, dataset: 'DataSet') -> None:
+        self._xr = _import_xarray()
+        self._dataset = dataset
+        self._paramspecs = dataset.description.interdeps._id_to_paramspec
+        self._shapes = dataset.description.shapes or {}
+        self._index_dims: List[Tuple[str, Dict[str, np.ndarray]]] = []
+
+    def _attrs(self, name: str) -> Dict[str, str]:
+        paramspec = self._paramspecs[name]
+        return {'units': paramspec.unit, 'long_name': paramspec.label}
+
+    def _coord(self, name: str, dims: Tuple[str, ...],
+               values: np.ndarray) -> 'xr.Variable':
+        return self._xr.Variable(dims, values, attrs=self._attrs(name))
+
+    def dataarray(self, param: str) -> Optional['xr.DataArray']:
+        """
+        Return the data of the given parameter and its setpoints as a
+        DataArray, or None if there is no data
+        """
+        tree = get_parameter_data(self._dataset.conn,
+                                  self._dataset.table_name, [param])[param]
+        if len(tree) == 0:
+            return None
+        # arrays of variable length are flattened like for the DataFrames
+        tree = {name: np.concatenate(array)
+                if array.dtype == np.dtype('O') else array
+                for name, array in tree.items()}
+        setpoints = [name for name in tree if name != param]
+        values = tree[param]
+
+        axes = _axes_of_grid(tree, setpoints, self._shapes.get(param))
+        if axes is not None:
+            coords = {name: self._coord(name, (name,), along_axis)
+                      for name, along_axis in axes}
+            return self._xr.DataArray(
+                values.reshape(self._shapes[param]),
+                dims=[name for name, _ in axes], coords=coords, name=param,
+                attrs=self._attrs(param))
+
+        if values.dtype != np.dtype('O') and len(setpoints) > 0:
+            gridded = self._onto_grid(param, tree, setpoints)
+            if gridded is not None:
+                return gridded
+
+        return self._along_index(param, tree, setpoints)
+
+    def _onto_grid(self, param: str, tree: Dict[str, np.ndarray],
+                   setpoints: Sequence[str]) -> Optional['xr.DataArray']:
+        """
+        Put the data onto the grid spanned by the unique values of the
+        setpoints, if it is not much larger than the data and no two points
+        share the same setpoints
+        """
+        values = tree[param].ravel()
+        uniques = []
+        inverses = []
+        for setpoint in setpoints:
+            column = tree[setpoint].ravel()
+            if column.dtype == np.dtype('O'):
+                return None
+            unique, inverse = np.unique(column, return_inverse=True)
+            uniques.append(unique)
+            inverses.append(inverse.ravel())
+        grid_shape = tuple(len(unique) for unique in uniques)
+        if np.prod(grid_shape) > MAX_GRID_FILL_FACTOR * len(values):
+            return None
+        flat_index = np.ravel_multi_index(inverses, grid_shape)
+        if len(np.unique(flat_index)) != len(flat_index):
+            return None
+
+        dtype, fill_value = _fill_value(values.dtype)
+        grid = np.full(grid_shape, fill_value, dtype=dtype)
+        grid.reshape(-1)[flat_index] = values
+        coords = {name: self._coord(name, (name,), unique)
+                  for name, unique in zip(setpoints, uniques)}
+        return self._xr.DataArray(grid, dims=list(setpoints), coords=coords,
+                                  name=param, attrs=self._attrs(param))
+
+    def _along_index(self, param: str, tree: Dict[str, np.ndarray],
+                     setpoints: Sequence[str]) -> 'xr.DataArray':
+        """
+        Store the data along a single index dimension with the setpoints as
+        coordinates along it
+        """
+        columns = {name: tree[name].ravel() for name in setpoints}
+        dim = None
+        for index_dim, index_columns in self._index_dims:
+            if (index_columns.keys() == columns.keys()
+                    and all(np.array_equal(index_columns[name], column)
+                            for name, column in columns.items())):
+                dim = index_dim
+                break
+        if dim is None:
+            dim = f'{param}_index'
+            self._index_dims.append((dim, columns))
+        coords = {name: self._coord(name, (dim,), column)
+                  for name, column in columns.items()}
+        return self._xr.DataArray(tree[param].ravel(), dims=[dim],
+                                  coords=coords, name=param,
+                                  attrs=self._attrs(param))
+
+
+def _dataset_attrs(dataset: 'DataSet') -> Dict[str, Any]:
+    """
+    Return the metadata of the run as attributes of an xarray Dataset,
+    which (for NetCDF) have to be strings or numbers
+    """
+    attrs: Dict[str, Any] = {
+        'ds_name': dataset.name,
+        'sample_name': dataset.sample_name,
+        'exp_name': dataset.exp_name,
+        'guid': dataset.guid,
+        'run_id': dataset.run_id,
+        'exp_id': dataset.exp_id,
+        'run_description': serial.to_json_for_storage(dataset.description),
+    }
+    timestamps = {'run_timestamp_raw': dataset.run_timestamp_raw,
+                  'completed_timestamp_raw': dataset.completed_timestamp_raw}
+    attrs.update({key: value for key, value in timestamps.items()
+                  if value is not None})
+    for key, value in dataset.metadata.items():
+        if not isinstance(value, (str, int, float)):
+            value = json.dumps(value)
+        attrs[key] = value
+    return attrs
+
+
+def _parameters_to_export(dataset: 'DataSet',
+                          params: Sequence[str]) -> Sequence[str]:
+    if len(params) == 0:
+        return [ps.name
+                for ps in dataset.description.interdeps.non_dependencies]
+    return params
+
+
+def to_xarray_dataset(dataset: 'DataSet',
+                      params: Sequence[str] = ()) -> 'xr.Dataset':
+    """
+    Convert the data of the given parameters (by default all parameters
+    that are not dependencies of other parameters) and their setpoints into
+    an xarray Dataset, with the metadata of the run as attributes.
+    """
+    xr = _import_xarray()
+    builder = _XArrayBuilder(dataset)
+    dataarrays = [builder.dataarray(param)
+                  for param in _parameters_to_export(dataset, params)]
+    try:
+        xr_dataset = xr.merge([dataarray for dataarray in dataarrays
+                               if dataarray is not None],
+                              combine_attrs='override')
+    except xr.MergeError as e:
+        raise ValueError('The parameters have conflicting setpoints and can '
+                         'not be combined into one xarray Dataset, please '
+                         'convert them one at a time.') from e
+    xr_dataset.attrs = _dataset_attrs(dataset)
+    return xr_dataset
+
+
+def export_to_netcdf(dataset: 'DataSet', path: str,
+                     params: Sequence[str] = ()) -> None:
+    """
+    Export the data of the given parameters (by default all parameters
+    that are not dependencies of other parameters) to a NetCDF file, with
+    the same layout as `to_xarray_dataset`. The data variables are written
+    one at a time, such that only the data of one parameter and its
+    setpoints has to be held in memory.
+    """
+    xr = _import_xarray()
+    builder = _XArrayBuilder(dataset)
+    written_coords: Dict[str, 'xr.Variable'] = {}
+    mode = 'w'
+    for param in _parameters_to_export(dataset, params):
+        dataarray = builder.dataarray(param)
+        if dataarray is None:
+            continue
+        coords = {name: dataarray.coords[name].variable
+                  for name in dataarray.coords}
+        if any(name in written_coords
+               and not written_coords[name].identical(coord)
+               for name, coord in coords.items()):
+            # the coordinates of the parameters have to be aligned, which
+            # requires to have all of them in memory
+            to_xarray_dataset(dataset, params).to_netcdf(path, mode='w')
+            return
+        xr_dataset = dataarray.to_dataset()
+        if mode == 'w':
+            xr_dataset.attrs.update(_dataset_attrs(dataset))
+        else:
+            xr_dataset = xr_dataset.drop_vars(
+                [name for name in coords if name in written_coords])
+        xr_dataset.to_netcdf(path, mode=mode)
+        written_coords.update(coords)
+        mode = 'a'
+    if mode == 'w':
+        # there is no data at all
+        xr.Dataset(attrs=_dataset_attrs(dataset)).to_netcdf(path, mode='w')
+
+
+def load_from_netcdf(path: str) -> 'xr.Dataset':
+    """
+    Load a run that has been exported to a NetCDF file with
+    `DataSet.export` as an xarray Dataset. The data variables are only read
+    from the file when they are accessed, and the database is not needed.
+    """
+    xr = _import_xarray()
+    return xr.open_dataset(path)
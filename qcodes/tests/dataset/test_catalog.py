@@ -0,0 +1,116 @@
+import time
+
+import pytest
+
+import qcodes as qc
+from qcodes.dataset.catalog import find_runs, list_runs
+from qcodes.dataset.experiment_container import new_experiment
+from qcodes.dataset.measurements import Measurement
+from qcodes.instrument.parameter import ManualParameter
+# pylint: disable=unused-import
+from qcodes.tests.dataset.temporary_databases import empty_temp_db
+
+
+def _measure(experiment, name, n_points):
+    x = ManualParameter('x')
+    y = ManualParameter('y')
+    meas = Measurement(experiment)
+    meas.name = name
+    meas.register_parameter(x)
+    meas.register_parameter(y, setpoints=(x,))
+    with meas.run() as datasaver:
+        datasaver.dataset.add_metadata('name_length', len(name))
+        for value in range(n_points):
+            datasaver.add_result((x, value), (y, value))
+    return datasaver.dataset
+
+
+@pytest.fixture
+def catalogue(empty_temp_db):
+    exp_1 = new_experiment('exp_1', sample_name='sample_1')
+    exp_2 = new_experiment('exp_2', sample_name='sample_2')
+    datasets = [_measure(exp_1, 'a', 3), _measure(exp_1, 'bb', 0),
+                _measure(exp_2, 'a', 5)]
+    datasets[0].add_metadata('tag', 'good')
+    datasets[2].add_metadata('tag', 'bad')
+    return datasets
+
+
+def test_list_runs(catalogue):
+    runs = list_runs()
+    assert [run.run_id for run in runs] == [ds.run_id for ds in catalogue]
+    for run, dataset in zip(runs, catalogue):
+        assert run.guid == dataset.guid
+        assert run.exp_name == dataset.exp_name
+        assert run.sample_name == dataset.sample_name
+        assert run.name == dataset.name
+        assert run.run_timestamp_raw == dataset.run_timestamp_raw
+        assert run.completed_timestamp_raw == dataset.completed_timestamp_raw
+        assert run.is_completed
+        assert run.result_count == len(dataset)
+        assert run.parameters == ('x', 'y')
+        assert run.metadata == {}
+
+    runs = list_runs(metadata_columns=['tag', 'name_length', 'unknown'])
+    assert [run.metadata for run in runs] == [
+        {'tag': 'good', 'name_length': 1, 'unknown': None},
+        {'tag': None, 'name_length': 2, 'unknown': None},
+        {'tag': 'bad', 'name_length': 1, 'unknown': None}]
+
+    assert [run.result_count for run in list_runs(result_counts=False)] \
+        == [None] * 3
+
+
+def test_list_runs_filters_and_paging(catalogue):
+    def run_ids(**filters):
+        return [run.run_id for run in list_runs(**filters)]
+
+    run_1, run_2, run_3 = [dataset.run_id for dataset in catalogue]
+    assert run_ids(exp_id=catalogue[2].exp_id) == [run_3]
+    assert run_ids(exp_name='exp_1') == [run_1, run_2]
+    assert run_ids(sample_name='sample_2') == [run_3]
+    assert run_ids(name='a') == [run_1, run_3]
+    assert run_ids(exp_name='exp_1', name='a') == [run_1]
+    assert run_ids(is_completed=False) == []
+
+    assert run_ids(started_after=catalogue[1].run_timestamp_raw) \
+        == [run_2, run_3]
+    assert run_ids(started_before=catalogue[1].run_timestamp_raw) == [run_1]
+    assert run_ids(started_after=time.time() + 1) == []
+
+    assert run_ids(metadata={'tag': 'good'}) == [run_1]
+    assert run_ids(metadata={'name_length': 1}) == [run_1, run_3]
+    assert run_ids(tags=['tag']) == [run_1, run_3]
+    assert run_ids(tags=['unknown']) == []
+    assert [run.metadata for run in list_runs(metadata={'tag': 'bad'})] \
+        == [{'tag': 'bad'}]
+
+    assert run_ids(limit=2) == [run_1, run_2]
+    assert run_ids(limit=2, offset=2) == [run_3]
+    assert run_ids(newest_first=True, limit=2) == [run_3, run_2]
+    assert run_ids(offset=1) == [run_2, run_3]
+
+
+def test_list_runs_sharded(empty_temp_db):
+    exp = new_experiment('exp', sample_name='sample')
+    qc.config["core"]["db_run_shards"] = True
+    try:
+        sharded = _measure(exp, 'sharded', 4)
+    finally:
+        qc.config["core"]["db_run_shards"] = False
+    unsharded = _measure(exp, 'unsharded', 2)
+
+    assert [run.result_count for run in list_runs()] == [4, 2]
+    assert [run.guid for run in list_runs()] == [sharded.guid,
+                                                 unsharded.guid]
+
+
+def test_find_runs(catalogue):
+    run_1, _, run_3 = [dataset.run_id for dataset in catalogue]
+    assert [run.run_id for run in find_runs(tag='good')] == [run_1]
+    assert [run.run_id for run in find_runs(name_length=1)] == [run_1, run_3]
+    assert [run.run_id for run in find_runs(name_length=1, tag='bad')] \
+        == [run_3]
+    assert find_runs(name_length='1') == []
+    assert find_runs(unknown='good') == []
+    assert [run.metadata for run in find_runs(tag='good')] == [{'tag': 'good'}]
@@ -13,7 +13,7 @@ from qcodes.dataset.descriptions.param_spec import ParamSpecBase
 from qcodes.dataset.descriptions.dependencies import InterDependencies_
 from qcodes.dataset.descriptions.versioning.v0 import InterDependencies
 import qcodes.dataset.descriptions.versioning.serialization as serial
-from qcodes.dataset.sqlite.connection import atomic_transaction
+from qcodes.dataset.sqlite.connection import atomic, atomic_transaction
 from qcodes.dataset.sqlite.database import initialise_database, \
     initialise_or_create_database_at, connect, \
     get_db_version_and_newest_available_version
@@ -22,9 +22,14 @@ from qcodes.dataset.sqlite.db_upgrades import get_user_version, \
     set_user_version, perform_db_upgrade_0_to_1, perform_db_upgrade_1_to_2, \
     perform_db_upgrade_2_to_3, perform_db_upgrade_3_to_4, \
     perform_db_upgrade_4_to_5, _latest_available_version, \
-    perform_db_upgrade_5_to_6
-from qcodes.dataset.sqlite.queries import update_GUIDs, get_run_description
-from qcodes.dataset.sqlite.query_helpers import one, is_column_in_table
+    perform_db_upgrade_5_to_6, perform_db_upgrade_6_to_7, \
+    perform_db_upgrade_7_to_8, perform_db_upgrade
+from qcodes.dataset.sqlite.db_upgrades.batching import CHECKPOINTS_TABLE, \
+    get_checkpoint
+from qcodes.dataset.sqlite.queries import update_GUIDs, \
+    get_run_description, get_metadata_from_run_id
+from qcodes.dataset.sqlite.query_helpers import one, is_column_in_table, \
+    insert_column
 from qcodes.tests.common import error_caused_by
 from qcodes.tests.dataset.temporary_databases import (empty_temp_db,
                                                       experiment,
@@ -72,7 +77,8 @@ def test_tables_exist(empty_temp_db, version):
                    version=version)
     cursor = conn.execute("select sql from sqlite_master"
                           " where type = 'table'")
-    expected_tables = ['experiments', 'runs', 'layouts', 'dependencies']
+    expected_tables = ['experiments', 'runs', 'layouts', 'dependencies',
+                       'run_metadata']
     rows = [row for row in cursor]
     assert len(rows) == len(expected_tables)
     for row, expected_table in zip(rows, expected_tables):
@@ -696,6 +702,151 @@ def test_perform_actual_upgrade_5_to_6():
             assert desc._version == 1
 
 
+def test_perform_upgrade_6_to_7(tmp_path):
+    dbname = str(tmp_path / 'version6.db')
+    conn = connect(dbname, version=6)
+    assert get_user_version(conn) == 6
+
+    new_indices = {'IX_runs_exp_id_result_counter',
+                   'IX_runs_result_table_name',
+                   'IX_layouts_run_id_parameter',
+                   'IX_dependencies_dependent'}
+    index_query = "SELECT name FROM sqlite_master WHERE type='index'"
+
+    c = atomic_transaction(conn, index_query)
+    assert new_indices.isdisjoint(row['name'] for row in c.fetchall())
+
+    perform_db_upgrade_6_to_7(conn)
+    assert get_user_version(conn) == 7
+
+    c = atomic_transaction(conn, index_query)
+    assert new_indices.issubset(row['name'] for row in c.fetchall())
+
+    queries_and_indices = [
+        ("SELECT run_id FROM runs WHERE result_counter = 1 AND exp_id = 1",
+         'IX_runs_exp_id_result_counter'),
+        ("SELECT run_id FROM runs WHERE result_table_name = 'results-1-1'",
+         'IX_runs_result_table_name'),
+        ("SELECT layout_id FROM layouts WHERE parameter = 'x' "
+         "AND run_id = 1",
+         'IX_layouts_run_id_parameter'),
+        ("SELECT independent, axis_num FROM dependencies WHERE dependent = 1",
+         'IX_dependencies_dependent')]
+    for query, index in queries_and_indices:
+        c = atomic_transaction(conn, f'EXPLAIN QUERY PLAN {query}')
+        plan = ' '.join(row['detail'] for row in c.fetchall())
+        assert index in plan
+
+    conn.close()
+
+
+def test_perform_upgrade_7_to_8(tmp_path):
+    dbname = str(tmp_path / 'version7.db')
+    conn = connect(dbname, version=7)
+    exp = new_experiment('exp', sample_name='sample', conn=conn)
+    runs = [new_data_set('run', exp_id=exp.exp_id, conn=conn)
+            for _ in range(3)]
+    # before version 8, metadata was held in a column of the runs table
+    # per tag
+    with atomic(conn) as conn:
+        for tag in ('sample', 'cooldown'):
+            insert_column(conn, 'runs', tag)
+    atomic_transaction(conn, 'UPDATE runs SET sample = ?, cooldown = ? '
+                             'WHERE run_id = ?', 'A', 3, runs[0].run_id)
+    atomic_transaction(conn, 'UPDATE runs SET cooldown = ? '
+                             'WHERE run_id = ?', 4.5, runs[2].run_id)
+
+    perform_db_upgrade_7_to_8(conn)
+    assert get_user_version(conn) == 8
+
+    assert get_metadata_from_run_id(conn, runs[0].run_id) == {'sample': 'A',
+                                                              'cooldown': 3}
+    assert get_metadata_from_run_id(conn, runs[1].run_id) == {}
+    assert get_metadata_from_run_id(conn, runs[2].run_id) == {'cooldown': 4.5}
+
+    c = atomic_transaction(conn, "EXPLAIN QUERY PLAN SELECT run_id FROM "
+                                 "run_metadata WHERE tag = 'a' AND value = 1")
+    plan = ' '.join(row['detail'] for row in c.fetchall())
+    assert 'IX_run_metadata_tag_value' in plan
+
+    conn.close()
+
+
+def test_interrupted_upgrade_is_resumed(tmp_path):
+    dbname = str(tmp_path / 'version7.db')
+    conn = connect(dbname, version=7)
+    exp = new_experiment('exp', sample_name='sample', conn=conn)
+    runs = [new_data_set('run', exp_id=exp.exp_id, conn=conn)
+            for _ in range(5)]
+    insert_column(conn, 'runs', 'tag')
+    atomic_transaction(conn, 'UPDATE runs SET tag = run_id')
+
+    def interrupt(description, last_run_id, max_run_id):
+        assert description == "Upgrading database, version 7 -> 8"
+        assert max_run_id == runs[-1].run_id
+        if last_run_id == 4:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        perform_db_upgrade(conn, batch_size=2, progress=interrupt)
+    # the batches before the interruption are kept
+    assert get_user_version(conn) == 7
+    assert get_checkpoint(conn, 8) == 4
+    c = atomic_transaction(conn, 'SELECT run_id FROM run_metadata')
+    assert [row['run_id'] for row in c.fetchall()] == [1, 2, 3, 4]
+
+    progress = []
+    perform_db_upgrade(conn, batch_size=2,
+                       progress=lambda *args: progress.append(args))
+    assert progress == [("Upgrading database, version 7 -> 8", 5, 5)]
+    assert get_user_version(conn) == 8
+    assert get_checkpoint(conn, 8) == 0
+    assert not any(row['name'] == CHECKPOINTS_TABLE for row in
+                   atomic_transaction(conn, "SELECT name FROM sqlite_master"))
+    for run in runs:
+        assert get_metadata_from_run_id(conn, run.run_id) == {
+            'tag': run.run_id}
+    conn.close()
+
+
+def test_no_progress_bars_without_runs(tmp_path, capsys):
+    conn = connect(str(tmp_path / 'new.db'))
+    conn.close()
+    assert capsys.readouterr().err == ''
+
+    conn = connect(str(tmp_path / 'version7.db'), version=7)
+    exp = new_experiment('exp', sample_name='sample', conn=conn)
+    new_data_set('run', exp_id=exp.exp_id, conn=conn)
+    capsys.readouterr()
+    perform_db_upgrade(conn)
+    assert 'version 7 -> 8' in capsys.readouterr().err
+    conn.close()
+
+
+@pytest.mark.parametrize('n_workers', [1, 2])
+def test_perform_upgrade_5_to_6_in_batches(tmp_path, n_workers):
+    dbname = str(tmp_path / 'version5.db')
+    conn = connect(dbname, version=5)
+    exp = new_experiment('exp', sample_name='sample', conn=conn)
+    for _ in range(5):
+        new_data_set('run', exp_id=exp.exp_id, conn=conn)
+    old_json = json.dumps({'interdependencies':
+                           InterDependencies()._to_dict()})
+    atomic_transaction(conn, 'UPDATE runs SET run_description = ?', old_json)
+    conn.close()
+
+    progress = []
+    conn = connect(dbname, version=5)
+    perform_db_upgrade(conn, version=6, batch_size=2, n_workers=n_workers,
+                       progress=lambda *args: progress.append(args))
+    assert get_user_version(conn) == 6
+    assert [last_run_id for _, last_run_id, _ in progress] == [2, 4, 5]
+    for run_id in range(1, 6):
+        desc = json.loads(get_run_description(conn, run_id))
+        assert desc == {'version': 0, **json.loads(old_json)}
+    conn.close()
+
+
 @pytest.mark.usefixtures("empty_temp_db")
 def test_cannot_connect_to_newer_db():
     conn = connect(qc.config["core"]["db_location"],
@@ -711,7 +862,7 @@ def test_cannot_connect_to_newer_db():
 
 
 def test_latest_available_version():
-    assert _latest_available_version() == 6
+    assert _latest_available_version() == 8
 
 
 @pytest.mark.parametrize('version', VERSIONS)
@@ -13,7 +13,8 @@ from qcodes.dataset.data_set import (DataSet, load_by_guid, load_by_counter,
                                      load_by_id)
 from qcodes.dataset.sqlite.database import get_db_version_and_newest_available_version
 from qcodes.dataset.sqlite.connection import path_to_dbfile
-from qcodes.dataset.database_extract_runs import extract_runs_into_db
+from qcodes.dataset.database_extract_runs import (extract_runs_into_db,
+                                                  bulk_extract_runs_into_db)
 from qcodes.dataset.sqlite.queries import get_experiments
 from qcodes.tests.dataset.temporary_databases import two_empty_temp_db_connections
 from qcodes.tests.dataset.test_descriptions import some_paramspecs
@@ -315,6 +316,63 @@ def test_runs_from_different_experiments_raises(two_empty_temp_db_connections,
         extract_runs_into_db(source_path, target_path, *run_ids)
 
 
+def test_bulk_extraction_from_several_experiments(
+        two_empty_temp_db_connections, some_interdeps):
+    source_conn, target_conn = two_empty_temp_db_connections
+
+    source_path = path_to_dbfile(source_conn)
+    target_path = path_to_dbfile(target_conn)
+
+    type_casters = {'numeric': float,
+                    'array': (lambda x: np.array(x) if hasattr(x, '__iter__')
+                              else np.array([x])),
+                    'text': str}
+
+    source_exp_1 = Experiment(conn=source_conn, name='exp_1')
+    source_exp_2 = Experiment(conn=source_conn, name='exp_2')
+
+    run_ids = []
+    for exp in (source_exp_1, source_exp_2, source_exp_1):
+        source_dataset = DataSet(conn=source_conn, exp_id=exp.exp_id)
+        run_ids.append(source_dataset.run_id)
+        source_dataset.set_interdependencies(some_interdeps[0])
+        source_dataset.mark_started()
+        for value in range(10):
+            source_dataset.add_result(
+                {ps.name: type_casters[ps.type](value)
+                 for ps in some_interdeps[0].paramspecs})
+        source_dataset.add_metadata('goodness', 'fair')
+        source_dataset.mark_completed()
+
+    incomplete = DataSet(conn=source_conn, exp_id=source_exp_1.exp_id)
+    with pytest.raises(ValueError, match='Dataset not completed'):
+        bulk_extract_runs_into_db(source_path, target_path,
+                                  incomplete.run_id, show_progress=False)
+
+    bulk_extract_runs_into_db(source_path, target_path, *run_ids[1:],
+                              show_progress=False)
+    # runs already in the target DB are skipped
+    bulk_extract_runs_into_db(source_path, target_path, *run_ids,
+                              show_progress=False)
+
+    target_exps = get_experiments(target_conn)
+    assert len(target_exps) == 2
+    assert len(Experiment(conn=target_conn, exp_id=1)) == 1
+    assert len(Experiment(conn=target_conn, exp_id=2)) == 2
+
+    for run_id in run_ids:
+        source_ds = DataSet(conn=source_conn, run_id=run_id)
+        target_ds = load_by_guid(guid=source_ds.guid, conn=target_conn)
+        assert source_ds.the_same_dataset_as(target_ds)
+        assert target_ds.exp_name == source_ds.exp_name
+        assert target_ds.metadata == source_ds.metadata
+        assert target_ds.run_timestamp_raw == source_ds.run_timestamp_raw
+
+        source_data = source_ds.get_data(*source_ds.parameters.split(','))
+        target_data = target_ds.get_data(*target_ds.parameters.split(','))
+        assert source_data == target_data
+
+
 def test_extracting_dataless_run(two_empty_temp_db_connections):
     """
     Although contrived, it could happen that a run with no data is extracted
@@ -122,3 +122,48 @@ def test_saving_numeric_values_as_text(numeric_type):
             data_saver.add_result((p.name, value))
     finally:
         data_saver.dataset.conn.close()
+
+
+@pytest.mark.usefixtures("experiment")
+def test_add_result_plan_reused():
+    """
+    Test that the plan of add_result is compiled once per sequence of
+    parameters and gives the same results as the validation of every call
+    """
+    x = ParamSpecBase("x", "numeric")
+    y = ParamSpecBase("y", "numeric")
+    z = ParamSpecBase("z", "numeric")
+    t = ParamSpecBase("t", "text")
+    idps = InterDependencies_(dependencies={z: (x, y)}, standalones=(t,))
+
+    test_set = qc.new_data_set("test-dataset")
+    test_set.set_interdependencies(idps)
+    test_set.mark_started()
+    data_saver = DataSaver(dataset=test_set, write_period=0, interdeps=idps)
+
+    try:
+        data_saver.add_result(("x", 1), ("y", np.float32(0.5)), ("z", 2.5))
+        data_saver.add_result(("x", np.int64(2)), ("y", 0.5), ("z", -1))
+        # non-scalar values take the full validation with the same plan
+        data_saver.add_result(("x", [3, 4]), ("y", 0.5), ("z", [5, 6]))
+        data_saver.add_result(("t", "text"))
+        assert len(data_saver._result_plans) == 2
+
+        with pytest.raises(ValueError, match='but got a result of type bool'):
+            data_saver.add_result(("x", True), ("y", 0.5), ("z", 1))
+        with pytest.raises(ValueError, match='Incompatible shapes'):
+            data_saver.add_result(("x", [1, 2]), ("y", 0.5), ("z", [1]))
+        with pytest.raises(ValueError, match='some required parameters'):
+            data_saver.add_result(("x", 1), ("z", 1))
+        with pytest.raises(ValueError, match='no such parameter registered'):
+            data_saver.add_result(("w", 1))
+        assert len(data_saver._result_plans) == 2
+
+        data_saver.flush_data_to_database()
+        data = test_set.get_parameter_data()
+        np.testing.assert_array_equal(data['z']['x'], [1, 2, 3, 4])
+        np.testing.assert_array_equal(data['z']['y'], [0.5] * 4)
+        np.testing.assert_array_equal(data['z']['z'], [2.5, -1, 5, 6])
+        np.testing.assert_array_equal(data['t']['t'], ['text'])
+    finally:
+        data_saver.dataset.conn.close()
@@ -1,4 +1,5 @@
 import itertools
+import json
 from copy import copy
 import re
 from unittest.mock import patch
@@ -7,6 +8,8 @@ from typing import Sequence, Dict, Tuple, Optional
 
 import pytest
 import numpy as np
+import pandas as pd
+from numpy.testing import assert_array_equal
 from hypothesis import given, settings
 import hypothesis.strategies as hst
 
@@ -23,6 +26,8 @@ from qcodes.dataset.sqlite.database import get_DB_location
 from qcodes.dataset.data_set import CompletedError, DataSet
 from qcodes.dataset.guids import parse_guid
 from qcodes.dataset.sqlite.connection import path_to_dbfile
+from qcodes.dataset.sqlite.queries import get_metadata_from_run_id
+from qcodes.dataset.sqlite.snapshot_store import get_snapshot
 # pylint: disable=unused-import
 from qcodes.tests.dataset.temporary_databases import (empty_temp_db,
                                                       experiment, dataset,
@@ -445,6 +450,50 @@ def test_adding_too_many_results():
     dataset.add_results(results)
 
 
+@pytest.mark.usefixtures("experiment")
+def test_add_columns():
+    dataset = new_data_set("test_add_columns")
+    xparam = ParamSpecBase("x", "numeric")
+    yparam = ParamSpecBase("y", "numeric")
+    sparam = ParamSpecBase("s", "text")
+    cparam = ParamSpecBase("c", "complex")
+    aparam = ParamSpecBase("a", "array")
+    idps = InterDependencies_(dependencies={yparam: (xparam,),
+                                            aparam: (xparam,)},
+                              standalones=(sparam, cparam))
+    dataset.set_interdependencies(idps)
+    dataset.mark_started()
+
+    n_max = qc.SQLiteSettings.limits['MAX_VARIABLE_NUMBER']
+    xs = np.linspace(0, 1, n_max*3)
+    ys = xs**2
+    ys[1] = np.nan
+
+    assert dataset.add_columns({'x': xs, 'y': ys}) == 0
+    assert len(dataset) == len(xs)
+    np.testing.assert_allclose(dataset.get_data('x', 'y'),
+                               np.stack([xs, ys], axis=1))
+
+    arrays = np.random.rand(3, 4)
+    index = dataset.add_columns({'x': np.arange(3.), 'a': arrays,
+                                 's': np.array(['a', 'b', 'c']),
+                                 'c': np.array([1j, 2, 3+3j])})
+    assert index == len(xs)
+    data = dataset.get_parameter_data('a', 's', 'c')
+    np.testing.assert_allclose(data['a']['a'], arrays)
+    assert data['s']['s'].tolist() == ['a', 'b', 'c']
+    np.testing.assert_allclose(data['c']['c'], [1j, 2, 3+3j])
+
+    with pytest.raises(ValueError, match='same number of values'):
+        dataset.add_columns({'x': np.arange(3.), 'y': np.arange(2.)})
+    with pytest.raises(ValueError, match='missing setpoint values'):
+        dataset.add_columns({'y': np.arange(3.)})
+
+    dataset.mark_completed()
+    with pytest.raises(CompletedError):
+        dataset.add_columns({'x': xs})
+
+
 @pytest.mark.usefixtures("dataset")
 def test_load_by_counter():
     exps = experiments()
@@ -662,6 +711,56 @@ def test_metadata(experiment, request):
     assert error_caused_by(e, bad_tag_msg)
 
 
+@pytest.mark.usefixtures("experiment")
+def test_lazy_metadata_description_and_snapshot():
+    ds = DataSet(metadata={'tag': 'value'})
+    ds.mark_started()
+    ds.add_snapshot(json.dumps({'station': {'instruments': {
+        'dac': {'parameters': {'ch1': {'value': 0.5, 'unit': 'V'}}}}}}))
+    ds.mark_completed()
+    snapshot = ds.snapshot
+
+    with patch('qcodes.dataset.data_set.get_metadata_from_run_id',
+               wraps=get_metadata_from_run_id) as get_metadata, \
+            patch('qcodes.dataset.data_set.get_snapshot',
+                  wraps=get_snapshot) as get_snapshot_raw, \
+            patch.object(DataSet, '_get_run_description_from_db',
+                         autospec=True,
+                         side_effect=DataSet._get_run_description_from_db
+                         ) as get_description:
+        loaded = DataSet(run_id=ds.run_id)
+        assert get_metadata.call_count == 0
+        assert get_description.call_count == 0
+        assert get_snapshot_raw.call_count == 0
+
+        for _ in range(2):
+            assert loaded.metadata == {'tag': 'value'}
+            assert loaded.description == ds.description
+            assert loaded.snapshot == snapshot
+        assert get_metadata.call_count == 1
+        assert get_description.call_count == 1
+        assert get_snapshot_raw.call_count == 1
+
+    assert loaded.snapshot_get('station.instruments.dac.parameters.ch1') \
+        == {'value': 0.5, 'unit': 'V'}
+    fresh = DataSet(run_id=ds.run_id)
+    assert fresh.snapshot_get(
+        'station.instruments.dac.parameters.ch1.value') == 0.5
+    assert fresh.snapshot_get('station.instruments.dmm', 'missing') \
+        == 'missing'
+    assert fresh._snapshot_raw is None
+
+    # modifying a returned snapshot does not change later results
+    loaded.snapshot['station']['instruments'].clear()
+    loaded.snapshot_get('station.instruments.dac.parameters')['ch1'] = None
+    assert loaded.snapshot == snapshot
+    assert loaded.snapshot_get('station.instruments.dac.parameters.ch1') \
+        == {'value': 0.5, 'unit': 'V'}
+
+    unsnapshotted = DataSet()
+    assert unsnapshotted.snapshot_get('station') is None
+
+
 def test_the_same_dataset_as(some_interdeps, experiment):
 
     ds = DataSet()
@@ -1083,6 +1182,115 @@ def test_get_parameter_data_independent_parameters(standalone_parameters_dataset
                           expected_values)
 
 
+def test_get_parameter_data_dtype_hint(scalar_dataset,
+                                       array_in_scalar_dataset):
+    data = scalar_dataset.get_parameter_data('param_3')['param_3']
+    assert all(arr.dtype.kind == 'i' for arr in data.values())
+
+    data = scalar_dataset.get_parameter_data(
+        'param_3', dtype=np.float32)['param_3']
+    assert all(arr.dtype == np.float32 for arr in data.values())
+    assert_array_equal(data['param_3'], np.arange(30000, 31000))
+
+    data = scalar_dataset.get_parameter_data(
+        'param_3', dtype={'param_0': np.int16})['param_3']
+    assert data['param_0'].dtype == np.int16
+    assert data['param_3'].dtype.kind == 'i'
+
+    # scalars expanded to the shape of arrays default to float, but can
+    # be requested as any other dtype
+    data = array_in_scalar_dataset.get_parameter_data(
+        'testparameter')['testparameter']
+    assert data['scalarparam'].dtype == np.float64
+    data = array_in_scalar_dataset.get_parameter_data(
+        'testparameter', dtype='int32')['testparameter']
+    assert data['scalarparam'].dtype == np.int32
+    assert data['scalarparam'].shape == (9, 5)
+    assert_array_equal(data['scalarparam'][:, 0], np.arange(1, 10))
+
+
+def test_get_parameter_data_numeric_conversion(dataset):
+    """
+    Numeric values are converted column by column, make sure that this gives
+    the same values as converting them one by one
+    """
+    x = ParamSpecBase('x', 'numeric')
+    y = ParamSpecBase('y', 'numeric')
+    z = ParamSpecBase('z', 'numeric')
+    idps = InterDependencies_(dependencies={y: (x,), z: (x,)})
+    dataset.set_interdependencies(idps)
+    dataset.mark_started()
+    dataset.add_results([{'x': 0, 'y': 1.0, 'z': 0.5},
+                         {'x': 1, 'y': np.nan, 'z': 1.5},
+                         {'x': 2, 'y': 3, 'z': np.inf}])
+    dataset.mark_completed()
+
+    data = dataset.get_parameter_data()
+    assert data['y']['x'].dtype == np.int64
+    assert_array_equal(data['y']['y'], [1.0, np.nan, 3.0])
+    assert_array_equal(data['z']['z'], [0.5, 1.5, np.inf])
+    assert_array_equal(np.array(dataset.get_data('y')).ravel(),
+                       data['y']['y'])
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1000, 5000])
+def test_iter_parameter_data(scalar_dataset, chunk_size):
+    expected = scalar_dataset.get_parameter_data('param_3')['param_3']
+
+    chunks = list(scalar_dataset.iter_parameter_data('param_3',
+                                                     chunk_size=chunk_size))
+    assert len(chunks) == -(-1000 // chunk_size)
+    assert all(len(chunk['param_3']['param_3']) <= chunk_size
+               for chunk in chunks)
+    for name, values in expected.items():
+        assert_array_equal(
+            np.concatenate([chunk['param_3'][name] for chunk in chunks]),
+            values)
+
+
+def test_iter_parameter_data_arrays(array_in_scalar_dataset):
+    expected = array_in_scalar_dataset.get_parameter_data()
+    chunks = list(array_in_scalar_dataset.iter_parameter_data(chunk_size=4))
+    assert len(chunks) == 3
+    for name, values in expected['testparameter'].items():
+        assert_array_equal(
+            np.concatenate([chunk['testparameter'][name]
+                            for chunk in chunks]),
+            values)
+
+
+def test_iter_parameter_data_as_dataframes(scalar_dataset):
+    expected = scalar_dataset.get_data_as_pandas_dataframe()['param_3']
+    chunks = list(scalar_dataset.iter_parameter_data(chunk_size=300,
+                                                     as_dataframes=True))
+    assert len(chunks) == 4
+    df = pd.concat([chunk['param_3'] for chunk in chunks])
+    assert df.equals(expected)
+
+
+def test_iter_parameter_data_sparse(dataset):
+    x = ParamSpecBase('x', 'numeric')
+    y = ParamSpecBase('y', 'numeric')
+    z = ParamSpecBase('z', 'numeric')
+    idps = InterDependencies_(dependencies={y: (x,), z: (x,)})
+    dataset.set_interdependencies(idps)
+    dataset.mark_started()
+    dataset.add_results([{'x': i, 'y': i} for i in range(10)])
+    dataset.add_results([{'x': i} for i in range(10)])
+    dataset.add_results([{'x': i, 'z': i} for i in range(10)])
+    dataset.mark_completed()
+
+    chunks = list(dataset.iter_parameter_data(chunk_size=10))
+    assert len(chunks) == 2
+    assert_array_equal(chunks[0]['y']['y'], np.arange(10))
+    assert chunks[0]['z'] == {}
+    assert chunks[1]['y'] == {}
+    assert_array_equal(chunks[1]['z']['x'], np.arange(10))
+
+    with pytest.raises(ValueError, match='chunk_size'):
+        next(dataset.iter_parameter_data(chunk_size=0))
+
+
 def parameter_test_helper(ds: DataSet,
                           toplevel_names: Sequence[str],
                           expected_names: Dict[str, Sequence[str]],
@@ -0,0 +1,100 @@
+import numpy as np
+from numpy.testing import assert_array_equal
+import pytest
+
+from qcodes.dataset.data_set import load_by_id
+from qcodes.dataset.data_set_cache import _GrowableArray
+from qcodes.dataset.measurements import Measurement
+from qcodes.instrument.parameter import ManualParameter
+from qcodes.utils.validators import Arrays
+# pylint: disable=unused-import
+from qcodes.tests.dataset.temporary_databases import (empty_temp_db,
+                                                      experiment)
+
+
+@pytest.fixture
+def meas_with_array_param():
+    x = ManualParameter('x')
+    y = ManualParameter('y')
+    signal = ManualParameter('signal', vals=Arrays(shape=(3,)))
+    meas = Measurement()
+    meas.register_parameter(x)
+    meas.register_parameter(y, setpoints=(x,))
+    meas.register_parameter(signal, setpoints=(x,), paramtype='array')
+    return meas, x, y, signal
+
+
+def assert_cache_equals_data(cache_data, data):
+    assert cache_data.keys() == data.keys()
+    for param, tree in data.items():
+        assert cache_data[param].keys() == tree.keys()
+        for name, array in tree.items():
+            assert_array_equal(cache_data[param][name], array)
+            assert cache_data[param][name].dtype == array.dtype
+
+
+@pytest.mark.usefixtures("experiment")
+def test_cache_reads_new_rows_from_db(meas_with_array_param):
+    meas, x, y, signal = meas_with_array_param
+
+    with meas.run() as datasaver:
+        reader = load_by_id(datasaver.run_id)
+        assert reader.cache.data() == {'y': {}, 'signal': {}}
+
+        for i in range(4):
+            datasaver.add_result((x, i), (y, i / 2))
+            datasaver.add_result((x, i), (signal, np.arange(3) * i))
+            datasaver.flush_data_to_database()
+
+            data = reader.cache.data()
+            assert reader.cache._last_read_rowid == 2 * (i + 1)
+            assert not reader.cache.live
+            assert_cache_equals_data(data, reader.get_parameter_data())
+
+    assert_cache_equals_data(reader.cache.data(),
+                             reader.get_parameter_data())
+    assert reader.cache._loaded_completed
+
+
+@pytest.mark.usefixtures("experiment")
+@pytest.mark.parametrize("write_in_background", [False, True])
+def test_cache_fed_by_datasaver(meas_with_array_param, write_in_background):
+    meas, x, y, signal = meas_with_array_param
+
+    with meas.run(write_in_background=write_in_background,
+                  in_memory_cache=True) as datasaver:
+        for i in range(4):
+            datasaver.add_result((x, i), (y, i / 2))
+            datasaver.add_result((x, i), (signal, np.arange(3) * i))
+            datasaver.flush_data_to_database()
+        datasaver.add_result_columns((x, np.arange(4, 10)),
+                                     (y, np.arange(4, 10) / 2))
+        assert datasaver.dataset.cache.live
+
+    dataset = datasaver.dataset
+    assert_cache_equals_data(dataset.cache.data(),
+                             dataset.get_parameter_data())
+    assert dataset.cache._last_read_rowid == 0
+
+
+def test_growable_array():
+    array = _GrowableArray()
+    assert len(array.view()) == 0
+
+    array.append(np.arange(10))
+    first = array.view()
+    array.append(np.arange(100))
+    assert_array_equal(first, np.arange(10))
+    assert len(array) == 110
+
+    # the dtype is promoted as needed
+    array.append(np.array([0.5]))
+    assert array.view().dtype == np.float64
+    assert array.view()[-1] == 0.5
+
+    # rows of different shapes are stored as an array of arrays
+    ragged = _GrowableArray()
+    ragged.append(np.ones((2, 3)))
+    ragged.append(np.ones((1, 4)))
+    assert ragged.view().dtype == object
+    assert [row.shape for row in ragged.view()] == [(3,), (3,), (4,)]
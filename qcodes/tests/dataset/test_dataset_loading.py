@@ -1,9 +1,12 @@
 
 import time
 from math import floor
+from threading import Thread
 
 import pytest
 
+import qcodes as qc
+
 from qcodes.dataset.data_set import (DataSet,
                                      new_data_set,
                                      load_by_guid,
@@ -12,7 +15,14 @@ from qcodes.dataset.data_set import (DataSet,
 from qcodes.dataset.descriptions.param_spec import ParamSpecBase
 from qcodes.dataset.descriptions.dependencies import InterDependencies_
 from qcodes.dataset.data_export import get_data_by_id
-from qcodes.dataset.experiment_container import new_experiment
+from qcodes.dataset.experiment_container import new_experiment, \
+    experiments, load_experiment
+from qcodes.dataset.sqlite.database import close_pooled_connections, connect, \
+    get_pooled_connection, invalidate_pooled_connections
+from qcodes.dataset.sqlite.queries import update_run_description
+from qcodes.dataset.sqlite.run_cache import invalidate_run_caches, \
+    run_cache_info
+import qcodes.dataset.descriptions.versioning.serialization as serial
 # pylint: disable=unused-import
 from qcodes.tests.dataset.temporary_databases import (empty_temp_db,
                                                       experiment, dataset)
@@ -223,3 +233,151 @@ def test_load_by_guid(some_interdeps):
     loaded_ds = load_by_guid(ds.guid)
 
     assert loaded_ds.the_same_dataset_as(ds)
+
+
+@pytest.fixture
+def empty_pool():
+    close_pooled_connections()
+    yield
+    close_pooled_connections()
+
+
+@pytest.mark.usefixtures("experiment", "empty_pool")
+def test_load_functions_share_pooled_connection():
+    ds = new_data_set("test-dataset")
+    ds.mark_started()
+    ds.mark_completed()
+
+    loaded_by_id = load_by_id(ds.run_id)
+    loaded_by_guid = load_by_guid(ds.guid)
+    loaded_by_counter = load_by_counter(1, 1)
+    conn = loaded_by_id.conn
+    assert loaded_by_guid.conn is conn
+    assert loaded_by_counter.conn is conn
+    assert load_experiment(1).conn is conn
+    assert all(exp.conn is conn for exp in experiments())
+
+    # a closed pooled connection is replaced by a new one
+    conn.close()
+    new_conn = load_by_id(ds.run_id).conn
+    assert new_conn is not conn
+    assert load_by_id(ds.run_id).conn is new_conn
+
+    invalidate_pooled_connections(qc.config["core"]["db_location"])
+    assert load_by_id(ds.run_id).conn is not new_conn
+
+    # objects holding a closed pooled connection get a new one
+    close_pooled_connections()
+    assert loaded_by_id.conn.execute('SELECT 1').fetchone()[0] == 1
+    assert loaded_by_id.conn is load_by_id(ds.run_id).conn
+
+
+@pytest.mark.usefixtures("experiment", "empty_pool")
+def test_closing_shared_pooled_connection():
+    datasets = []
+    for value in range(2):
+        ds = new_data_set("test-dataset")
+        ds.set_interdependencies(InterDependencies_(
+            standalones=(ParamSpecBase('x', 'numeric'),)))
+        ds.mark_started()
+        ds.add_results([{'x': value}])
+        ds.mark_completed()
+        datasets.append(ds)
+
+    a, b = load_by_id(datasets[0].run_id), load_by_id(datasets[1].run_id)
+    exp = load_experiment(1)
+    assert a.conn is b.conn
+    a.conn.close()
+    assert b.get_parameter_data()['x']['x'] == [1]
+    assert a.get_parameter_data()['x']['x'] == [0]
+    assert exp.name == 'test-experiment'
+
+
+@pytest.mark.usefixtures("empty_temp_db", "empty_pool")
+def test_pooled_connections_per_thread():
+    conn = get_pooled_connection()
+    assert get_pooled_connection() is conn
+
+    thread_conns = []
+    thread = Thread(target=lambda: thread_conns.append(
+        get_pooled_connection()))
+    thread.start()
+    thread.join()
+    assert thread_conns[0] is not conn
+
+
+@pytest.mark.usefixtures("empty_temp_db", "empty_pool")
+def test_connection_pool_size(tmp_path):
+    paths = [str(tmp_path / f'{i}.db') for i in range(3)]
+    old_size = qc.config["core"]["db_connection_pool_size"]
+    try:
+        qc.config["core"]["db_connection_pool_size"] = 2
+        conns = [get_pooled_connection(path) for path in paths]
+        # the least recently used connection was removed from the pool
+        assert get_pooled_connection(paths[2]) is conns[2]
+        assert get_pooled_connection(paths[1]) is conns[1]
+        assert get_pooled_connection(paths[0]) is not conns[0]
+        # removed connections are closed
+        with pytest.raises(Exception, match='closed database'):
+            conns[0].execute('SELECT 1')
+
+        qc.config["core"]["db_connection_pool_size"] = 0
+        assert get_pooled_connection(paths[0]) is not \
+            get_pooled_connection(paths[0])
+    finally:
+        qc.config["core"]["db_connection_pool_size"] = old_size
+
+
+@pytest.mark.usefixtures("experiment")
+def test_run_cache(some_interdeps):
+    invalidate_run_caches()
+    ds = new_data_set("test-dataset")
+    ds.set_interdependencies(some_interdeps[1])
+    ds.mark_started()
+
+    # runs are only cached once completed; the description of a loaded run
+    # is only looked up when it is first used
+    info = run_cache_info()
+    loaded = load_by_id(ds.run_id)
+    loaded.description
+    assert run_cache_info().currsize == info.currsize == 0
+
+    ds.mark_completed()
+    loaded = load_by_id(ds.run_id)
+    loaded.description
+    info = run_cache_info()
+    assert info.currsize == 1
+
+    loaded = load_by_id(ds.run_id)
+    assert run_cache_info().hits == info.hits
+    assert loaded.description == ds.description
+    assert run_cache_info().hits == info.hits + 1
+
+    new_desc = serial.to_json_for_storage(ds.description)
+    update_run_description(ds.conn, ds.run_id, new_desc)
+    assert run_cache_info().currsize == 0
+
+    loaded.description
+    invalidate_run_caches()
+    assert run_cache_info().currsize == 0
+
+
+@pytest.mark.usefixtures("experiment")
+def test_metadata_of_completed_run_is_not_cached():
+    ds = new_data_set("test-dataset")
+    ds.mark_started()
+    ds.add_metadata('tag', 'value')
+    ds.mark_completed()
+    assert load_by_id(ds.run_id).metadata == {'tag': 'value'}
+
+    # metadata added to the completed run, also through another connection
+    # (as by another process), is seen by runs loaded afterwards
+    ds.add_metadata('tag', 'new value')
+    assert load_by_id(ds.run_id).metadata == {'tag': 'new value'}
+    other_conn = connect(ds.path_to_db)
+    try:
+        load_by_id(ds.run_id, conn=other_conn).add_metadata('other', 1)
+    finally:
+        other_conn.close()
+    assert load_by_id(ds.run_id).metadata == {'tag': 'new value',
+                                              'other': 1}
@@ -117,3 +117,25 @@ def test_dictization_of_version_1(some_interdeps):
         assert ser['version'] == 1
         assert ser['interdependencies'] == idps._to_dict()
         assert len(ser.keys()) == 2
+
+
+def test_shapes_roundtrip(some_interdeps):
+    idps = some_interdeps[0]
+    name = idps.names[0]
+    desc = RunDescriber(idps, shapes={name: [10, 20]})
+    assert desc.shapes == {name: (10, 20)}
+    assert desc != RunDescriber(idps)
+
+    ser = desc._to_dict()
+    assert ser['shapes'] == {name: (10, 20)}
+    assert RunDescriber._from_dict(ser) == desc
+
+    # the shapes are stored next to the version 0 description, which older
+    # versions of QCoDeS can still read
+    json_str = serial.to_json_for_storage(desc)
+    stored = json.loads(json_str)
+    assert stored['version'] == serial.STORAGE_VERSION
+    assert stored['shapes'] == {name: [10, 20]}
+    assert serial.from_json_to_current(json_str) == desc
+
+    assert 'shapes' not in serial.to_dict_for_storage(RunDescriber(idps))
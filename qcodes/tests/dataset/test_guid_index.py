@@ -0,0 +1,88 @@
+import pytest
+
+from qcodes.dataset.data_set import new_data_set
+from qcodes.dataset.experiment_container import new_experiment
+from qcodes.dataset.guid_index import GUIDResolver, RunLocation
+from qcodes.dataset.sqlite.connection import atomic_transaction
+from qcodes.dataset.sqlite.database import connect
+from qcodes.dataset.sqlite.queries import get_runids_from_guids
+
+
+def _new_runs(conn, n_runs):
+    exp = new_experiment('exp', sample_name='sample', conn=conn)
+    return [new_data_set('run', exp_id=exp.exp_id, conn=conn)
+            for _ in range(n_runs)]
+
+
+@pytest.fixture
+def databases(tmp_path):
+    conns = [connect(str(tmp_path / f'db_{i}.db')) for i in range(2)]
+    try:
+        yield conns
+    finally:
+        for conn in conns:
+            conn.close()
+
+
+def test_get_runids_from_guids(databases, tmp_path):
+    conn = databases[0]
+    datasets = _new_runs(conn, 3)
+    guids = [datasets[2].guid, 'not a guid', datasets[0].guid,
+             datasets[2].guid]
+
+    assert get_runids_from_guids(conn, guids) == [3, -1, 1, 3]
+    assert get_runids_from_guids(conn, []) == []
+
+    read_only_conn = connect(str(tmp_path / 'db_0.db'), read_only=True)
+    try:
+        assert get_runids_from_guids(read_only_conn, guids) == [3, -1, 1, 3]
+    finally:
+        read_only_conn.close()
+
+    atomic_transaction(conn, 'UPDATE runs SET guid = ? WHERE run_id = 2',
+                       datasets[0].guid)
+    with pytest.raises(RuntimeError, match='multiple runs with the same GUID'):
+        get_runids_from_guids(conn, guids)
+
+
+def test_resolver_across_databases(databases, tmp_path):
+    paths = [conn.path_to_dbfile for conn in databases]
+    first = _new_runs(databases[0], 2)
+    second = _new_runs(databases[1], 1)
+    index_path = str(tmp_path / 'index.db')
+
+    with GUIDResolver(index_path, paths) as resolver:
+        assert resolver.databases == paths
+        locations = resolver.resolve([first[1].guid, second[0].guid,
+                                      'not a guid'])
+    assert locations == {first[1].guid: [RunLocation(paths[0], 2)],
+                         second[0].guid: [RunLocation(paths[1], 1)],
+                         'not a guid': []}
+
+    # the databases are remembered and new runs are indexed incrementally
+    new = _new_runs(databases[1], 1)[0]
+    with GUIDResolver(index_path) as resolver:
+        assert resolver.resolve([new.guid]) == {
+            new.guid: [RunLocation(paths[1], 2)]}
+        assert resolver.resolve([first[0].guid], refresh=False) == {
+            first[0].guid: [RunLocation(paths[0], 1)]}
+
+        # a run found in several databases
+        atomic_transaction(databases[1], 'UPDATE runs SET guid = ? '
+                                         'WHERE run_id = 2', first[0].guid)
+        assert resolver.resolve([first[0].guid]) == {
+            first[0].guid: [RunLocation(paths[0], 1),
+                            RunLocation(paths[1], 2)]}
+
+        # changes to the GUIDs of earlier runs need a full refresh
+        atomic_transaction(databases[0], 'UPDATE runs SET guid = ? '
+                                         'WHERE run_id = 1', 'changed')
+        resolver.refresh()
+        assert len(resolver.resolve(['changed'])['changed']) == 0
+        resolver.refresh(full=True)
+        assert resolver.resolve(['changed'], refresh=False) == {
+            'changed': [RunLocation(paths[0], 1)]}
+
+        resolver.remove_database(paths[0])
+        assert resolver.databases == [paths[1]]
+        assert resolver.resolve(['changed']) == {'changed': []}
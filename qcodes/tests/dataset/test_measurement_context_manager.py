@@ -2,6 +2,7 @@ import re
 import os
 from time import sleep
 import json
+from unittest.mock import patch
 
 import pytest
 from hypothesis import given, settings
@@ -21,7 +22,7 @@ from qcodes.tests.instrument_mocks import DummyInstrument, \
 from qcodes.dataset.descriptions.param_spec import ParamSpecBase
 from qcodes.instrument.parameter import ArrayParameter, Parameter, ParameterWithSetpoints
 from qcodes.dataset.legacy_import import import_dat_file
-from qcodes.dataset.data_set import load_by_id
+from qcodes.dataset.data_set import load_by_id, DataSet
 from qcodes.instrument.parameter import expand_setpoints_helper
 from qcodes.utils.validators import Arrays, ComplexNumbers, Numbers
 # pylint: disable=unused-import
@@ -1821,6 +1822,95 @@ def test_datasaver_arrays_of_different_length(storage_type, Ns):
         assert (data[f'signal{n}']['temperature'] == np.array([70]*(Ns[n]))).all()
 
 
+@pytest.mark.usefixtures("experiment")
+def test_datasaver_add_result_columns():
+    meas = Measurement()
+    x = qc.ManualParameter('x')
+    y = qc.ManualParameter('y')
+    meas.register_parameter(x)
+    meas.register_parameter(y, setpoints=(x,))
+    meas.register_custom_parameter('spectrum', paramtype='array',
+                                   setpoints=(x,))
+
+    xs = np.linspace(0, 1, 11)
+    ys = np.random.rand(11)
+    spectra = np.random.rand(3, 5)
+
+    with meas.run() as datasaver:
+        datasaver.add_result((x, -1), (y, -2))
+        datasaver.add_result_columns((x, xs), (y, ys))
+        datasaver.add_result_columns((x, 0.5), ('spectrum', spectra))
+
+        with pytest.raises(ValueError, match='different lengths'):
+            datasaver.add_result_columns((x, xs), (y, ys[:-1]))
+        with pytest.raises(ValueError, match='some required parameters'):
+            datasaver.add_result_columns((y, ys))
+        with pytest.raises(ValueError, match='type'):
+            datasaver.add_result_columns((x, xs),
+                                         (y, np.array(['a']*len(xs))))
+
+    assert datasaver.points_written == 1 + len(xs) + len(spectra)
+
+    data = datasaver.dataset.get_parameter_data()
+    assert_allclose(data['y']['x'], np.concatenate([[-1], xs]))
+    assert_allclose(data['y']['y'], np.concatenate([[-2], ys]))
+    assert_allclose(data['spectrum']['spectrum'], spectra)
+    assert_allclose(data['spectrum']['x'], np.full_like(spectra, 0.5))
+
+
+@pytest.mark.usefixtures("experiment")
+def test_datasaver_write_in_background(DAC, DMM):
+    meas = Measurement()
+    meas.register_parameter(DAC.ch1)
+    meas.register_parameter(DMM.v1, setpoints=(DAC.ch1,))
+    meas.write_period = 0.001
+
+    collected = []
+
+    def collect(results, length, state):
+        state += results
+
+    meas.add_subscriber(collect, state=collected)
+
+    xs = np.linspace(0, 1, 100)
+    with meas.run(write_in_background=True) as datasaver:
+        assert datasaver._writer.is_alive()
+        for x in xs:
+            datasaver.add_result((DAC.ch1, x), (DMM.v1, 2*x))
+        datasaver.add_result_columns((DAC.ch1, xs), (DMM.v1, 3*xs))
+
+    assert not datasaver._writer.is_alive()
+    assert datasaver.points_written == 2*len(xs)
+    data = datasaver.dataset.get_parameter_data()
+    assert_allclose(data['dummy_dmm_v1']['dummy_dac_ch1'],
+                    np.concatenate([xs, xs]))
+    assert_allclose(data['dummy_dmm_v1']['dummy_dmm_v1'],
+                    np.concatenate([2*xs, 3*xs]))
+    assert len(collected) == 2*len(xs)
+
+
+@pytest.mark.usefixtures("experiment")
+def test_datasaver_write_in_background_raises(DAC, DMM):
+    meas = Measurement()
+    meas.register_parameter(DAC.ch1)
+    meas.register_parameter(DMM.v1, setpoints=(DAC.ch1,))
+
+    with patch.object(DataSet, 'add_results',
+                      side_effect=ValueError('Write failed')):
+        with pytest.raises(RuntimeError, match='in the background failed'):
+            with meas.run(write_in_background=True) as datasaver:
+                datasaver.add_result((DAC.ch1, 1), (DMM.v1, 2))
+                datasaver.flush_data_to_database()
+                datasaver._writer.queue.join()
+                with pytest.raises(RuntimeError,
+                                   match='in the background failed'):
+                    datasaver.add_result((DAC.ch1, 1), (DMM.v1, 2))
+
+    assert not datasaver._writer.is_alive()
+    assert datasaver.dataset.completed
+    assert isinstance(datasaver._writer.error, ValueError)
+
+
 @pytest.mark.usefixtures("experiment")
 def test_save_complex_num(complex_num_instrument):
     """
@@ -2073,3 +2163,70 @@ def test_load_legacy_files_1D():
     assert sorted(list(snapshot.keys())) == ['__class__', 'arrays',
                                              'formatter', 'io', 'location',
                                              'loop', 'station']
+
+
+@pytest.mark.usefixtures("experiment")
+def test_set_shapes(DAC, DMM):
+    meas = Measurement()
+    meas.register_parameter(DAC.ch1)
+    meas.register_parameter(DAC.ch2)
+    meas.register_parameter(DMM.v1, setpoints=(DAC.ch1, DAC.ch2))
+
+    with pytest.raises(ValueError, match='not registered'):
+        meas.set_shapes({DMM.v2: (2, 3)})
+    with pytest.raises(ValueError, match='Invalid shape'):
+        meas.set_shapes({DMM.v1: (2, 0)})
+
+    meas.set_shapes({DMM.v1: (3, 4)})
+    xs = np.arange(3)
+    ys = np.arange(4) * 0.5
+
+    # a complete run
+    with meas.run() as datasaver:
+        for x in xs:
+            for y in ys:
+                datasaver.add_result((DAC.ch1, x), (DAC.ch2, y),
+                                     (DMM.v1, x + y))
+
+    ds = load_by_id(datasaver.run_id)
+    assert ds.description.shapes == {'dummy_dmm_v1': (3, 4)}
+    data = ds.get_parameter_data()['dummy_dmm_v1']
+    assert_array_equal(data['dummy_dac_ch1'], np.repeat(xs, 4).reshape(3, 4))
+    assert_array_equal(data['dummy_dac_ch2'], np.tile(ys, 3).reshape(3, 4))
+    assert_array_equal(data['dummy_dmm_v1'],
+                       data['dummy_dac_ch1'] + data['dummy_dac_ch2'])
+    # selecting a range of results returns the flat data
+    assert ds.get_parameter_data(start=1, end=5)[
+        'dummy_dmm_v1']['dummy_dmm_v1'].shape == (5,)
+    assert len(ds.get_data_as_pandas_dataframe()['dummy_dmm_v1']) == 12
+
+    # an interrupted run is filled up with NaN
+    with meas.run() as datasaver:
+        for y in ys:
+            datasaver.add_result((DAC.ch1, 0), (DAC.ch2, y), (DMM.v1, y))
+
+    ds = load_by_id(datasaver.run_id)
+    data = ds.get_parameter_data()['dummy_dmm_v1']['dummy_dmm_v1']
+    assert data.shape == (3, 4)
+    assert_array_equal(data[0], ys)
+    assert np.isnan(data[1:]).all()
+    assert len(ds.get_data_as_pandas_dataframe()['dummy_dmm_v1']) == 4
+
+
+@pytest.mark.usefixtures("experiment")
+def test_set_shapes_of_array_parameter(SpectrumAnalyzer):
+    spectrum = SpectrumAnalyzer.spectrum
+    npts = spectrum.npts
+    meas = Measurement()
+    meas.register_parameter(spectrum, paramtype='array')
+    meas.set_shapes({spectrum: (2, npts)})
+
+    with meas.run() as datasaver:
+        for _ in range(2):
+            datasaver.add_result((spectrum, spectrum.get()))
+
+    data = datasaver.dataset.get_parameter_data()[spectrum.full_name]
+    assert data[spectrum.full_name].shape == (2, npts)
+    freqs = data[spectrum.setpoint_full_names[0]]
+    assert freqs.shape == (2, npts)
+    assert_array_equal(freqs[0], freqs[1])
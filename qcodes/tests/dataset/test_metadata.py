@@ -1,5 +1,8 @@
 import pytest
 
+from qcodes.dataset.data_set import load_by_id
+from qcodes.dataset.sqlite.query_helpers import is_column_in_table
+
 # pylint: disable=unused-import
 from qcodes.tests.dataset.temporary_databases import dataset, experiment, \
     empty_temp_db
@@ -16,3 +19,18 @@ def test_get_nonexisting_metadata(dataset):
     with pytest.raises(RuntimeError) as excinfo:
         _ = dataset.get_metadata('something')
     assert error_caused_by(excinfo, "no such column: something")
+
+
+def test_metadata_stored_per_run_and_tag(dataset):
+    tags = {f'tag_{i}': i for i in range(50)}
+    for tag, value in tags.items():
+        dataset.add_metadata(tag, value)
+    dataset.add_metadata('tag_0', 'updated')
+    dataset.add_metadata('float', 0.5)
+
+    # metadata does not add columns to the runs table
+    assert not is_column_in_table(dataset.conn, 'runs', 'tag_1')
+    loaded = load_by_id(dataset.run_id)
+    assert loaded.metadata == {**tags, 'tag_0': 'updated', 'float': 0.5}
+    assert list(loaded.metadata) == [*tags, 'float']
+    assert loaded.get_metadata('tag_1') == 1
@@ -0,0 +1,90 @@
+import json
+import os
+
+import numpy as np
+from numpy.testing import assert_array_equal
+import pytest
+
+from qcodes.dataset.measurements import Measurement
+from qcodes.dataset.npy_export import (SIDECAR_FILE_NAME, load_from_npy_dir,
+                                       load_npy_dir_attributes)
+from qcodes.instrument.parameter import ManualParameter
+from qcodes.tests.instrument_mocks import ArraySetPointParam
+# pylint: disable=unused-import
+from qcodes.tests.dataset.temporary_databases import (empty_temp_db,
+                                                      experiment)
+
+
+@pytest.mark.usefixtures("experiment")
+def test_export_and_load_from_npy_dir(tmp_path):
+    x = ManualParameter('x', unit='V')
+    y = ManualParameter('y')
+    z = ManualParameter('z', label='signal')
+    w = ManualParameter('w')
+    meas = Measurement()
+    meas.register_parameter(x)
+    meas.register_parameter(y)
+    meas.register_parameter(z, setpoints=(x, y))
+    meas.register_parameter(w, setpoints=(x,))
+    meas.set_shapes({'z': (2, 3)})
+    with meas.run() as datasaver:
+        for x_val in range(2):
+            for y_val in range(3):
+                datasaver.add_result((x, x_val), (y, y_val),
+                                     (z, x_val * y_val))
+            datasaver.add_result((x, x_val), (w, -x_val))
+    dataset = datasaver.dataset
+    dataset.add_metadata('sample_temperature', 0.01)
+
+    path = dataset.export(format='npy', path=str(tmp_path / 'run'))
+    assert os.path.isfile(os.path.join(path, 'z', 'x.npy'))
+
+    loaded = load_from_npy_dir(path)
+    expected = dataset.get_parameter_data()
+    assert sorted(loaded) == sorted(expected) == ['w', 'z']
+    for param, tree in expected.items():
+        assert list(loaded[param]) == list(tree)
+        for name, array in tree.items():
+            assert isinstance(loaded[param][name], np.memmap)
+            assert loaded[param][name].dtype == array.dtype
+            assert_array_equal(loaded[param][name], array)
+    assert loaded['z']['z'].shape == (2, 3)
+    with pytest.raises(ValueError):
+        loaded['w']['w'][0] = 1
+
+    in_memory = load_from_npy_dir(path, mmap_mode=None)
+    assert not isinstance(in_memory['w']['w'], np.memmap)
+
+    attributes = load_npy_dir_attributes(path)
+    assert attributes['guid'] == dataset.guid
+    assert attributes['sample_temperature'] == 0.01
+
+    with open(os.path.join(path, SIDECAR_FILE_NAME)) as f:
+        sidecar = json.load(f)
+    assert sidecar['parameters']['z']['x'] == {
+        'file': 'z/x.npy', 'dtype': loaded['z']['x'].dtype.str,
+        'shape': [2, 3], 'paramtype': 'numeric', 'unit': 'V', 'label': 'x'}
+
+
+@pytest.mark.usefixtures("experiment")
+def test_export_array_parameter_to_npy_dir(tmp_path):
+    array_param = ArraySetPointParam()
+    meas = Measurement()
+    meas.register_parameter(array_param, paramtype='array')
+    with meas.run() as datasaver:
+        for _ in range(3):
+            datasaver.add_result((array_param, array_param.get()))
+    dataset = datasaver.dataset
+
+    path = dataset.export(format='npy', path=str(tmp_path / 'run'))
+
+    loaded = load_from_npy_dir(path)
+    for param, tree in dataset.get_parameter_data().items():
+        for name, array in tree.items():
+            assert loaded[param][name].shape == array.shape
+            assert_array_equal(loaded[param][name], array)
+
+
+def test_load_incomplete_npy_dir(tmp_path):
+    with pytest.raises(FileNotFoundError, match=SIDECAR_FILE_NAME):
+        load_from_npy_dir(str(tmp_path))
@@ -1,4 +1,5 @@
 import numpy as np
+import pytest
 from hypothesis import given, example, assume
 from hypothesis.strategies import text, sampled_from, floats, lists, data, \
     one_of, just
@@ -8,7 +9,10 @@ from qcodes.dataset.plotting import _make_rescaled_ticks_and_units, \
     _ENGINEERING_PREFIXES, _UNITS_FOR_RESCALING
 
 from qcodes.dataset.plotting import (plot_by_id, _appropriate_kwargs,
-    _complex_to_real_preparser)
+    _complex_to_real_preparser, _decimate_envelope, _decimate_scatter,
+    _block_factors, _reduce_blocks)
+from qcodes.dataset.data_export import (reshape_2D_data, get_2D_plottype,
+                                        _grid_from_shape)
 from qcodes.dataset.measurements import Measurement
 from qcodes.tests.instrument_mocks import DummyInstrument
 from qcodes.tests.dataset.temporary_databases import empty_temp_db, experiment
@@ -242,3 +246,114 @@ def test__complex_to_real_preparser_complex_setpoint():
     assert measured_param['label'] == 'measured voltage'
     assert measured_param['unit'] == 'V'
     assert all(measured_param['data'] == np.array([0, 1, 2]))
+
+
+def test_reshape_2D_data_with_shape():
+    # a sweep with a descending outer axis and an ascending inner axis
+    xs = np.linspace(1, 0, 4)
+    ys = np.array([-2., -1., 0.5])
+    x = np.repeat(xs, len(ys))
+    y = np.tile(ys, len(xs))
+    z = x * 10 + y
+
+    expected = reshape_2D_data(x, y, z)
+    for actual, wanted in zip(reshape_2D_data(x, y, z, (4, 3)), expected):
+        assert np.array_equal(actual, wanted)
+    # the inner axis of the sweep is the x axis
+    xrow, yrow, z_grid = reshape_2D_data(y, x, z, (4, 3))
+    assert np.array_equal(xrow, expected[1])
+    assert np.array_equal(yrow, expected[0])
+    assert np.array_equal(z_grid, expected[2].T)
+
+    assert get_2D_plottype(x, y, z, (4, 3)) == '2D_grid'
+    # incomplete data is not on the grid of the shape
+    assert _grid_from_shape(x[:-1], y[:-1], z[:-1], (4, 3)) is None
+    assert _grid_from_shape(x, y, z, (3, 4)) is None
+
+
+def test_decimate_envelope():
+    x = np.arange(10000)
+    y = np.sin(x / 1000)
+    y[1234] = 10
+    y[5678] = -10
+    y[4000:4010] = np.nan
+
+    x_dec, y_dec = _decimate_envelope(x, y, 100)
+    assert len(y_dec) <= 100
+    # the spikes and the overall envelope are kept
+    assert 1234 in x_dec and 5678 in x_dec
+    assert np.nanmax(y_dec) == 10 and np.nanmin(y_dec) == -10
+    assert np.all(np.diff(x_dec) > 0)
+    assert np.array_equal(y_dec, y[x_dec])
+
+    assert _decimate_envelope(x, y, 10000)[1] is y
+
+
+@pytest.mark.parametrize('max_points', [2, 3, 5, 7, 99, 101])
+def test_decimate_envelope_to_small_limits(max_points):
+    x = np.arange(1000)
+    y = np.cos(x / 10)
+    x_dec, y_dec = _decimate_envelope(x, y, max_points)
+    assert 2 <= len(y_dec) <= max_points
+    assert np.array_equal(y_dec, y[x_dec])
+
+
+def test_decimate_grid_and_scatter():
+    assert _block_factors(2000, 1000, 20000) == (10, 10)
+    assert _block_factors(2000, 1000, (100, 100)) == (20, 10)
+    assert _block_factors(5, 3, 15) == (1, 1)
+    assert _block_factors(1000, 2, 10) == (100, 2)
+    assert _block_factors(10**6, 2, 10) == (10**5, 2)
+
+    z = np.arange(20.).reshape(4, 5)
+    z[0, 0] = np.nan
+    reduced = _reduce_blocks(z, 2, 2)
+    assert reduced.shape == (2, 3)
+    assert reduced[0, 0] == np.mean([1, 5, 6])
+    assert reduced[1, 2] == np.mean([14, 19])
+    assert np.array_equal(_reduce_blocks(z, 2, 2, average=False),
+                          z[::2, ::2], equal_nan=True)
+
+    rng = np.random.RandomState(0)
+    x, y = rng.rand(2, 10000)
+    x_dec, y_dec, z_dec = _decimate_scatter(x, y, x + y, (10, 20))
+    assert 150 < len(z_dec) <= 200
+    assert np.array_equal(z_dec, x_dec + y_dec)
+
+
+def test_plot_by_id_max_points(experiment, request):
+    inst = DummyInstrument('dummy', gates=['s1', 'm1', 's2', 'm2'])
+    request.addfinalizer(inst.close)
+
+    meas = Measurement()
+    meas.register_parameter(inst.s1)
+    meas.register_parameter(inst.s2)
+    meas.register_parameter(inst.m2, setpoints=(inst.s1, inst.s2))
+    meas.register_parameter(inst.m1, setpoints=(inst.s1,))
+    meas.set_shapes({inst.m2.full_name: (100, 50)})
+
+    xs = np.arange(100)
+    ys = np.arange(50)
+    with meas.run() as datasaver:
+        datasaver.add_result((inst.s1, np.arange(5000)),
+                             (inst.m1, np.random.randn(5000)))
+        datasaver.add_result((inst.s1, np.repeat(xs, len(ys))),
+                             (inst.s2, np.tile(ys, len(xs))),
+                             (inst.m2, np.random.randn(len(xs) * len(ys))))
+
+    (ax_2d, ax_1d), _ = plot_by_id(datasaver.run_id, max_points=1000)
+    assert len(ax_1d.lines[0].get_xdata()) <= 1000
+    assert ax_2d.collections[0].get_array().size <= 1000
+
+    (ax_2d, ax_1d), _ = plot_by_id(datasaver.run_id, max_points='auto',
+                                   figsize=(2, 2), dpi=50)
+    assert len(ax_1d.lines[0].get_xdata()) <= 2 * 100
+    assert ax_2d.collections[0].get_array().size <= 100 * 100
+
+    (ax_2d, ax_1d), _ = plot_by_id(datasaver.run_id)
+    assert len(ax_1d.lines[0].get_xdata()) == 5000
+    assert ax_2d.collections[0].get_array().size == 5000
+
+    for max_points in (0, 1):
+        with pytest.raises(ValueError, match='Invalid max_points'):
+            plot_by_id(datasaver.run_id, max_points=max_points)
@@ -0,0 +1,138 @@
+import os
+
+import numpy as np
+from numpy.testing import assert_array_equal
+import pytest
+
+import qcodes as qc
+from qcodes.dataset.data_set import load_by_guid, load_by_id
+from qcodes.dataset.database_extract_runs import (extract_runs_into_db,
+                                                  bulk_extract_runs_into_db)
+from qcodes.dataset.measurements import Measurement
+from qcodes.dataset.sqlite.database import connect, get_DB_location
+from qcodes.dataset.sqlite.run_shards import (MAX_ATTACHED_SHARDS,
+                                              run_shard_path)
+from qcodes.instrument.parameter import ManualParameter
+# pylint: disable=unused-import
+from qcodes.tests.dataset.temporary_databases import (empty_temp_db,
+                                                      experiment)
+
+
+@pytest.fixture
+def run_shards():
+    qc.config["core"]["db_run_shards"] = True
+    try:
+        yield
+    finally:
+        qc.config["core"]["db_run_shards"] = False
+
+
+def _measure(n_points, factor, **run_kwargs):
+    x = ManualParameter('x')
+    y = ManualParameter('y')
+    meas = Measurement()
+    meas.register_parameter(x)
+    meas.register_parameter(y, setpoints=(x,))
+    with meas.run(**run_kwargs) as datasaver:
+        for value in range(n_points):
+            datasaver.add_result((x, value), (y, factor * value))
+    return datasaver.dataset
+
+
+@pytest.mark.usefixtures("experiment", "run_shards")
+def test_results_stored_in_shards():
+    datasets = [_measure(5, factor) for factor in range(MAX_ATTACHED_SHARDS
+                                                        + 3)]
+
+    for dataset in datasets:
+        assert os.path.exists(run_shard_path(get_DB_location(),
+                                             dataset.guid))
+    # the central database does not hold the results tables
+    conn = datasets[0].conn
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM main.sqlite_master WHERE type='table'")]
+    assert not any(table.startswith('results') for table in tables)
+
+    # more runs than can be attached at the same time are read, with the
+    # least recently used shards being detached
+    for factor, dataset in enumerate(datasets):
+        loaded = load_by_guid(dataset.guid)
+        assert_array_equal(loaded.get_parameter_data('y')['y']['y'],
+                           factor * np.arange(5))
+    assert len(conn.attached_run_shards) <= MAX_ATTACHED_SHARDS
+
+    # runs with and without shards can be read regardless of the setting
+    qc.config["core"]["db_run_shards"] = False
+    unsharded = _measure(3, 1, write_in_background=True)
+    assert not os.path.exists(run_shard_path(get_DB_location(),
+                                             unsharded.guid))
+    assert_array_equal(load_by_id(unsharded.run_id)
+                       .get_parameter_data('y')['y']['y'], np.arange(3))
+    assert_array_equal(load_by_id(datasets[0].run_id)
+                       .get_parameter_data('y')['y']['y'], np.zeros(5))
+
+    # shards are attached read-only to read-only connections
+    reader = connect(get_DB_location(), read_only=True)
+    assert_array_equal(load_by_id(datasets[1].run_id, conn=reader)
+                       .get_parameter_data('y')['y']['y'], np.arange(5))
+    reader.close()
+
+
+@pytest.mark.usefixtures("experiment", "run_shards")
+def test_interleaved_reads_of_more_runs_than_attached_shards():
+    datasets = [_measure(20, factor) for factor in range(MAX_ATTACHED_SHARDS
+                                                        + 3)]
+    loaded = [load_by_id(dataset.run_id) for dataset in datasets]
+
+    # the shard of the first run is detached while its chunks are read
+    chunks = loaded[0].iter_parameter_data('y', chunk_size=10)
+    assert_array_equal(next(chunks)['y']['y'], np.zeros(10))
+    for factor, dataset in enumerate(loaded[1:], start=1):
+        assert_array_equal(dataset.get_parameter_data('y')['y']['y'],
+                           factor * np.arange(20))
+    assert_array_equal(next(chunks)['y']['y'], np.zeros(10))
+
+    # the same for the caches, which are read incrementally
+    for dataset in loaded:
+        dataset.cache.data()
+    for factor, dataset in enumerate(loaded):
+        assert_array_equal(dataset.cache.data()['y']['y'],
+                           factor * np.arange(20))
+
+
+@pytest.mark.usefixtures("experiment", "run_shards")
+def test_trigger_subscriber_on_sharded_run():
+    x = ManualParameter('x')
+    y = ManualParameter('y')
+    meas = Measurement()
+    meas.register_parameter(x)
+    meas.register_parameter(y, setpoints=(x,))
+    results = []
+    with meas.run() as datasaver:
+        datasaver.dataset.subscribe(
+            lambda rows, length, state: results.extend(rows),
+            use_trigger=True)
+        for value in range(3):
+            datasaver.add_result((x, value), (y, 2 * value))
+    assert results == [(0, 0), (1, 2), (2, 4)]
+
+
+@pytest.mark.usefixtures("experiment", "run_shards")
+@pytest.mark.parametrize("bulk", [False, True])
+def test_extract_sharded_runs(tmp_path, bulk):
+    datasets = [_measure(4, factor) for factor in range(3)]
+    run_ids = [dataset.run_id for dataset in datasets]
+    target_path = str(tmp_path / 'target.db')
+
+    if bulk:
+        bulk_extract_runs_into_db(get_DB_location(), target_path, *run_ids,
+                                  show_progress=False)
+    else:
+        extract_runs_into_db(get_DB_location(), target_path, *run_ids)
+
+    target_conn = connect(target_path)
+    for factor, dataset in enumerate(datasets):
+        target = load_by_guid(dataset.guid, conn=target_conn)
+        assert_array_equal(target.get_parameter_data('y')['y']['y'],
+                           factor * np.arange(4))
+    target_conn.close()
@@ -0,0 +1,178 @@
+import json
+
+import pytest
+
+import qcodes as qc
+from qcodes.dataset.data_set import load_by_id, new_data_set
+from qcodes.dataset.database_extract_runs import extract_runs_into_db
+from qcodes.dataset.descriptions.dependencies import InterDependencies_
+from qcodes.dataset.measurements import DataSaver
+from qcodes.dataset.sqlite.database import connect, get_DB_location
+from qcodes.dataset.sqlite.snapshot_store import MAX_DELTA_CHAIN_LENGTH
+from qcodes.utils.metadata import diff_param_values_by_id
+# pylint: disable=unused-import
+from qcodes.tests.dataset.temporary_databases import (empty_temp_db,
+                                                      experiment)
+
+
+@pytest.fixture(params=['zlib', 'lzma'])
+def snapshot_compression(request):
+    qc.config["core"]["db_snapshot_compression"] = request.param
+    try:
+        yield request.param
+    finally:
+        qc.config["core"]["db_snapshot_compression"] = None
+
+
+def _station_snapshot(voltage, n_instruments=5):
+    instruments = {
+        f'dac{i}': {
+            'name': f'dac{i}',
+            'parameters': {
+                f'ch{j}': {'name': f'ch{j}', 'unit': 'V',
+                           'value': voltage if (i, j) == (0, 0) else 0.5}
+                for j in range(10)}}
+        for i in range(n_instruments)}
+    return json.dumps({'station': {'instruments': instruments,
+                                   'parameters': {}}})
+
+
+def _run_with_snapshot(snapshot):
+    dataset = new_data_set('run')
+    dataset.mark_started()
+    dataset.add_snapshot(snapshot)
+    dataset.mark_completed()
+    return dataset
+
+
+def _snapshot_rows(conn):
+    return conn.execute('SELECT snapshot_id, base_id, chain_length '
+                        'FROM snapshots ORDER BY snapshot_id').fetchall()
+
+
+@pytest.mark.usefixtures("experiment", "snapshot_compression")
+def test_snapshots_deduplicated_and_stored_as_deltas():
+    snapshots = [_station_snapshot(0.1), _station_snapshot(0.1),
+                 _station_snapshot(0.2), 'not JSON', _station_snapshot(0.3)]
+    datasets = [_run_with_snapshot(snapshot) for snapshot in snapshots]
+
+    for dataset, snapshot in zip(datasets, snapshots):
+        loaded = load_by_id(dataset.run_id)
+        assert loaded.snapshot_raw == snapshot
+        assert 'snapshot_id' not in loaded.metadata
+    assert datasets[0].snapshot == json.loads(snapshots[0])
+
+    rows = _snapshot_rows(datasets[0].conn)
+    # the identical snapshot is stored once, the changed one as a delta and
+    # anything that can not be diffed fully
+    assert [tuple(row) for row in rows] == [(1, None, 0), (2, 1, 1),
+                                            (3, None, 0), (4, None, 0)]
+    assert datasets[0].conn.execute(
+        'SELECT COUNT(*) FROM runs WHERE snapshot IS NOT NULL'
+    ).fetchone()[0] == 0
+
+    diff = diff_param_values_by_id(datasets[0].run_id, datasets[2].run_id)
+    assert diff.changed == {('dac0', 'ch0'): (0.1, 0.2)}
+
+
+@pytest.mark.usefixtures("experiment", "snapshot_compression")
+def test_delta_chain_length_is_limited():
+    snapshots = [_station_snapshot(value, n_instruments=2)
+                 for value in range(MAX_DELTA_CHAIN_LENGTH + 2)]
+    datasets = [_run_with_snapshot(snapshot) for snapshot in snapshots]
+
+    chain_lengths = [row['chain_length']
+                     for row in _snapshot_rows(datasets[0].conn)]
+    assert chain_lengths == list(range(MAX_DELTA_CHAIN_LENGTH + 1)) + [0]
+    for dataset, snapshot in zip(datasets, snapshots):
+        assert load_by_id(dataset.run_id).snapshot_raw == snapshot
+
+
+@pytest.mark.usefixtures("experiment")
+def test_switching_snapshot_storage(tmp_path):
+    plain = _run_with_snapshot(_station_snapshot(0.1))
+    qc.config["core"]["db_snapshot_compression"] = 'zlib'
+    try:
+        compressed = _run_with_snapshot(_station_snapshot(0.2))
+        extract_runs_into_db(get_DB_location(), str(tmp_path / 'target.db'),
+                             plain.run_id, compressed.run_id)
+    finally:
+        qc.config["core"]["db_snapshot_compression"] = None
+    # overwriting a compressed snapshot with the compression disabled
+    compressed.add_snapshot(_station_snapshot(0.3), overwrite=True)
+
+    assert plain.snapshot_raw == _station_snapshot(0.1)
+    assert compressed.snapshot_raw == _station_snapshot(0.3)
+
+    target_conn = connect(str(tmp_path / 'target.db'))
+    assert [load_by_id(run_id, conn=target_conn).snapshot_raw
+            for run_id in (1, 2)] == [_station_snapshot(0.1),
+                                      _station_snapshot(0.2)]
+    assert len(_snapshot_rows(target_conn)) == 2
+    target_conn.close()
+
+
+@pytest.mark.usefixtures("experiment")
+def test_unknown_snapshot_compression():
+    qc.config["core"]["db_snapshot_compression"] = 'gzip'
+    try:
+        with pytest.raises(ValueError, match='Unknown snapshot compression'):
+            _run_with_snapshot(_station_snapshot(0.1))
+    finally:
+        qc.config["core"]["db_snapshot_compression"] = None
+
+
+@pytest.mark.usefixtures("experiment", "snapshot_compression")
+def test_snapshot_get():
+    base = json.loads(_station_snapshot(0.1))
+    changed = json.loads(_station_snapshot(0.2))
+    dac1 = changed['station']['instruments']['dac1']
+    dac1['parameters']['ch0']['unit'] = 'mV'
+    del dac1['parameters']['ch1']
+    changed['station']['instruments']['dac9'] = {'name': 'dac9'}
+    datasets = [_run_with_snapshot(json.dumps(snapshot))
+                for snapshot in (base, changed)]
+    # the second snapshot is stored as a delta against the first one
+    assert _snapshot_rows(datasets[0].conn)[1]['base_id'] == 1
+
+    dataset = load_by_id(datasets[1].run_id)
+    for path in ['station.instruments.dac0.parameters.ch0.value',
+                 'station.instruments.dac1.parameters.ch0',
+                 'station.instruments.dac1.parameters.ch2.value',
+                 'station.instruments.dac9',
+                 'station.instruments.dac2',
+                 'station.instruments.dac1.parameters']:
+        entry = changed
+        for key in path.split('.'):
+            entry = entry[key]
+        assert dataset.snapshot_get(path) == entry
+    for path in ['station.instruments.dac1.parameters.ch1',
+                 'station.instruments.dac9.parameters',
+                 'station.instruments.dac0.parameters.ch0.value.x']:
+        assert dataset.snapshot_get(path, 'missing') == 'missing'
+
+
+@pytest.mark.usefixtures("experiment", "snapshot_compression")
+def test_snapshot_metadata_of_compressed_snapshot():
+    snapshot = _station_snapshot(0.1)
+    dataset = new_data_set('run')
+    dataset.add_snapshot(snapshot)
+    assert dataset.get_metadata('snapshot') == snapshot
+
+    callback_snapshots = []
+
+    def callback(results, length, state, run_id, snapshot):
+        callback_snapshots.append(snapshot)
+
+    DataSaver.default_callback = {
+        'run_tables_subscription_callback': callback,
+        'run_tables_subscription_min_wait': 0,
+        'run_tables_subscription_min_count': 1}
+    try:
+        DataSaver(dataset=dataset, write_period=0,
+                  interdeps=InterDependencies_())
+        dataset.mark_started()
+        dataset.mark_completed()
+    finally:
+        DataSaver.default_callback = None
+    assert callback_snapshots and set(callback_snapshots) == {snapshot}
@@ -14,7 +14,9 @@ import unicodedata
 import numpy as np
 from unittest.mock import patch
 
-from qcodes.dataset.descriptions.param_spec import ParamSpec
+import qcodes as qc
+
+from qcodes.dataset.descriptions.param_spec import ParamSpec, ParamSpecBase
 from qcodes.dataset.descriptions.rundescriber import RunDescriber
 from qcodes.dataset.descriptions.dependencies import InterDependencies_
 import qcodes.dataset.descriptions.versioning.serialization as serial
@@ -102,6 +104,100 @@ def test_insert_many_values_raises(experiment):
                                     values=[[1], [1, 3]])
 
 
+def test_insert_many_columns_raises(experiment):
+    conn = experiment.conn
+
+    with pytest.raises(ValueError, match='same number of values'):
+        mut_help.insert_many_columns(conn, 'some_string',
+                                     ['column1', 'column2'],
+                                     values=[[1], [1, 3]])
+
+
+@pytest.fixture
+def raw_array_blobs():
+    qc.config["core"]["db_array_blob_format"] = 'raw'
+    try:
+        yield
+    finally:
+        qc.config["core"]["db_array_blob_format"] = 'npy'
+
+
+@pytest.mark.parametrize('array', [np.random.rand(10_000),
+                                   np.random.rand(3, 4, 5),
+                                   np.arange(12, dtype='>i4').reshape(3, 4),
+                                   np.array([1+1j, 2-3j], dtype=np.complex64),
+                                   np.array(['a', 'bcd']),
+                                   np.array([True, False]),
+                                   np.array(3.0),
+                                   np.zeros((0, 3))])
+def test_array_blob_codec_roundtrip(array):
+    blob = mut_db._adapt_array_raw(array)
+    assert bytes(blob[:4]) == mut_db._ARRAY_BLOB_MAGIC
+
+    decoded = mut_db._convert_array(bytes(blob))
+    assert decoded.dtype == array.dtype
+    assert decoded.shape == array.shape
+    np.testing.assert_array_equal(decoded, array)
+    assert decoded.flags.writeable
+
+
+def test_array_blob_format_from_config(raw_array_blobs):
+    array = np.random.rand(5, 2)
+    assert bytes(mut_db._adapt_array(array)[:4]) == mut_db._ARRAY_BLOB_MAGIC
+
+    # earlier versions of QCoDeS can only read the .npy format, which is
+    # written by default
+    qc.config["core"]["db_array_blob_format"] = 'npy'
+    blob = bytes(mut_db._adapt_array(array))
+    assert blob == bytes(mut_db._adapt_array_npy(array))
+    np.testing.assert_array_equal(mut_db._convert_array(blob), array)
+
+
+def test_array_blob_codec_npy_fallback():
+    array = np.random.rand(5, 2)
+    legacy_blob = bytes(mut_db._adapt_array_npy(array))
+    np.testing.assert_array_equal(mut_db._convert_array(legacy_blob), array)
+
+    # arrays that can not be represented by their raw bytes are stored
+    # in the .npy format
+    structured = np.array([(1, 2.0)], dtype=[('a', int), ('b', float)])
+    blob = bytes(mut_db._adapt_array_raw(structured))
+    assert blob[:4] != mut_db._ARRAY_BLOB_MAGIC
+    np.testing.assert_array_equal(mut_db._convert_array(blob), structured)
+
+
+def test_array_blob_codec_unknown_version_raises():
+    blob = bytearray(mut_db._adapt_array_raw(np.arange(3.)))
+    blob[4] = 255
+    with pytest.raises(ValueError, match='Unknown array BLOB version'):
+        mut_db._convert_array(bytes(blob))
+
+
+def test_complex_blob_codec_roundtrip(raw_array_blobs):
+    value = np.complex128(1.5-2j)
+    blob = bytes(mut_db._adapt_complex(value))
+    assert blob[:4] == mut_db._ARRAY_BLOB_MAGIC
+    assert mut_db._convert_complex(blob) == value
+
+    legacy_blob = bytes(mut_db._adapt_array_npy(np.array([value])))
+    assert mut_db._convert_complex(legacy_blob) == value
+
+
+@pytest.mark.usefixtures("raw_array_blobs")
+def test_get_parameter_data_of_raw_array_blobs(experiment):
+    ds = DataSet()
+    ds.set_interdependencies(InterDependencies_(standalones=(
+        ParamSpecBase('signal', 'array'),)))
+    ds.mark_started()
+    ds.add_results([{'signal': np.arange(4.)}, {'signal': np.ones(4)}])
+    ds.mark_completed()
+
+    data = ds.get_parameter_data()['signal']['signal']
+    np.testing.assert_array_equal(data, [np.arange(4.), np.ones(4)])
+    data[0, 0] = 42
+    assert ds.get_parameter_data()['signal']['signal'][0, 0] == 0
+
+
 def test_get_metadata_raises(experiment):
     with pytest.raises(RuntimeError) as excinfo:
         mut_queries.get_metadata(experiment.conn, 'something', 'results')
@@ -401,3 +497,116 @@ def test_sqlite_base_is_tested_in_this_file():
     assert sqlite_base._validate_table_name is mut_queries._validate_table_name
     assert sqlite_base.get_layout_id is mut_queries.get_layout_id
     assert sqlite_base.is_column_in_table is mut_help.is_column_in_table
+
+
+@pytest.fixture
+def pragma_config():
+    core = qc.config["core"]
+    old = core["db_pragma_profile"], dict(core["db_pragmas"])
+    try:
+        yield core
+    finally:
+        core["db_pragma_profile"], core["db_pragmas"] = old
+
+
+def _get_pragma(conn, name):
+    return conn.execute(f'PRAGMA {name}').fetchone()[0]
+
+
+def test_connect_pragma_profiles(tmp_path, pragma_config):
+    conn = mut_db.connect(str(tmp_path / 'default.db'))
+    assert _get_pragma(conn, 'journal_mode') == 'delete'
+    assert _get_pragma(conn, 'synchronous') == 2  # FULL
+    conn.close()
+
+    pragma_config["db_pragma_profile"] = 'wal'
+    conn = mut_db.connect(str(tmp_path / 'wal.db'))
+    assert _get_pragma(conn, 'journal_mode') == 'wal'
+    assert _get_pragma(conn, 'synchronous') == 1  # NORMAL
+    assert _get_pragma(conn, 'cache_size') == -65536
+    assert _get_pragma(conn, 'temp_store') == 2  # MEMORY
+    conn.close()
+
+    pragma_config["db_pragmas"] = {'synchronous': 'OFF'}
+    conn = mut_db.connect(str(tmp_path / 'wal.db'))
+    assert _get_pragma(conn, 'journal_mode') == 'wal'
+    assert _get_pragma(conn, 'synchronous') == 0  # OFF
+    conn.close()
+
+
+def test_connect_invalid_pragmas(tmp_path, pragma_config):
+    pragma_config["db_pragma_profile"] = 'no-such-profile'
+    with pytest.raises(ValueError, match='Unknown db_pragma_profile'):
+        mut_db.connect(str(tmp_path / 'temp.db'))
+
+    pragma_config["db_pragma_profile"] = 'default'
+    pragma_config["db_pragmas"] = {'foreign_keys': 'ON'}
+    with pytest.raises(ValueError, match='Unsupported PRAGMA'):
+        mut_db.connect(str(tmp_path / 'temp.db'))
+
+    pragma_config["db_pragmas"] = {'synchronous': 'OFF; DROP TABLE runs'}
+    with pytest.raises(ValueError, match='Invalid value'):
+        mut_db.connect(str(tmp_path / 'temp.db'))
+
+
+def test_wal_not_used_where_unsafe(tmp_path, pragma_config, caplog):
+    assert mut_db.is_wal_safe(str(tmp_path / 'temp.db'))
+    assert not mut_db.is_wal_safe(':memory:')
+
+    pragma_config["db_pragma_profile"] = 'wal'
+    with patch.object(mut_db, '_is_on_network_file_system',
+                      return_value=True):
+        assert not mut_db.is_wal_safe(str(tmp_path / 'temp.db'))
+        conn = mut_db.connect(str(tmp_path / 'temp.db'))
+    assert _get_pragma(conn, 'journal_mode') == 'delete'
+    assert 'Not using WAL journal mode' in caplog.text
+    conn.close()
+
+
+def test_connect_read_only(tmp_path, pragma_config):
+    path = str(tmp_path / 'temp.db')
+    with pytest.raises(OperationalError):
+        # a read-only connection does not create the database
+        mut_db.connect(path, read_only=True)
+
+    pragma_config["db_pragma_profile"] = 'wal'
+    writer = mut_db.connect(path)
+    exp_id = mut_queries.new_experiment(writer, 'exp', 'sample')
+
+    reader = mut_db.connect(path, read_only=True)
+    assert reader.read_only
+    assert _get_pragma(reader, 'query_only') == 1
+    assert [row[0] for row in mut_queries.get_experiments(reader)] == \
+        [exp_id]
+    with pytest.raises(RuntimeError) as excinfo:
+        mut_queries.new_experiment(reader, 'exp_2', 'sample')
+    assert 'readonly' in str(excinfo.value.__cause__)
+
+    # data written meanwhile is visible to the reader
+    mut_queries.new_experiment(writer, 'exp_2', 'sample')
+    assert len(mut_queries.get_experiments(reader)) == 2
+    reader.close()
+    writer.close()
+
+    # older databases are not upgraded by a read-only connection
+    old_path = str(tmp_path / 'old.db')
+    mut_db.connect(old_path, version=2).close()
+    with pytest.raises(RuntimeError, match='can not be upgraded'):
+        mut_db.connect(old_path, read_only=True)
+    assert mut_db.get_db_version_and_newest_available_version(
+        old_path)[0] == 2
+
+
+def test_pooled_connections_read_only(tmp_path):
+    path = str(tmp_path / 'temp.db')
+    mut_db.connect(path).close()
+    try:
+        qc.config["core"]["db_read_only"] = True
+        conn = mut_db.get_pooled_connection(path)
+        assert conn.read_only
+        assert not mut_db.get_pooled_connection(path, read_only=False) \
+            .read_only
+        assert mut_db.get_pooled_connection(path) is conn
+    finally:
+        qc.config["core"]["db_read_only"] = False
+        mut_db.close_pooled_connections()
@@ -3,8 +3,10 @@ from typing import List, Tuple, Dict, Union
 from numbers import Number
 
 import pytest
+import numpy as np
 from numpy import ndarray
 import logging
+from unittest.mock import patch
 
 import qcodes
 from qcodes.dataset.descriptions.param_spec import ParamSpecBase
@@ -214,3 +216,109 @@ def test_subscription_from_config_wrong_name(dataset):
         assert 'test_subscriber' not in qcodes.config.subscription.subscribers
         with pytest.raises(RuntimeError):
             sub_id_c = dataset.subscribe_from_config('test_subscriber')
+
+
+def _get_triggers(dataset):
+    get_triggers_sql = "SELECT * FROM sqlite_master WHERE TYPE = 'trigger';"
+    return atomic_transaction(dataset.conn, get_triggers_sql).fetchall()
+
+
+def _set_xy_interdependencies(dataset):
+    xparam = ParamSpecBase(name='x', paramtype='numeric')
+    yparam = ParamSpecBase(name='y', paramtype='numeric')
+    idps = InterDependencies_(dependencies={yparam: (xparam,)})
+    dataset.set_interdependencies(idps)
+
+
+def test_trigger_subscription(dataset, basic_subscriber):
+    _set_xy_interdependencies(dataset)
+    dataset.mark_started()
+
+    sub_id = dataset.subscribe(basic_subscriber, min_wait=0, min_count=1,
+                               state={}, use_trigger=True)
+    assert len(_get_triggers(dataset)) == 1
+
+    expected_state = {}
+
+    for x in range(3):
+        y = -x**2
+        dataset.add_result({'x': x, 'y': y})
+        expected_state[x+1] = [(x, y)]
+
+        @retry_until_does_not_throw(
+            exception_class_to_expect=AssertionError, delay=0, tries=10)
+        def assert_expected_state():
+            assert dataset.subscribers[sub_id].state == expected_state
+
+        assert_expected_state()
+
+    dataset.unsubscribe(sub_id)
+    assert len(_get_triggers(dataset)) == 0
+
+    with pytest.raises(ValueError):
+        dataset.subscribe(basic_subscriber, use_trigger=True, as_arrays=True)
+
+
+def test_subscription_as_arrays(dataset):
+    _set_xy_interdependencies(dataset)
+    dataset.mark_started()
+
+    def subscriber(results, length, state):
+        state.extend(results)
+
+    state = []
+    sub_id = dataset.subscribe(subscriber, min_count=5, state=state,
+                               as_arrays=True)
+    # no trigger is needed for subscribers on the result bus
+    assert len(_get_triggers(dataset)) == 0
+
+    dataset.add_columns({'x': np.arange(3), 'y': np.arange(3) * 2.})
+    dataset.add_results([{'x': 3, 'y': 6.}, {'x': 4}])
+
+    @retry_until_does_not_throw(
+        exception_class_to_expect=AssertionError, delay=0, tries=10)
+    def assert_expected_state():
+        assert len(state) == 2
+
+    assert_expected_state()
+    np.testing.assert_array_equal(state[0]['x'], [0, 1, 2])
+    np.testing.assert_array_equal(state[0]['y'], [0., 2., 4.])
+    np.testing.assert_array_equal(state[1]['x'], [3, 4])
+    assert list(state[1]['y']) == [6., None]
+
+    dataset.unsubscribe(sub_id)
+
+
+def test_adding_results_does_not_look_up_guid(dataset):
+    _set_xy_interdependencies(dataset)
+    dataset.mark_started()
+    state = []
+    dataset.subscribe(lambda results, length, state: state.extend(results),
+                      min_count=1, state=state, as_arrays=True)
+
+    with patch('qcodes.dataset.data_set.get_guid_from_run_id') as get_guid:
+        dataset.add_result({'x': 0, 'y': 0.})
+        dataset.add_results([{'x': 1, 'y': 2.}])
+        dataset.add_columns({'x': np.arange(2), 'y': np.arange(2.)})
+    assert get_guid.call_count == 0
+
+    @retry_until_does_not_throw(
+        exception_class_to_expect=AssertionError, delay=0, tries=10)
+    def assert_expected_state():
+        assert len(state) == 3
+
+    assert_expected_state()
+
+
+def test_subscriber_called_on_completion(dataset, basic_subscriber):
+    _set_xy_interdependencies(dataset)
+    dataset.mark_started()
+
+    sub_id = dataset.subscribe(basic_subscriber, min_count=10, state={})
+    dataset.add_results([{'x': 1, 'y': 2}, {'x': 3}])
+    assert dataset.subscribers[sub_id].state == {}
+
+    # completing the dataset calls the callback with the remaining results
+    dataset.mark_completed()
+    assert dataset.subscribers[sub_id].state == {2: [(1, 2), (3, None)]}
+    assert not dataset.subscribers[sub_id].is_alive()
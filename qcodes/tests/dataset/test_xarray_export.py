@@ -0,0 +1,107 @@
+import os
+
+import numpy as np
+from numpy.testing import assert_array_equal
+import pytest
+
+from qcodes.dataset.measurements import Measurement
+from qcodes.instrument.parameter import ManualParameter
+# pylint: disable=unused-import
+from qcodes.tests.dataset.temporary_databases import (empty_temp_db,
+                                                      experiment)
+
+xr = pytest.importorskip('xarray')
+
+
+@pytest.fixture
+def meas_2d():
+    x = ManualParameter('x', unit='V')
+    y = ManualParameter('y', unit='A')
+    z = ManualParameter('z', label='signal')
+    meas = Measurement()
+    meas.register_parameter(x)
+    meas.register_parameter(y)
+    meas.register_parameter(z, setpoints=(x, y))
+    return meas, x, y, z
+
+
+@pytest.mark.usefixtures("experiment")
+@pytest.mark.parametrize("shaped", [True, False])
+def test_to_xarray_dataset_on_grid(meas_2d, shaped):
+    meas, x, y, z = meas_2d
+    if shaped:
+        meas.set_shapes({'z': (3, 4)})
+    xs = np.arange(3)
+    ys = np.linspace(-1, 1, 4)
+    with meas.run() as datasaver:
+        for x_val in xs:
+            for y_val in ys:
+                datasaver.add_result((x, x_val), (y, y_val),
+                                     (z, x_val * y_val))
+    dataset = datasaver.dataset
+    dataset.add_metadata('sample_temperature', 0.01)
+
+    xr_dataset = dataset.to_xarray_dataset()
+
+    assert xr_dataset.z.dims == ('x', 'y')
+    assert_array_equal(xr_dataset.x, xs)
+    assert_array_equal(xr_dataset.y, ys)
+    assert_array_equal(xr_dataset.z, np.outer(xs, ys))
+    assert xr_dataset.z.attrs == {'units': '', 'long_name': 'signal'}
+    assert xr_dataset.x.attrs['units'] == 'V'
+    assert xr_dataset.attrs['guid'] == dataset.guid
+    assert xr_dataset.attrs['sample_temperature'] == 0.01
+
+
+@pytest.mark.usefixtures("experiment")
+def test_to_xarray_dataset_incomplete_and_scattered(meas_2d):
+    meas, x, y, z = meas_2d
+    with meas.run() as datasaver:
+        for x_val in range(3):
+            for y_val in range(3):
+                if (x_val, y_val) != (2, 2):
+                    datasaver.add_result((x, x_val), (y, y_val),
+                                         (z, x_val + y_val))
+    # the missing point is filled with NaN
+    z_array = datasaver.dataset.to_xarray_dataset().z
+    assert z_array.dims == ('x', 'y')
+    assert np.isnan(z_array.values[2, 2])
+    assert z_array.values[1, 2] == 3
+
+    rng = np.random.RandomState(0)
+    with meas.run() as datasaver:
+        for x_val, y_val in rng.rand(10, 2):
+            datasaver.add_result((x, x_val), (y, y_val), (z, x_val + y_val))
+    # scattered data is stored along an index
+    z_array = datasaver.dataset.to_xarray_dataset().z
+    assert z_array.dims == ('z_index',)
+    assert_array_equal(z_array.values, z_array.x.values + z_array.y.values)
+
+
+@pytest.mark.usefixtures("experiment")
+def test_export_and_load_from_netcdf(meas_2d, tmp_path):
+    pytest.importorskip('netCDF4')
+    from qcodes.dataset.xarray_export import load_from_netcdf
+    meas, x, y, z = meas_2d
+    w = ManualParameter('w')
+    meas.register_parameter(w, setpoints=(x,))
+    meas.set_shapes({'z': (2, 5), 'w': (2,)})
+    with meas.run() as datasaver:
+        for x_val in range(2):
+            for y_val in range(5):
+                datasaver.add_result((x, x_val), (y, y_val),
+                                     (z, x_val * y_val))
+            datasaver.add_result((x, x_val), (w, -x_val))
+    dataset = datasaver.dataset
+
+    with pytest.raises(ValueError, match='Unknown export format'):
+        dataset.export(format='hdf5')
+
+    path = dataset.export(path=str(tmp_path / 'run.nc'))
+    assert os.path.exists(path)
+    loaded = load_from_netcdf(path)
+    try:
+        xr.testing.assert_identical(loaded.load(),
+                                    dataset.to_xarray_dataset())
+    finally:
+        loaded.close()